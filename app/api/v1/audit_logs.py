@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from datetime import datetime, date, timedelta
+
+from app.utils.auth import verify_token
+from app.services.audit_service import AuditService, InvalidCursorError
+from app.services.audit_retention_service import AuditRetentionService
+from app.models.audit_log import ActionType, AuditLogFilter, AuditLogPage, AuditDailySummary
+from app.utils.responses import TrustedJSONResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=AuditLogPage)
+async def get_audit_logs(
+    action_type: Optional[ActionType] = Query(None),
+    resource_type: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    success_only: Optional[bool] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Valor next_cursor de la página anterior"),
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener los logs de auditoría del usuario autenticado, del más reciente al más antiguo"""
+    try:
+        # Cada usuario solo puede consultar sus propios registros
+        filters = AuditLogFilter(
+            user_id=user_token['uid'],
+            action_type=action_type,
+            resource_type=resource_type,
+            start_date=start_date,
+            end_date=end_date,
+            success_only=success_only,
+            limit=limit
+        )
+        audit_service = AuditService()
+        page = await audit_service.query_logs(filters, cursor)
+        return TrustedJSONResponse(page)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/daily", response_model=List[AuditDailySummary])
+async def get_audit_daily_summaries(
+    start_date: Optional[date] = Query(None, description="Por defecto, los 30 días que terminan en end_date"),
+    end_date: Optional[date] = Query(None, description="Por defecto, ayer"),
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener los resúmenes diarios de auditoría del usuario (conteos por acción y resultado)"""
+    end_date = end_date or date.today() - timedelta(days=1)
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date debe ser anterior o igual a end_date")
+    if (end_date - start_date).days >= 366:
+        raise HTTPException(status_code=400, detail="El rango máximo es de 366 días")
+    try:
+        retention_service = AuditRetentionService()
+        summaries = await retention_service.get_daily_summaries(user_token['uid'], start_date, end_date)
+        return TrustedJSONResponse(summaries)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
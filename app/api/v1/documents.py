@@ -1,30 +1,133 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from typing import List, Optional
-import tempfile
-import os
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any
+import asyncio
 from datetime import datetime
+from dateutil import parser as date_parser
+
+from app.config.settings import settings
 
 from app.utils.auth import verify_token
 from app.services.document_service import DocumentService
-from app.services.drive_service import GoogleDriveService
-from app.services.ai_analysis_service import DocumentAnalysisService
-from app.models.document import DocumentCreate, DocumentUpdate, DocumentResponse
+from app.services.storage_service import get_storage_backend, StorageAuthorizationError
+from app.services.ai_analysis_service import DocumentAnalysisService, resolve_analysis_tier
+from app.services.thumbnail_service import ThumbnailService
+from app.services.content_service import DocumentContentService, RangeNotSatisfiableError, content_disposition
+from app.services.user_service import UserService
+from app.models.document import DocumentCreate, StoredDocumentCreate, DocumentUpdate, DocumentResponse
+from app.models.ai_analysis import AnalysisTier
+from app.models.audit_log import ActionType
+from app.services.audit_service import record_audit
+from app.utils.responses import TrustedJSONResponse
+from app.utils.sparse_fields import parse_fields, InvalidFieldsError
+from app.utils.conditional import (
+    make_etag, conditional_json, is_not_modified, not_modified, validator_headers, cache_headers
+)
+from app.utils.export import ndjson_chunks, csv_chunks
 
 router = APIRouter()
 
+def _parse_expiry_date(value: Optional[str]) -> Optional[datetime]:
+    """Convertir la fecha de vencimiento detectada (DD/MM/YYYY) a datetime"""
+    if not value:
+        return None
+    try:
+        return date_parser.parse(value, dayfirst=True)
+    except (ValueError, OverflowError):
+        return None
+
+def _build_document_data(filename: str, content_type: Optional[str], analysis: Dict[str, Any],
+                         storage_name: str, stored: Dict[str, Any],
+                         thumbnail: Optional[Dict[str, Any]] = None) -> StoredDocumentCreate:
+    """Construir el documento de Firestore a partir del análisis y del archivo guardado"""
+    on_drive = storage_name == 'drive'
+    return StoredDocumentCreate(
+        name=filename,
+        category=analysis['suggested_category'],
+        description=f"Documento analizado automáticamente. Categoría sugerida: {analysis['suggested_category']}",
+        file_url=stored['url'],
+        file_name=filename,
+        file_size=stored['size'],
+        file_type=content_type,
+        expiry_date=_parse_expiry_date(analysis.get('expiry_date')),
+        metadata=analysis.get('metadata', {}),
+        tags=analysis.get('tags', []),
+        drive_file_id=stored['file_id'] if on_drive else None,
+        drive_folder_id=stored['folder_id'] if on_drive else None,
+        # Mismo valor que el md5Checksum de Drive: base para detectar conflictos
+        drive_md5_checksum=stored['md5_checksum'] if on_drive else None,
+        storage_backend=storage_name,
+        storage_key=None if on_drive else stored['file_id'],
+        thumbnail_etag=thumbnail['etag'] if thumbnail else None
+    )
+
+def _stored_links(storage_name: str, stored: Dict[str, Any]) -> Dict[str, Any]:
+    """Referencias del archivo guardado para la respuesta de subida"""
+    on_drive = storage_name == 'drive'
+    return {
+        "storage_backend": storage_name,
+        "file_url": stored['url'],
+        "drive_file_id": stored['file_id'] if on_drive else None,
+        "drive_url": stored['url'] if on_drive else None
+    }
+
 @router.get("/", response_model=List[DocumentResponse])
-async def get_documents(user_token: dict = Depends(verify_token)):
+async def get_documents(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. name,category,created_at"),
+    user_token: dict = Depends(verify_token)
+):
     """Obtener todos los documentos del usuario autenticado"""
     try:
+        user_id = user_token['uid']
+        field_list = parse_fields(fields, DocumentResponse)
         document_service = DocumentService()
-        documents = await document_service.get_user_documents(user_token['uid'])
-        return documents
+        
+        # El sello se lee antes que los datos: ante una escritura intermedia el ETag queda atrasado, nunca adelantado
+        stamp = await document_service.versions.get_version(user_id, 'documents')
+        return await conditional_json(
+            request,
+            lambda: document_service.get_user_documents(user_id, field_list),
+            make_etag('documents', user_id, stamp['version'], field_list) if stamp else None,
+            stamp.get('updated_at') if stamp else None
+        )
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export_documents(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson o csv"),
+    fields: Optional[str] = Query(None, description="Columnas a exportar separadas por comas, p. ej. name,category,created_at"),
+    user_token: dict = Depends(verify_token)
+):
+    """Exportar el catálogo completo de documentos en streaming (NDJSON o CSV)"""
+    try:
+        field_list = parse_fields(fields, DocumentResponse)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    columns = list(field_list) if field_list else [name for name in DocumentResponse.model_fields if name != 'user_id']
+    # Generador síncrono: Starlette lo recorre en el pool de hilos, así el stream de Firestore no bloquea el event loop
+    rows = DocumentService().iter_user_documents(user_token['uid'], field_list)
+    
+    if export_format == "csv":
+        body, media_type = csv_chunks(rows, columns), "text/csv"
+    else:
+        body, media_type = ndjson_chunks(rows, columns), "application/x-ndjson"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="documentos.{export_format}"'}
+    )
+
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: str,
+    request: Request,
+    response: Response,
     user_token: dict = Depends(verify_token)
 ):
     """Obtener documento específico por ID"""
@@ -33,6 +136,10 @@ async def get_document(
         document = await document_service.get_document_by_id(document_id, user_token['uid'])
         
         if document:
+            etag = make_etag('document', document.id, document.updated_at.isoformat())
+            if is_not_modified(request, etag, document.updated_at):
+                return not_modified(etag, document.updated_at)
+            response.headers.update(validator_headers(etag, document.updated_at))
             return document
         else:
             raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -42,6 +149,95 @@ async def get_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{document_id}/thumbnail")
+async def get_document_thumbnail(
+    document_id: str,
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener la miniatura (WebP o JPEG) de un documento, cacheable por el cliente"""
+    try:
+        document_service = DocumentService()
+        document = await document_service.get_document_by_id(document_id, user_token['uid'])
+        
+        if not document or not document.thumbnail_etag:
+            raise HTTPException(status_code=404, detail="Miniatura no encontrada")
+        
+        # El ETag está en el documento: el 304 no lee los bytes de la miniatura
+        headers = cache_headers(document.thumbnail_etag, settings.thumbnail_cache_max_age_seconds)
+        if is_not_modified(request, document.thumbnail_etag, None):
+            return Response(status_code=304, headers=headers)
+        
+        thumbnail = await ThumbnailService().get_thumbnail(document_id, user_token['uid'])
+        if not thumbnail:
+            raise HTTPException(status_code=404, detail="Miniatura no encontrada")
+        
+        return Response(content=thumbnail['content'], media_type=thumbnail['content_type'], headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{document_id}/content")
+async def get_document_content(
+    document_id: str,
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Descargar el archivo del documento en streaming, con soporte de Range y caché en disco"""
+    try:
+        document_service = DocumentService()
+        document = await document_service.get_document_by_id(document_id, user_token['uid'])
+        
+        if not document:
+            raise HTTPException(status_code=404, detail="Documento no encontrado")
+        
+        content_service = DocumentContentService()
+        etag = content_service.etag(document)
+        if etag and is_not_modified(request, etag, None):
+            return not_modified(etag, None)
+        
+        # If-Range: el rango solo vale si el cliente tiene la misma revisión
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and if_range is not None and if_range.strip() != etag:
+            range_header = None
+        
+        content = await content_service.open(document, user_token['uid'], range_header)
+        if content is None:
+            raise HTTPException(status_code=404, detail="El documento no tiene archivo")
+        
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(content.length),
+            "Content-Disposition": content_disposition(document.file_name or document.name)
+        }
+        # El de la revisión entregada: en Drive puede ser más nueva que la registrada
+        if content.etag:
+            headers.update(validator_headers(content.etag, None))
+        if content.partial:
+            headers["Content-Range"] = f"bytes {content.start}-{content.end}/{content.size}"
+        
+        # Generador síncrono: Starlette lo recorre en el pool de hilos
+        return StreamingResponse(
+            content.chunks,
+            status_code=206 if content.partial else 200,
+            media_type=document.file_type or "application/octet-stream",
+            headers=headers
+        )
+        
+    except HTTPException:
+        raise
+    except RangeNotSatisfiableError as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{e.size}"})
+    except StorageAuthorizationError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/", response_model=DocumentResponse)
 async def create_document(
     document_data: DocumentCreate,
@@ -57,90 +253,203 @@ async def create_document(
 
 @router.post("/upload")
 async def upload_and_analyze_document(
+    request: Request,
     file: UploadFile = File(...),
+    tier: Optional[AnalysisTier] = Query(None, description="Nivel de análisis; no supera lo permitido por la configuración del usuario"),
     user_token: dict = Depends(verify_token)
 ):
-    """Subir archivo, analizarlo automáticamente y guardarlo en Google Drive con clasificación"""
+    """Subir archivo, analizarlo automáticamente y guardarlo con clasificación en el almacenamiento del usuario"""
     try:
         # Verificar tipo de archivo
         if not file.filename:
             raise HTTPException(status_code=400, detail="Nombre de archivo requerido")
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        content = await file.read()
+        
+        # Elegir el nivel de análisis según la configuración (en caché) y la petición
+        user_settings = await UserService().get_user_settings(user_token['uid'])
+        
+        # Almacenamiento (Drive, S3 o local) antes del análisis: sin autorización no se analiza
+        storage = await get_storage_backend(user_token['uid'], user_settings)
         
-        try:
-            # Analizar documento con AI
-            ai_service = DocumentAnalysisService()
-            analysis = await ai_service.analyze_document(
+        # Analizar documento con AI y generar la miniatura a la vez (ambos en el pool de hilos)
+        ai_service = DocumentAnalysisService()
+        thumbnail_service = ThumbnailService()
+        analysis, thumbnail = await asyncio.gather(
+            ai_service.analyze_document(
                 content, 
                 file.content_type or "application/octet-stream",
-                file.filename
-            )
-            
-            # Obtener credenciales de Google Drive del usuario
-            from app.services.oauth_service import GoogleOAuthService
-            
-            oauth_service = GoogleOAuthService()
-            user_credentials = await oauth_service.refresh_user_tokens(user_token['uid'])
-            
-            if not user_credentials:
-                raise HTTPException(
-                    status_code=401, 
-                    detail="Usuario no ha autorizado acceso a Google Drive. Use /api/v1/auth/google/authorize primero."
-                )
-            
-            # Crear carpeta en Google Drive según categoría
-            drive_service = GoogleDriveService(user_credentials)
-            
-            # Crear estructura de carpetas
-            category_folder = await drive_service.get_or_create_folder(analysis['suggested_category'])
-            
-            # Subir archivo a Google Drive
-            drive_file_id = await drive_service.upload_file(
-                temp_file_path,
                 file.filename,
-                category_folder,
-                file.content_type
+                tier=resolve_analysis_tier(user_settings, tier),
+                categorize=user_settings.auto_categorization
+            ),
+            thumbnail_service.generate(content, file.content_type)
+        )
+        
+        # Carpeta según categoría
+        category_folder = await storage.get_or_create_folder(analysis['suggested_category'])
+        
+        # El archivo recibido se sube leyéndolo por bloques, sin copia temporal
+        await file.seek(0)
+        stored = await storage.upload_stream(file.file, file.filename, category_folder, file.content_type)
+        
+        # Crear documento en Firestore
+        document_service = DocumentService()
+        document_data = _build_document_data(file.filename, file.content_type, analysis, storage.name, stored, thumbnail)
+        document = await document_service.create_document(user_token['uid'], document_data)
+        
+        # Guardar análisis con sus tiempos por etapa
+        await ai_service.save_analyses(user_token['uid'], [(document.id, analysis)])
+        if thumbnail:
+            await thumbnail_service.save_thumbnails(user_token['uid'], [(document.id, thumbnail)])
+        
+        record_audit(request, user_token['uid'], ActionType.DOCUMENT_UPLOAD, "document",
+                     f"Documento subido: {file.filename}", resource_id=document.id,
+                     metadata={"category": analysis['suggested_category'], "storage_backend": storage.name,
+                               "file_id": stored['file_id']})
+        
+        return {
+            "message": "Documento subido y analizado exitosamente",
+            "document": document,
+            "analysis": analysis,
+            **_stored_links(storage.name, stored)
+        }
+        
+    except HTTPException:
+        raise
+    except StorageAuthorizationError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/upload/batch")
+async def upload_and_analyze_documents_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    tier: Optional[AnalysisTier] = Query(None, description="Nivel de análisis; no supera lo permitido por la configuración del usuario"),
+    user_token: dict = Depends(verify_token)
+):
+    """Subir varios archivos, analizarlos en paralelo y guardarlos en el almacenamiento del usuario y Firestore"""
+    try:
+        if not files:
+            raise HTTPException(status_code=400, detail="Se requiere al menos un archivo")
+        
+        if len(files) > settings.batch_upload_max_files:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Máximo {settings.batch_upload_max_files} archivos por lote"
             )
+        
+        # Almacenamiento (y credenciales de Drive si corresponde) una sola vez para todo el lote
+        user_settings = await UserService().get_user_settings(user_token['uid'])
+        storage = await get_storage_backend(user_token['uid'], user_settings)
+        ai_service = DocumentAnalysisService()
+        thumbnail_service = ThumbnailService()
+        analysis_tier = resolve_analysis_tier(user_settings, tier)
+        semaphore = asyncio.Semaphore(settings.analysis_max_concurrency)
+        
+        results: List[Dict[str, Any]] = [
+            {"filename": file.filename, "success": False} for file in files
+        ]
+        analyses: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        thumbnails: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        
+        async def analyze(index: int, file: UploadFile):
+            """Leer, analizar y generar la miniatura de un archivo respetando el límite de concurrencia"""
+            if not file.filename:
+                results[index]["error"] = "Nombre de archivo requerido"
+                return
+            async with semaphore:
+                try:
+                    content = await file.read()
+                    analyses[index], thumbnails[index] = await asyncio.gather(
+                        ai_service.analyze_document(
+                            content,
+                            file.content_type or "application/octet-stream",
+                            file.filename,
+                            tier=analysis_tier,
+                            categorize=user_settings.auto_categorization
+                        ),
+                        thumbnail_service.generate(content, file.content_type)
+                    )
+                except Exception as e:
+                    results[index]["error"] = f"Error analizando archivo: {e}"
+        
+        await asyncio.gather(*(analyze(i, file) for i, file in enumerate(files)))
+        
+        # Agrupar por categoría para resolver cada carpeta una sola vez
+        by_category: Dict[str, List[int]] = {}
+        for index, analysis in enumerate(analyses):
+            if analysis is not None:
+                by_category.setdefault(analysis['suggested_category'], []).append(index)
+        
+        pending_indexes: List[int] = []
+        pending_documents: List[StoredDocumentCreate] = []
+        
+        for category, indexes in by_category.items():
+            try:
+                category_folder = await storage.get_or_create_folder(category)
+            except Exception as e:
+                for index in indexes:
+                    results[index]["error"] = f"Error creando carpeta: {e}"
+                continue
             
-            # Crear documento en Firestore
+            for index in indexes:
+                file = files[index]
+                try:
+                    await file.seek(0)
+                    stored = await storage.upload_stream(file.file, file.filename, category_folder, file.content_type)
+                except Exception as e:
+                    results[index]["error"] = f"Error subiendo el archivo: {e}"
+                    continue
+                
+                results[index].update(_stored_links(storage.name, stored))
+                pending_indexes.append(index)
+                pending_documents.append(_build_document_data(
+                    file.filename, file.content_type, analyses[index], storage.name, stored, thumbnails[index]
+                ))
+        
+        # Registrar todos los documentos en Firestore con escrituras en lote
+        if pending_documents:
             document_service = DocumentService()
+            documents = await document_service.create_documents(user_token['uid'], pending_documents)
+            for index, document in zip(pending_indexes, documents):
+                results[index].update({
+                    "success": True,
+                    "document": document,
+                    "analysis": analyses[index]
+                })
             
-            document_data = DocumentCreate(
-                name=file.filename,
-                category=analysis['suggested_category'],
-                description=f"Documento analizado automáticamente. Categoría sugerida: {analysis['suggested_category']}",
-                file_url=f"https://drive.google.com/file/d/{drive_file_id}/view",
-                file_name=file.filename,
-                file_size=len(content),
-                file_type=file.content_type,
-                expiry_date=analysis.get('expiry_date'),
-                metadata=analysis.get('metadata', {}),
-                tags=analysis.get('tags', [])
-            )
-            
-            document = await document_service.create_document(user_token['uid'], document_data)
-            
-            # Limpiar archivo temporal
-            os.unlink(temp_file_path)
-            
-            return {
-                "message": "Documento subido y analizado exitosamente",
-                "document": document,
-                "analysis": analysis,
-                "drive_file_id": drive_file_id,
-                "drive_url": f"https://drive.google.com/file/d/{drive_file_id}/view"
-            }
-            
-        except Exception as e:
-            # Limpiar archivo temporal en caso de error
-            os.unlink(temp_file_path)
-            raise e
+            # Guardar análisis con sus tiempos por etapa
+            await ai_service.save_analyses(user_token['uid'], [
+                (document.id, analyses[index]) for index, document in zip(pending_indexes, documents)
+            ])
+            await thumbnail_service.save_thumbnails(user_token['uid'], [
+                (document.id, thumbnails[index]) for index, document in zip(pending_indexes, documents)
+                if thumbnails[index]
+            ])
             
+            for index, document in zip(pending_indexes, documents):
+                record_audit(request, user_token['uid'], ActionType.DOCUMENT_UPLOAD, "document",
+                             f"Documento subido: {files[index].filename}", resource_id=document.id,
+                             metadata={"category": analyses[index]['suggested_category'], "batch": True})
+        
+        uploaded = sum(1 for result in results if result["success"])
+        return {
+            "message": f"{uploaded} de {len(files)} documentos subidos y analizados",
+            "uploaded": uploaded,
+            "failed": len(files) - uploaded,
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except StorageAuthorizationError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -148,6 +457,7 @@ async def upload_and_analyze_document(
 async def update_document(
     document_id: str,
     document_data: DocumentUpdate,
+    request: Request,
     user_token: dict = Depends(verify_token)
 ):
     """Actualizar documento existente"""
@@ -156,6 +466,9 @@ async def update_document(
         document = await document_service.update_document(document_id, user_token['uid'], document_data)
         
         if document:
+            record_audit(request, user_token['uid'], ActionType.DOCUMENT_UPDATE, "document",
+                         "Documento actualizado", resource_id=document_id,
+                         metadata={"fields": sorted(document_data.dict(exclude_unset=True))})
             return document
         else:
             raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -168,6 +481,7 @@ async def update_document(
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: str,
+    request: Request,
     user_token: dict = Depends(verify_token)
 ):
     """Eliminar documento"""
@@ -176,6 +490,8 @@ async def delete_document(
         success = await document_service.delete_document(document_id, user_token['uid'])
         
         if success:
+            record_audit(request, user_token['uid'], ActionType.DOCUMENT_DELETE, "document",
+                         "Documento eliminado", resource_id=document_id)
             return {"message": "Documento eliminado correctamente", "document_id": document_id}
         else:
             raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -198,26 +514,36 @@ async def get_document_categories(user_token: dict = Depends(verify_token)):
 @router.get("/expiring/list", response_model=List[DocumentResponse])
 async def get_expiring_documents(
     days: int = Query(30, description="Días para considerar como 'por vencer'"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. name,category,created_at"),
     user_token: dict = Depends(verify_token)
 ):
     """Obtener documentos que vencen pronto"""
     try:
         document_service = DocumentService()
-        documents = await document_service.get_expiring_documents(user_token['uid'], days)
-        return documents
+        documents = await document_service.get_expiring_documents(
+            user_token['uid'], days, parse_fields(fields, DocumentResponse)
+        )
+        return TrustedJSONResponse(documents)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search/list", response_model=List[DocumentResponse])
 async def search_documents(
     q: str = Query(..., description="Término de búsqueda"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. name,category,created_at"),
     user_token: dict = Depends(verify_token)
 ):
     """Buscar documentos por texto"""
     try:
         document_service = DocumentService()
-        documents = await document_service.search_documents(user_token['uid'], q)
-        return documents
+        documents = await document_service.search_documents(
+            user_token['uid'], q, parse_fields(fields, DocumentResponse)
+        )
+        return TrustedJSONResponse(documents)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -227,6 +553,7 @@ async def get_drive_folder_structure(user_token: dict = Depends(verify_token)):
     try:
         # Obtener credenciales del usuario
         from app.services.oauth_service import GoogleOAuthService
+        from app.services.drive_service import get_drive_service
         
         oauth_service = GoogleOAuthService()
         user_credentials = await oauth_service.refresh_user_tokens(user_token['uid'])
@@ -238,7 +565,7 @@ async def get_drive_folder_structure(user_token: dict = Depends(verify_token)):
             )
         
         # Obtener estructura real de Google Drive
-        drive_service = GoogleDriveService(user_credentials)
+        drive_service = get_drive_service(user_credentials)
         folders = await drive_service.get_folder_structure()
         
         # Contar archivos en cada carpeta
@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List
+
+from app.utils.auth import verify_token
+from app.services.folder_service import FolderService, FolderCycleError, FolderNotEmptyError, tree_stamp_key
+from app.services.audit_service import record_audit
+from app.models.folder import FolderCreate, FolderUpdate, FolderResponse, FolderStructure
+from app.models.audit_log import ActionType
+from app.utils.conditional import make_etag, conditional_json, to_utc
+
+router = APIRouter()
+
+@router.get("/tree", response_model=List[FolderStructure])
+async def get_folder_tree(
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener el árbol de carpetas del usuario con sus conteos de documentos y subcarpetas"""
+    try:
+        user_id = user_token['uid']
+        folder_service = FolderService()
+
+        # Los sellos de carpetas y documentos se leen juntos y validan tanto el ETag como la caché
+        stamps = await folder_service.versions.get_versions(user_id)
+        key = tree_stamp_key(stamps)
+        # Sellos con y sin zona horaria: se comparan en UTC
+        updated = [to_utc(stamp['updated_at']) for stamp in (stamps.get('folders'), stamps.get('documents'))
+                   if stamp and stamp.get('updated_at') is not None]
+        return await conditional_json(
+            request,
+            lambda: folder_service.get_folder_tree(user_id, stamps),
+            make_etag('folders_tree', user_id, *key) if any(key) else None,
+            max(updated) if updated else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{folder_id}", response_model=FolderResponse)
+async def get_folder(
+    folder_id: str,
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener carpeta específica por ID"""
+    try:
+        folder_service = FolderService()
+        folder = await folder_service.get_folder_by_id(folder_id, user_token['uid'])
+
+        if folder:
+            return folder
+        else:
+            raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/", response_model=FolderResponse)
+async def create_folder(
+    folder_data: FolderCreate,
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Crear nueva carpeta"""
+    try:
+        folder_service = FolderService()
+        folder = await folder_service.create_folder(user_token['uid'], folder_data)
+        record_audit(request, user_token['uid'], ActionType.FOLDER_CREATE, "folder",
+                     f"Carpeta creada: {folder.name}", resource_id=folder.id)
+        return folder
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{folder_id}", response_model=FolderResponse)
+async def update_folder(
+    folder_id: str,
+    folder_data: FolderUpdate,
+    user_token: dict = Depends(verify_token)
+):
+    """Actualizar carpeta existente"""
+    try:
+        folder_service = FolderService()
+        folder = await folder_service.update_folder(folder_id, user_token['uid'], folder_data)
+
+        if folder:
+            return folder
+        else:
+            raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+
+    except HTTPException:
+        raise
+    except FolderCycleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{folder_id}")
+async def delete_folder(
+    folder_id: str,
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Eliminar carpeta"""
+    try:
+        folder_service = FolderService()
+        success = await folder_service.delete_folder(folder_id, user_token['uid'])
+
+        if success:
+            record_audit(request, user_token['uid'], ActionType.FOLDER_DELETE, "folder",
+                         "Carpeta eliminada", resource_id=folder_id)
+            return {"message": "Carpeta eliminada correctamente", "folder_id": folder_id}
+        else:
+            raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+
+    except HTTPException:
+        raise
+    except FolderNotEmptyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
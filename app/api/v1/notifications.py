@@ -1,19 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from typing import List, Optional
 
 from app.utils.auth import verify_token
 from app.services.notification_service import NotificationService
 from app.models.notification import NotificationCreate, NotificationResponse
+from app.utils.sparse_fields import parse_fields, InvalidFieldsError
+from app.utils.conditional import make_etag, conditional_json
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationResponse])
-async def get_notifications(user_token: dict = Depends(verify_token)):
+async def get_notifications(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. title,read,created_at"),
+    user_token: dict = Depends(verify_token)
+):
     """Obtener todas las notificaciones del usuario autenticado"""
     try:
+        user_id = user_token['uid']
+        field_list = parse_fields(fields, NotificationResponse)
         notification_service = NotificationService()
-        notifications = await notification_service.get_user_notifications(user_token['uid'])
-        return notifications
+        
+        # El sello se lee antes que los datos: ante una escritura intermedia el ETag queda atrasado, nunca adelantado
+        stamp = await notification_service.versions.get_version(user_id, 'notifications')
+        return await conditional_json(
+            request,
+            lambda: notification_service.get_user_notifications(user_id, field_list),
+            make_etag('notifications', user_id, stamp['version'], field_list) if stamp else None,
+            stamp.get('updated_at') if stamp else None
+        )
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,165 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from typing import List
+
+from app.utils.auth import verify_token
+from app.services.drive_sync_service import DriveSyncService, SyncInProgressError
+from app.services.backup_service import BackupService, BackupInProgressError
+from app.services.sync_conflict_service import SyncConflictService
+from app.services.storage_service import resolve_storage_name
+from app.services.user_service import UserService
+from app.services.audit_service import record_audit
+from app.models.backup_sync import (
+    BackupSyncResponse, BackupRequest, SyncStatus, SyncConflict, ConflictResolveRequest, ConflictResolveResult
+)
+from app.models.audit_log import ActionType
+
+router = APIRouter()
+
+async def _user_drive_service(user_id: str):
+    """Servicio de Drive del usuario o 401 si no autorizó el acceso"""
+    from app.services.oauth_service import GoogleOAuthService
+    from app.services.drive_service import get_drive_service
+
+    oauth_service = GoogleOAuthService()
+    user_credentials = await oauth_service.refresh_user_tokens(user_id)
+
+    if not user_credentials:
+        raise HTTPException(
+            status_code=401,
+            detail="Usuario no ha autorizado acceso a Google Drive. Use /api/v1/auth/google/authorize primero."
+        )
+    return get_drive_service(user_credentials)
+
+@router.post("/drive", response_model=BackupSyncResponse)
+async def sync_drive(
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Aplicar los cambios hechos en Google Drive desde la última sincronización"""
+    try:
+        drive_service = await _user_drive_service(user_token['uid'])
+        sync_service = DriveSyncService()
+        record = await sync_service.sync_user(user_token['uid'], drive_service)
+        record_audit(request, user_token['uid'], ActionType.GOOGLE_DRIVE_SYNC, "backup_sync",
+                     "Sincronización incremental de Google Drive", resource_id=record.id,
+                     metadata=record.stats, success=record.status != SyncStatus.FAILED,
+                     error_message=record.error_message)
+        return record
+
+    except HTTPException:
+        raise
+    except SyncInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/history", response_model=List[BackupSyncResponse])
+async def get_sync_history(
+    limit: int = Query(20, ge=1, le=100),
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener las últimas sincronizaciones del usuario"""
+    try:
+        sync_service = DriveSyncService()
+        return await sync_service.get_sync_history(user_token['uid'], limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/backup", response_model=BackupSyncResponse, status_code=202)
+async def create_backup(
+    options: BackupRequest,
+    background_tasks: BackgroundTasks,
+    user_token: dict = Depends(verify_token)
+):
+    """Iniciar un respaldo de los documentos; el progreso se consulta en GET /sync/{id}"""
+    try:
+        # Drive solo es obligatorio si es el almacenamiento del usuario
+        user_settings = await UserService().get_user_settings(user_token['uid'])
+        drive_service = None
+        if resolve_storage_name(user_settings) == 'drive':
+            drive_service = await _user_drive_service(user_token['uid'])
+        backup_service = BackupService()
+        record = await backup_service.start_backup(user_token['uid'], options)
+        background_tasks.add_task(backup_service.run_backup, record, drive_service)
+        return record
+
+    except HTTPException:
+        raise
+    except BackupInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/conflicts/detect", response_model=BackupSyncResponse, status_code=202)
+async def detect_conflicts(
+    background_tasks: BackgroundTasks,
+    user_token: dict = Depends(verify_token)
+):
+    """Comparar los documentos con Google Drive (md5 y fecha de modificación) en segundo plano"""
+    try:
+        drive_service = await _user_drive_service(user_token['uid'])
+        conflict_service = SyncConflictService()
+        record = await conflict_service.start_detection(user_token['uid'])
+        background_tasks.add_task(conflict_service.detect_conflicts, record, drive_service)
+        return record
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/conflicts", response_model=List[SyncConflict])
+async def get_conflicts(
+    limit: int = Query(100, ge=1, le=500),
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener los conflictos sin resolver"""
+    try:
+        conflict_service = SyncConflictService()
+        return await conflict_service.get_pending_conflicts(user_token['uid'], limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/conflicts/resolve", response_model=ConflictResolveResult)
+async def resolve_conflicts(
+    resolve_data: ConflictResolveRequest,
+    request: Request,
+    user_token: dict = Depends(verify_token)
+):
+    """Resolver varios conflictos en una llamada con keep_local o keep_remote"""
+    try:
+        drive_service = await _user_drive_service(user_token['uid'])
+        conflict_service = SyncConflictService()
+        result = await conflict_service.resolve_conflicts(
+            user_token['uid'], resolve_data.conflict_ids, resolve_data.resolution, drive_service
+        )
+        record_audit(request, user_token['uid'], ActionType.GOOGLE_DRIVE_SYNC, "sync_conflict",
+                     f"Conflictos resueltos con {resolve_data.resolution.value}",
+                     metadata={"resolved": len(result.resolved), "failed": len(result.failed)})
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{sync_id}", response_model=BackupSyncResponse)
+async def get_sync(
+    sync_id: str,
+    user_token: dict = Depends(verify_token)
+):
+    """Obtener un respaldo o sincronización con su progreso"""
+    try:
+        record = await BackupService().get_backup(sync_id, user_token['uid'])
+
+        if record:
+            return record
+        else:
+            raise HTTPException(status_code=404, detail="Registro no encontrado")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from typing import List
 
 from app.utils.auth import verify_token
 from app.services.user_service import UserService
 from app.models.user import UserCreate, UserUpdate, UserResponse, UserSettings
+from app.models.audit_log import ActionType
+from app.services.audit_service import record_audit
 
 router = APIRouter()
 
@@ -51,6 +53,7 @@ async def update_user_profile(
 @router.put("/settings")
 async def update_user_settings(
     settings: UserSettings,
+    request: Request,
     user_token: dict = Depends(verify_token)
 ):
     """Actualizar configuración del usuario"""
@@ -59,6 +62,9 @@ async def update_user_settings(
         success = await user_service.update_user_settings(user_token['uid'], settings)
         
         if success:
+            record_audit(request, user_token['uid'], ActionType.SETTINGS_UPDATE, "user",
+                         "Configuración actualizada", resource_id=user_token['uid'],
+                         metadata=settings.dict())
             return {"message": "Configuración actualizada correctamente"}
         else:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
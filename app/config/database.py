@@ -1,12 +1,17 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 from app.config.settings import settings
+from app.utils.firestore_tracking import TrackedFirestoreClient
 import os
 
+# Máximo de operaciones por lote de escritura en Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
 class DatabaseConfig:
     """Configuración de Firebase/Firestore"""
     
     _initialized = False
+    _client_override = None
     
     @classmethod
     def initialize_firebase(cls):
@@ -46,14 +51,23 @@ class DatabaseConfig:
     
     @classmethod
     def get_firestore_client(cls):
-        """Obtener cliente de Firestore"""
+        """Obtener cliente de Firestore (instrumentado para métricas)"""
+        if cls._client_override is not None:
+            return TrackedFirestoreClient(cls._client_override)
         if not cls._initialized:
             cls.initialize_firebase()
-        return firestore.client()
+        return TrackedFirestoreClient(firestore.client())
+    
+    @classmethod
+    def set_firestore_client(cls, client):
+        """Reemplazar el cliente de Firestore (p. ej. por InMemoryFirestore); None restaura el real"""
+        cls._client_override = client
     
     @classmethod
     def verify_firebase_token(cls, token: str):
         """Verificar token de Firebase Auth"""
+        if not cls._initialized:
+            cls.initialize_firebase()
         try:
             decoded_token = auth.verify_id_token(token, check_revoked=False)
             return decoded_token
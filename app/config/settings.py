@@ -29,6 +29,7 @@ class Settings(BaseSettings):
     host: str = os.getenv("BACKEND_HOST", "0.0.0.0")
     port: int = int(os.getenv("BACKEND_PORT", "8000"))
     debug: bool = os.getenv("DEBUG", "False").lower() == "true"
+    startup_warmup: str = os.getenv("STARTUP_WARMUP", "off")  # off | background | blocking
     
     # CORS Configuration
     cors_origins: list = ["*"]  # En producción, especificar dominios específicos
@@ -48,6 +49,77 @@ class Settings(BaseSettings):
         "application/pdf", "text/plain", 
         "application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     ]
+    batch_upload_max_files: int = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "20"))
+    analysis_max_concurrency: int = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+    
+    # Firestore Read Budget Configuration
+    firestore_read_budget: int = int(os.getenv("FIRESTORE_READ_BUDGET", "1000"))
+    firestore_read_budget_strict: bool = os.getenv("FIRESTORE_READ_BUDGET_STRICT", "False").lower() == "true"
+    
+    # User Cache Configuration
+    user_cache_max_entries: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    user_cache_ttl_seconds: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+    
+    # Folder Tree Cache Configuration
+    folder_tree_cache_max_entries: int = int(os.getenv("FOLDER_TREE_CACHE_MAX_ENTRIES", "1000"))
+    folder_tree_cache_ttl_seconds: float = float(os.getenv("FOLDER_TREE_CACHE_TTL_SECONDS", "600"))
+    
+    # Audit Log Configuration
+    audit_enabled: bool = os.getenv("AUDIT_ENABLED", "True").lower() == "true"
+    audit_flush_interval_ms: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "1000"))
+    audit_batch_size: int = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+    audit_queue_max: int = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+    audit_overflow_policy: str = os.getenv("AUDIT_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest | drop_newest
+    audit_retention_days: int = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+    audit_retention_chunk_size: int = int(os.getenv("AUDIT_RETENTION_CHUNK_SIZE", "200"))
+    audit_retention_pause_ms: int = int(os.getenv("AUDIT_RETENTION_PAUSE_MS", "200"))
+    audit_retention_max_deletes: int = int(os.getenv("AUDIT_RETENTION_MAX_DELETES", "50000"))
+    audit_rollup_max_days: int = int(os.getenv("AUDIT_ROLLUP_MAX_DAYS", "31"))
+    
+    # Reanalysis Job Configuration
+    reanalysis_page_size: int = int(os.getenv("REANALYSIS_PAGE_SIZE", "100"))
+    reanalysis_pause_ms: int = int(os.getenv("REANALYSIS_PAUSE_MS", "200"))
+    reanalysis_max_per_user: int = int(os.getenv("REANALYSIS_MAX_PER_USER", "500"))
+    
+    # Drive Sync Configuration
+    drive_sync_page_size: int = int(os.getenv("DRIVE_SYNC_PAGE_SIZE", "400"))
+    drive_sync_max_pages: int = int(os.getenv("DRIVE_SYNC_MAX_PAGES", "50"))
+    drive_sync_lease_seconds: int = int(os.getenv("DRIVE_SYNC_LEASE_SECONDS", "600"))
+    sync_conflict_page_size: int = int(os.getenv("SYNC_CONFLICT_PAGE_SIZE", "1000"))
+    
+    # Storage Configuration
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "drive")  # drive | s3 | local (UserSettings.storage_backend lo sustituye)
+    storage_local_dir: str = os.getenv("STORAGE_LOCAL_DIR", "storage")
+    storage_s3_bucket: str = os.getenv("STORAGE_S3_BUCKET", "")
+    storage_s3_prefix: str = os.getenv("STORAGE_S3_PREFIX", "keepi-documents")
+    storage_s3_endpoint_url: Optional[str] = os.getenv("STORAGE_S3_ENDPOINT_URL")
+    storage_s3_part_size_mb: int = int(os.getenv("STORAGE_S3_PART_SIZE_MB", "8"))
+    storage_s3_upload_concurrency: int = int(os.getenv("STORAGE_S3_UPLOAD_CONCURRENCY", "4"))
+    
+    # Thumbnail Configuration
+    thumbnails_enabled: bool = os.getenv("THUMBNAILS_ENABLED", "True").lower() == "true"
+    thumbnail_max_px: int = int(os.getenv("THUMBNAIL_MAX_PX", "320"))
+    thumbnail_format: str = os.getenv("THUMBNAIL_FORMAT", "webp")  # webp | jpeg
+    thumbnail_quality: int = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+    thumbnail_cache_max_age_seconds: int = int(os.getenv("THUMBNAIL_CACHE_MAX_AGE_SECONDS", "2592000"))
+    
+    # Content Cache Configuration
+    content_cache_dir: str = os.getenv("CONTENT_CACHE_DIR", "cache/content")
+    content_cache_max_mb: int = int(os.getenv("CONTENT_CACHE_MAX_MB", "1024"))  # por proceso; 0 desactiva la caché
+    content_cache_max_file_mb: int = int(os.getenv("CONTENT_CACHE_MAX_FILE_MB", "100"))
+    content_stream_chunk_kb: int = int(os.getenv("CONTENT_STREAM_CHUNK_KB", "1024"))
+    
+    # Backup Configuration
+    backup_sink: str = os.getenv("BACKUP_SINK", "local")  # local | s3
+    backup_local_dir: str = os.getenv("BACKUP_LOCAL_DIR", "backups")
+    backup_s3_bucket: str = os.getenv("BACKUP_S3_BUCKET", "")
+    backup_s3_prefix: str = os.getenv("BACKUP_S3_PREFIX", "keepi-backups")
+    backup_s3_endpoint_url: Optional[str] = os.getenv("BACKUP_S3_ENDPOINT_URL")
+    backup_s3_part_size_mb: int = int(os.getenv("BACKUP_S3_PART_SIZE_MB", "8"))
+    backup_page_size: int = int(os.getenv("BACKUP_PAGE_SIZE", "100"))
+    backup_download_chunk_kb: int = int(os.getenv("BACKUP_DOWNLOAD_CHUNK_KB", "1024"))
+    backup_progress_interval_seconds: float = float(os.getenv("BACKUP_PROGRESS_INTERVAL_SECONDS", "5"))
+    backup_lease_seconds: int = int(os.getenv("BACKUP_LEASE_SECONDS", "3600"))
     
     # Cloudinary Configuration
     cloudinary_cloud_name: str = os.getenv("CLOUDINARY_CLOUD_NAME", "")
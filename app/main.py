@@ -1,20 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from starlette.concurrency import run_in_threadpool
 
 from app.config.settings import settings
 from app.config.database import DatabaseConfig
 from app.utils.auth import verify_token
+from app.utils.metrics import MetricsMiddleware
+from app.utils.firestore_tracking import FirestoreBudgetMiddleware
+from app.services.audit_service import audit_writer
 
-# Inicializar Firebase
-DatabaseConfig.initialize_firebase()
+# Dependencias pesadas que las rutas importan al primer uso (Drive, OAuth, OCR y miniaturas)
+WARMUP_MODULES = (
+    "app.services.drive_service",
+    "google_auth_oauthlib.flow",
+    "PIL.Image",
+    "pytesseract",
+    "pypdfium2"
+)
+
+def warm_up() -> None:
+    """Importar de antemano las dependencias diferidas (bloqueante: corre en el pool de hilos)"""
+    started = time.perf_counter()
+    for module in WARMUP_MODULES:
+        try:
+            # __import__ (y no importlib) para que -X importtime registre la precarga
+            __import__(module)
+        except ImportError as e:
+            print(f"⚠️ Precarga de {module} omitida: {e}")
+    print(f"🔥 Dependencias precargadas en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicializar Firebase, arrancar el escritor de auditoría y, según STARTUP_WARMUP, precargar dependencias
+
+    Con "blocking" el servidor acepta tráfico cuando ya está todo cargado; con "background"
+    acepta tráfico enseguida y la precarga sigue en un hilo.
+    """
+    DatabaseConfig.initialize_firebase()
+    audit_writer.start()
+    warmup = None
+    if settings.startup_warmup == "blocking":
+        await run_in_threadpool(warm_up)
+    elif settings.startup_warmup == "background":
+        warmup = asyncio.create_task(run_in_threadpool(warm_up))
+    yield
+    if warmup is not None:
+        await warmup
+    await audit_writer.stop()
 
 # Crear aplicación FastAPI
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
     version=settings.api_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -26,6 +71,13 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
+# Cabeceras de lecturas/escrituras (modo debug) y presupuesto estricto (modo test)
+if settings.debug or settings.firestore_read_budget_strict:
+    app.add_middleware(FirestoreBudgetMiddleware)
+
+# Métricas de latencia por ruta y operaciones por petición
+app.add_middleware(MetricsMiddleware)
+
 # Endpoints básicos
 @app.get("/")
 async def root():
@@ -45,14 +97,22 @@ async def health_check():
         "version": settings.api_version
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Importar routers
-from app.api.v1 import auth, documents, notifications, users
+from app.api.v1 import audit_logs, auth, documents, folders, notifications, sync, users
 
 # Incluir routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["Documents"])
+app.include_router(folders.router, prefix="/api/v1/folders", tags=["Folders"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
+app.include_router(audit_logs.router, prefix="/api/v1/audit-logs", tags=["Audit Logs"])
+app.include_router(sync.router, prefix="/api/v1/sync", tags=["Sync"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,6 +1,14 @@
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from enum import Enum
+
+class AnalysisTier(str, Enum):
+    """Niveles de análisis, de menor a mayor costo"""
+    NONE = "none"
+    FILENAME = "filename"
+    TEXT = "text"
+    OCR = "ocr"
 
 class AIAnalysisBase(BaseModel):
     """Modelo base para análisis de AI"""
@@ -17,7 +25,12 @@ class AIAnalysisCreate(AIAnalysisBase):
     document_number: Optional[str] = None
     organization: Optional[str] = None
     processing_time_ms: Optional[int] = None
+    stage_timings_ms: Optional[Dict[str, float]] = None
+    analysis_tier: Optional[AnalysisTier] = None
+    cpu_time_ms: Optional[float] = None
     ai_model_version: Optional[str] = None
+    stage_versions: Optional[Dict[str, str]] = None
+    analysis_version: Optional[int] = None
 
 class AIAnalysisUpdate(BaseModel):
     """Modelo para actualizar análisis de AI"""
@@ -39,7 +52,12 @@ class AIAnalysisResponse(AIAnalysisBase):
     document_number: Optional[str] = None
     organization: Optional[str] = None
     processing_time_ms: Optional[int] = None
+    stage_timings_ms: Optional[Dict[str, float]] = None
+    analysis_tier: Optional[AnalysisTier] = None
+    cpu_time_ms: Optional[float] = None
     ai_model_version: Optional[str] = None
+    stage_versions: Optional[Dict[str, str]] = None
+    analysis_version: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
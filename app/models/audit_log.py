@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
 
@@ -12,6 +12,7 @@ class ActionType(str, Enum):
     FOLDER_DELETE = "folder_delete"
     GOOGLE_DRIVE_CONNECT = "google_drive_connect"
     GOOGLE_DRIVE_DISCONNECT = "google_drive_disconnect"
+    GOOGLE_DRIVE_SYNC = "google_drive_sync"
     AI_ANALYSIS = "ai_analysis"
     USER_LOGIN = "user_login"
     USER_LOGOUT = "user_logout"
@@ -50,3 +51,18 @@ class AuditLogFilter(BaseModel):
     end_date: Optional[datetime] = None
     success_only: Optional[bool] = None
     limit: int = 100
+
+class AuditLogPage(BaseModel):
+    """Página de logs de auditoría con el cursor de la siguiente"""
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
+class AuditDailySummary(BaseModel):
+    """Resumen diario de auditoría de un usuario"""
+    user_id: str
+    date: str  # YYYY-MM-DD
+    total: int = 0
+    success: int = 0
+    failure: int = 0
+    by_action: Dict[str, Dict[str, int]] = {}  # action_type -> {"success": n, "failure": n}
+    updated_at: Optional[datetime] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -17,6 +17,18 @@ class BackupType(str, Enum):
     INCREMENTAL = "incremental"
     SELECTIVE = "selective"
 
+class ConflictType(str, Enum):
+    """Tipos de conflicto entre un documento de Keepi y su archivo de Drive"""
+    MODIFIED = "modified"
+    DELETED = "deleted"
+    RENAMED = "renamed"
+
+class ConflictResolution(str, Enum):
+    """Resoluciones de un conflicto"""
+    KEEP_LOCAL = "keep_local"
+    KEEP_REMOTE = "keep_remote"
+    MERGE = "merge"
+
 class BackupSyncBase(BaseModel):
     """Modelo base para respaldo y sincronización"""
     user_id: str
@@ -28,6 +40,15 @@ class BackupSyncCreate(BackupSyncBase):
     """Modelo para crear respaldo/sincronización"""
     source_paths: Optional[List[str]] = None
     destination_folder_id: Optional[str] = None
+    backup_type: Optional[BackupType] = None
+    include_deleted: bool = False
+    compression: bool = True
+    encryption: bool = False
+
+class BackupRequest(BaseModel):
+    """Opciones de un respaldo pedido por el usuario"""
+    backup_type: BackupType = BackupType.INCREMENTAL
+    description: Optional[str] = None
     include_deleted: bool = False
     compression: bool = True
     encryption: bool = False
@@ -42,6 +63,7 @@ class BackupSyncUpdate(BaseModel):
 class BackupSyncResponse(BackupSyncBase):
     """Modelo de respuesta para respaldo/sincronización"""
     id: str
+    backup_type: Optional[BackupType] = None
     source_paths: Optional[List[str]] = None
     destination_folder_id: Optional[str] = None
     include_deleted: bool
@@ -49,6 +71,9 @@ class BackupSyncResponse(BackupSyncBase):
     encryption: bool
     progress_percentage: float = 0.0
     error_message: Optional[str] = None
+    stats: Optional[Dict[str, int]] = None
+    archive_location: Optional[str] = None
+    watermark: Optional[datetime] = None
     started_at: datetime
     completed_at: Optional[datetime] = None
     created_at: datetime
@@ -59,10 +84,22 @@ class SyncConflict(BaseModel):
     id: str
     backup_sync_id: str
     user_id: str
+    document_id: Optional[str] = None
+    drive_file_id: Optional[str] = None
     file_path: str
-    conflict_type: str  # "modified", "deleted", "renamed"
+    conflict_type: ConflictType
     local_version: Optional[Dict[str, Any]] = None
     remote_version: Optional[Dict[str, Any]] = None
-    resolution: Optional[str] = None  # "keep_local", "keep_remote", "merge"
+    resolution: Optional[ConflictResolution] = None
     created_at: datetime
     resolved_at: Optional[datetime] = None
+
+class ConflictResolveRequest(BaseModel):
+    """Resolver varios conflictos con la misma decisión"""
+    conflict_ids: List[str] = Field(..., min_length=1, max_length=200)
+    resolution: ConflictResolution
+
+class ConflictResolveResult(BaseModel):
+    """Resultado de una resolución en bloque"""
+    resolved: List[str] = []
+    failed: Dict[str, str] = {}
@@ -20,6 +20,17 @@ class DocumentCreate(DocumentBase):
     drive_file_id: Optional[str] = None
     drive_folder_id: Optional[str] = None
 
+class StoredDocumentCreate(DocumentCreate):
+    """Documento creado por la subida: incluye las referencias internas del archivo guardado
+
+    No se acepta desde el cliente; solo la ruta de subida completa estos campos.
+    """
+    drive_md5_checksum: Optional[str] = None
+    drive_modified_time: Optional[str] = None
+    storage_backend: Optional[str] = None  # None equivale a "drive"
+    storage_key: Optional[str] = None
+    thumbnail_etag: Optional[str] = None  # None: el documento no tiene miniatura
+
 class DocumentUpdate(BaseModel):
     """Modelo para actualizar documento"""
     name: Optional[str] = None
@@ -48,6 +59,11 @@ class DocumentResponse(DocumentBase):
     tags: Optional[List[str]] = None
     drive_file_id: Optional[str] = None
     drive_folder_id: Optional[str] = None
+    drive_md5_checksum: Optional[str] = None
+    drive_modified_time: Optional[str] = None
+    storage_backend: Optional[str] = None  # None equivale a "drive"
+    storage_key: Optional[str] = None
+    thumbnail_etag: Optional[str] = None  # None: el documento no tiene miniatura
     is_archived: bool = False
     is_favorite: bool = False
     created_at: datetime
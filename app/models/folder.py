@@ -49,6 +49,7 @@ class FolderStructure(BaseModel):
     category: str
     drive_folder_id: str
     documents_count: int
+    subfolders_count: int = 0
     subfolders: List['FolderStructure'] = []
     created_at: datetime
     updated_at: datetime
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Literal
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -36,6 +36,7 @@ class UserSettings(BaseModel):
     ai_analysis_enabled: bool = True
     auto_categorization: bool = True
     drive_sync_enabled: bool = False
+    storage_backend: Optional[Literal["drive", "s3"]] = None  # None usa el de la implantación (que puede ser "local")
     sync_frequency: str = "daily"
     encryption_enabled: bool = False
     two_factor_auth: bool = False
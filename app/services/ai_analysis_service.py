@@ -1,10 +1,64 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import tempfile
 import os
-from PIL import Image
-import pytesseract
+import time
 from datetime import datetime, timedelta
-import re
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage
+    resource = None
+from starlette.concurrency import run_in_threadpool
+from app.utils.text_classifier import classify_text, CLASSIFIER_VERSION
+from app.utils.metadata_extractor import extract_metadata_fields, MAX_SCAN_CHARS, EXTRACTOR_VERSION
+from app.utils.metrics import (
+    ANALYSIS_STAGE_SECONDS, ANALYSIS_SECONDS, ANALYSIS_TIER_SECONDS, ANALYSIS_TIER_CPU_SECONDS,
+    content_type_label, record_operation
+)
+from app.models.ai_analysis import AIAnalysisCreate, AnalysisTier
+from app.models.user import UserSettings
+from app.utils.pdfium import pdfium_lock, load_pdfium
+
+# Versión de la lógica de cada etapa; el reanálisis rehace solo las etapas cuya versión cambió
+STAGE_VERSIONS = {"extract": "1.0.0", "classify": CLASSIFIER_VERSION, "metadata": EXTRACTOR_VERSION}
+
+# Versión global de los análisis: subirla junto con cualquier versión de STAGE_VERSIONS
+AI_MODEL_VERSION = "1.0.0"
+
+# Orden de los niveles, de menor a mayor costo
+TIER_ORDER = [AnalysisTier.NONE, AnalysisTier.FILENAME, AnalysisTier.TEXT, AnalysisTier.OCR]
+
+def _cpu_timed(func, *args) -> Tuple[Any, int]:
+    """Ejecutar func y devolver su resultado y el tiempo de CPU (ns) del hilo que la ejecutó"""
+    cpu_started = time.thread_time_ns()
+    result = func(*args)
+    return result, time.thread_time_ns() - cpu_started
+
+
+def _children_cpu_ns() -> int:
+    """CPU (ns) acumulada por los subprocesos terminados del proceso; 0 si no hay getrusage"""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return int((usage.ru_utime + usage.ru_stime) * 1e9)
+
+
+def _cpu_timed_with_children(func, *args) -> Tuple[Any, int]:
+    """Como _cpu_timed, sumando la CPU de los subprocesos que func lanza y espera (tesseract)
+
+    RUSAGE_CHILDREN es de todo el proceso: con varios OCR en paralelo, un subproceso que
+    termina durante la llamada se cuenta aunque lo haya lanzado otro hilo.
+    """
+    children_started = _children_cpu_ns()
+    result, cpu_ns = _cpu_timed(func, *args)
+    return result, cpu_ns + _children_cpu_ns() - children_started
+
+
+def resolve_analysis_tier(user_settings: UserSettings, requested: Optional[AnalysisTier] = None) -> AnalysisTier:
+    """Elegir el nivel de análisis: el solicitado, sin superar lo que permite la configuración del usuario"""
+    allowed = AnalysisTier.OCR if user_settings.ai_analysis_enabled else AnalysisTier.NONE
+    if requested is None:
+        return allowed
+    return min(requested, allowed, key=TIER_ORDER.index)
 
 class DocumentAnalysisService:
     """Servicio para análisis automático de documentos usando AI"""
@@ -14,48 +68,72 @@ class DocumentAnalysisService:
         # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         pass
     
-    async def analyze_document(self, content: bytes, content_type: str, filename: str) -> Dict[str, Any]:
-        """Analizar documento y extraer información automáticamente"""
+    async def analyze_document(self, content: bytes, content_type: str, filename: str,
+                               tier: AnalysisTier = AnalysisTier.OCR,
+                               categorize: bool = True) -> Dict[str, Any]:
+        """Analizar documento y extraer información automáticamente
+        
+        El nivel (tier) decide qué etapas se ejecutan; las etapas omitidas no consumen CPU.
+        El tiempo de CPU suma el de cada etapa sincrónica, medido en el hilo que la ejecuta:
+        medirlo a través de los await incluiría el trabajo de otras peticiones del event loop.
+        El OCR suma además la CPU del subproceso de tesseract.
+        """
+        started = time.perf_counter_ns()
+        stage_ns: Dict[str, int] = {}
+        cpu_ns = 0
         try:
-            # Extraer texto del documento
-            extracted_text = await self._extract_text(content, content_type, filename)
-            
-            # Clasificar documento
-            suggested_category = await self._classify_document(extracted_text, filename)
-            
-            # Extraer metadatos
-            metadata = await self._extract_metadata(extracted_text)
-            
-            # Generar tags
-            tags = await self._generate_tags(extracted_text, suggested_category)
+            # Extraer texto del documento (el OCR solo en el nivel completo)
+            extracted_text = ""
+            if tier in (AnalysisTier.TEXT, AnalysisTier.OCR):
+                stage_started = time.perf_counter_ns()
+                extracted_text, extract_cpu_ns = await self._extract_text(
+                    content, content_type, filename, ocr=tier == AnalysisTier.OCR
+                )
+                stage_ns["extract"] = time.perf_counter_ns() - stage_started
+                cpu_ns += extract_cpu_ns
             
-            # Calcular confianza
-            confidence_score = await self._calculate_confidence(extracted_text, suggested_category)
+            # Clasificar documento, generar tags y calcular confianza en una sola pasada
+            suggested_category = "General"
+            tags: List[str] = []
+            confidence_score = 0.0
+            if tier != AnalysisTier.NONE and categorize:
+                stage_started = time.perf_counter_ns()
+                classification, classify_cpu_ns = _cpu_timed(classify_text, extracted_text, filename)
+                stage_ns["classify"] = time.perf_counter_ns() - stage_started
+                cpu_ns += classify_cpu_ns
+                suggested_category = classification["category"]
+                tags = classification["tags"]
+                confidence_score = classification["confidence"]
             
-            # Extraer fecha de vencimiento
-            expiry_date = await self._extract_expiry_date(extracted_text)
-            
-            # Extraer número de documento
-            document_number = await self._extract_document_number(extracted_text)
-            
-            # Extraer organización
-            organization = await self._extract_organization(extracted_text)
+            # Extraer metadatos, vencimiento, número de documento y organización en una sola pasada
+            fields = {"metadata": {}, "expiry_date": None, "document_number": None, "organization": None}
+            if extracted_text:
+                stage_started = time.perf_counter_ns()
+                fields, metadata_cpu_ns = _cpu_timed(extract_metadata_fields, extracted_text)
+                stage_ns["metadata"] = time.perf_counter_ns() - stage_started
+                cpu_ns += metadata_cpu_ns
             
+            total_ns = time.perf_counter_ns() - started
             return {
                 "suggested_category": suggested_category,
                 "confidence_score": confidence_score,
                 "extracted_text": extracted_text,
-                "metadata": metadata,
+                "metadata": fields["metadata"],
                 "tags": tags,
-                "expiry_date": expiry_date,
-                "document_number": document_number,
-                "organization": organization,
-                "processing_time_ms": 0,  # TODO: Implementar medición de tiempo
-                "ai_model_version": "1.0.0"
+                "expiry_date": fields["expiry_date"],
+                "document_number": fields["document_number"],
+                "organization": fields["organization"],
+                "processing_time_ms": round(total_ns / 1_000_000),
+                "stage_timings_ms": self._record_timings(stage_ns, total_ns, cpu_ns, content_type, tier),
+                "analysis_tier": tier.value,
+                "cpu_time_ms": round(cpu_ns / 1_000_000, 3),
+                "ai_model_version": AI_MODEL_VERSION,
+                "stage_versions": dict(STAGE_VERSIONS)
             }
-            
+        
         except Exception as e:
             print(f"Error analizando documento: {e}")
+            total_ns = time.perf_counter_ns() - started
             # Retornar análisis básico en caso de error
             return {
                 "suggested_category": "General",
@@ -66,261 +144,166 @@ class DocumentAnalysisService:
                 "expiry_date": None,
                 "document_number": None,
                 "organization": None,
-                "processing_time_ms": 0,
-                "ai_model_version": "1.0.0"
+                "processing_time_ms": round(total_ns / 1_000_000),
+                "stage_timings_ms": self._record_timings(stage_ns, total_ns, cpu_ns, content_type, tier),
+                "analysis_tier": tier.value,
+                "cpu_time_ms": round(cpu_ns / 1_000_000, 3),
+                "ai_model_version": AI_MODEL_VERSION,
+                "stage_versions": dict(STAGE_VERSIONS)
             }
     
-    async def _extract_text(self, content: bytes, content_type: str, filename: str) -> str:
-        """Extraer texto del documento según su tipo"""
+    def _record_timings(self, stage_ns: Dict[str, int], total_ns: int, cpu_ns: int,
+                        content_type: str, tier: AnalysisTier) -> Dict[str, float]:
+        """Exportar los tiempos como histogramas y devolverlos en milisegundos"""
+        label = content_type_label(content_type)
+        for stage, elapsed in stage_ns.items():
+            ANALYSIS_STAGE_SECONDS.labels(stage=stage, content_type=label).observe(elapsed / 1e9)
+        ANALYSIS_SECONDS.labels(content_type=label).observe(total_ns / 1e9)
+        ANALYSIS_TIER_SECONDS.labels(tier=tier.value).observe(total_ns / 1e9)
+        ANALYSIS_TIER_CPU_SECONDS.labels(tier=tier.value).observe(cpu_ns / 1e9)
+        return {stage: round(elapsed / 1e6, 3) for stage, elapsed in stage_ns.items()}
+    
+    async def save_analyses(self, user_id: str, analyses: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Guardar los análisis (con sus tiempos por etapa) en la colección ai_analysis"""
+        try:
+            from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+            
+            db = DatabaseConfig.get_firestore_client()
+            batch = db.batch()
+            pending = 0
+            
+            for document_id, analysis in analyses:
+                record = AIAnalysisCreate(
+                    document_id=document_id,
+                    suggested_category=analysis['suggested_category'],
+                    confidence_score=analysis['confidence_score'],
+                    extracted_text=(analysis.get('extracted_text') or '')[:MAX_SCAN_CHARS],
+                    metadata=analysis.get('metadata'),
+                    tags=analysis.get('tags'),
+                    expiry_date=analysis.get('expiry_date'),
+                    document_number=analysis.get('document_number'),
+                    organization=analysis.get('organization'),
+                    processing_time_ms=analysis.get('processing_time_ms'),
+                    stage_timings_ms=analysis.get('stage_timings_ms'),
+                    analysis_tier=analysis.get('analysis_tier'),
+                    cpu_time_ms=analysis.get('cpu_time_ms'),
+                    ai_model_version=analysis.get('ai_model_version'),
+                    stage_versions=analysis.get('stage_versions'),
+                    analysis_version=1
+                ).dict()
+                record['user_id'] = user_id
+                record['created_at'] = datetime.now()
+                record['updated_at'] = datetime.now()
+                
+                batch.set(db.collection('ai_analysis').document(), record)
+                pending += 1
+                
+                if pending == FIRESTORE_BATCH_LIMIT:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+            
+            if pending:
+                batch.commit()
+        except Exception as e:
+            # El registro del análisis no debe impedir la subida del documento
+            print(f"Error guardando análisis: {e}")
+    
+    async def _extract_text(self, content: bytes, content_type: str, filename: str,
+                            ocr: bool = True) -> Tuple[str, int]:
+        """Extraer texto del documento según su tipo
+        
+        Devuelve el texto y el tiempo de CPU (ns) de la extracción, medido en el hilo que la ejecuta
+        (y en el subproceso de tesseract, en el OCR).
+        """
         try:
             if content_type.startswith('image/'):
-                # Procesar imagen con OCR
+                # Procesar imagen con OCR; sin OCR una imagen no tiene capa de texto
+                if not ocr:
+                    return "", 0
                 return await self._extract_text_from_image(content)
             elif content_type == 'application/pdf':
-                # Por ahora, retornar nombre del archivo (sin PyMuPDF)
-                return f"PDF: {filename}"
+                # Capa de texto del PDF (sin OCR de páginas escaneadas)
+                return await run_in_threadpool(_cpu_timed, self._pdf_text, content, filename)
             else:
                 # Para otros tipos, intentar decodificar como texto
-                try:
-                    return content.decode('utf-8')
-                except:
-                    return f"Archivo: {filename}"
+                return _cpu_timed(self._decode_text, content, filename)
                     
         except Exception as e:
             print(f"Error extrayendo texto: {e}")
-            return f"Error extrayendo texto: {filename}"
+            return f"Error extrayendo texto: {filename}", 0
     
-    async def _extract_text_from_image(self, content: bytes) -> str:
+    async def _extract_text_from_image(self, content: bytes) -> Tuple[str, int]:
         """Extraer texto de imagen usando OCR"""
         try:
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Abrir imagen con Pillow
-                image = Image.open(temp_file_path)
-                
-                # Extraer texto con Tesseract
-                text = pytesseract.image_to_string(image, lang='spa+eng')
-                
-                # Limpiar archivo temporal
-                os.unlink(temp_file_path)
-                
-                return text.strip()
-                
-            except Exception as e:
-                # Limpiar archivo temporal en caso de error
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                raise e
-                
+            # El OCR es bloqueante: se ejecuta en el pool de hilos para no frenar el event loop;
+            # casi toda su CPU la consume el subproceso de tesseract
+            return await run_in_threadpool(_cpu_timed_with_children, self._ocr_image, content)
         except Exception as e:
             print(f"Error en OCR: {e}")
-            return "Error en OCR"
-    
-    async def _classify_document(self, text: str, filename: str) -> str:
-        """Clasificar documento basado en contenido y nombre"""
-        text_lower = text.lower()
-        filename_lower = filename.lower()
-        
-        # Palabras clave para clasificación
-        keywords = {
-            "Factura": ["factura", "invoice", "bill", "recibo", "pago"],
-            "Contrato": ["contrato", "contract", "acuerdo", "convenio"],
-            "Identificación": ["dni", "pasaporte", "carnet", "identidad", "id"],
-            "Recibo": ["recibo", "comprobante", "voucher", "ticket"],
-            "Documento Legal": ["legal", "judicial", "notarial", "oficial"],
-            "Certificado": ["certificado", "certificate", "diploma", "título"],
-            "Reporte": ["reporte", "report", "informe", "estudio"],
-            "Manual": ["manual", "guía", "instrucciones", "tutorial"]
-        }
-        
-        # Buscar coincidencias
-        for category, words in keywords.items():
-            for word in words:
-                if word in text_lower or word in filename_lower:
-                    return category
-        
-        # Si no hay coincidencias, clasificar por extensión
-        if filename.endswith('.pdf'):
-            return "Documento PDF"
-        elif filename.endswith(('.jpg', '.jpeg', '.png')):
-            return "Imagen"
-        else:
-            return "General"
-    
-    async def _extract_metadata(self, text: str) -> Dict[str, Any]:
-        """Extraer metadatos del texto"""
-        metadata = {}
-        
-        # Buscar fechas
-        date_patterns = [
-            r'\d{1,2}/\d{1,2}/\d{4}',  # DD/MM/YYYY
-            r'\d{1,2}-\d{1,2}-\d{4}',  # DD-MM-YYYY
-            r'\d{4}-\d{1,2}-\d{1,2}',  # YYYY-MM-DD
-        ]
-        
-        dates_found = []
-        for pattern in date_patterns:
-            dates = re.findall(pattern, text)
-            dates_found.extend(dates)
-        
-        if dates_found:
-            metadata['fechas_encontradas'] = list(set(dates_found))
-        
-        # Buscar montos
-        amount_patterns = [
-            r'S/\.\s*\d+[,.]?\d*',  # S/. 150.00
-            r'\$\s*\d+[,.]?\d*',    # $ 150.00
-            r'\d+[,.]?\d*\s*USD',   # 150.00 USD
-        ]
-        
-        amounts_found = []
-        for pattern in amount_patterns:
-            amounts = re.findall(pattern, text)
-            amounts_found.extend(amounts)
-        
-        if amounts_found:
-            metadata['montos'] = list(set(amounts_found))
-        
-        # Buscar números de documento
-        doc_patterns = [
-            r'[A-Z]{1,3}-\d{4,}',  # F001-2024
-            r'[A-Z]{1,3}\d{4,}',   # F0012024
-            r'\d{4,}',              # 2024001
-        ]
-        
-        doc_numbers = []
-        for pattern in doc_patterns:
-            numbers = re.findall(pattern, text)
-            doc_numbers.extend(numbers)
-        
-        if doc_numbers:
-            metadata['numeros_documento'] = list(set(doc_numbers))
-        
-        return metadata
-    
-    async def _generate_tags(self, text: str, category: str) -> List[str]:
-        """Generar tags automáticamente"""
-        tags = [category.lower()]
-        
-        # Agregar tags basados en el texto
-        text_lower = text.lower()
-        
-        # Tags comunes
-        common_tags = {
-            "urgente": ["urgente", "inmediato", "asap"],
-            "importante": ["importante", "crítico", "prioritario"],
-            "confidencial": ["confidencial", "privado", "secreto"],
-            "borrador": ["borrador", "draft", "temporal"]
-        }
-        
-        for tag, keywords in common_tags.items():
-            if any(keyword in text_lower for keyword in keywords):
-                tags.append(tag)
-        
-        # Agregar tags por categoría
-        category_tags = {
-            "Factura": ["pago", "comercial", "servicio"],
-            "Contrato": ["legal", "acuerdo", "obligatorio"],
-            "Identificación": ["personal", "oficial", "identidad"],
-            "Recibo": ["comprobante", "pago", "transacción"]
-        }
-        
-        if category in category_tags:
-            tags.extend(category_tags[category])
-        
-        return list(set(tags))[:10]  # Máximo 10 tags
-    
-    async def _calculate_confidence(self, text: str, category: str) -> float:
-        """Calcular nivel de confianza de la clasificación"""
-        if not text or text.strip() == "":
-            return 0.1
-        
-        # Factores de confianza
-        text_length = len(text)
-        category_keywords = self._get_category_keywords(category)
-        
-        # Contar palabras clave encontradas
-        matches = 0
-        text_lower = text.lower()
-        for keyword in category_keywords:
-            if keyword in text_lower:
-                matches += 1
-        
-        # Calcular confianza
-        keyword_confidence = matches / len(category_keywords) if category_keywords else 0
-        length_confidence = min(text_length / 1000, 1.0)  # Normalizar por longitud
-        
-        # Promedio ponderado
-        confidence = (keyword_confidence * 0.7) + (length_confidence * 0.3)
-        
-        return round(confidence, 2)
+            return "Error en OCR", 0
     
-    def _get_category_keywords(self, category: str) -> List[str]:
-        """Obtener palabras clave para una categoría"""
-        keywords = {
-            "Factura": ["factura", "invoice", "bill", "recibo", "pago", "total", "subtotal"],
-            "Contrato": ["contrato", "contract", "acuerdo", "convenio", "partes", "cláusula"],
-            "Identificación": ["dni", "pasaporte", "carnet", "identidad", "nacionalidad"],
-            "Recibo": ["recibo", "comprobante", "voucher", "ticket", "pago", "fecha"],
-            "Documento Legal": ["legal", "judicial", "notarial", "oficial", "gobierno"],
-            "Certificado": ["certificado", "certificate", "diploma", "título", "acreditación"],
-            "Reporte": ["reporte", "report", "informe", "estudio", "análisis"],
-            "Manual": ["manual", "guía", "instrucciones", "tutorial", "procedimiento"]
-        }
-        
-        return keywords.get(category, [])
-    
-    async def _extract_expiry_date(self, text: str) -> Optional[str]:
-        """Extraer fecha de vencimiento del texto"""
-        # Buscar patrones de fecha de vencimiento
-        expiry_patterns = [
-            r'venc[ei]miento[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'expir[ae][:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'validez[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
-            r'vigencia[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})'
-        ]
-        
-        for pattern in expiry_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+    def _decode_text(self, content: bytes, filename: str) -> str:
+        """Decodificar el archivo como texto UTF-8"""
+        try:
+            return content.decode('utf-8')
+        except:
+            return f"Archivo: {filename}"
     
-    async def _extract_document_number(self, text: str) -> Optional[str]:
-        """Extraer número de documento del texto"""
-        # Buscar patrones de número de documento
-        doc_patterns = [
-            r'[Nn]úmero[:\s]*([A-Z]{1,3}[-]?\d{4,})',
-            r'[Cc]ódigo[:\s]*([A-Z]{1,3}[-]?\d{4,})',
-            r'[Rr]eferencia[:\s]*([A-Z]{1,3}[-]?\d{4,})',
-            r'[Ii]D[:\s]*([A-Z]{1,3}[-]?\d{4,})'
-        ]
-        
-        for pattern in doc_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+    def _pdf_text(self, content: bytes, filename: str) -> str:
+        """Leer la capa de texto del PDF con pypdfium2 (bloqueante)
+
+        Sin pypdfium2, o si el PDF no tiene texto (escaneado), se usa el nombre del archivo.
+        """
+        pdfium = load_pdfium()
+        if pdfium is None:
+            return f"PDF: {filename}"
+
+        parts = []
+        length = 0
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(content)
+            try:
+                for index in range(len(pdf)):
+                    page = pdf[index]
+                    textpage = page.get_textpage()
+                    try:
+                        text = textpage.get_text_range()
+                    finally:
+                        textpage.close()
+                        page.close()
+                    parts.append(text)
+                    length += len(text)
+                    # Más allá de lo que se analiza no hace falta seguir leyendo páginas
+                    if length >= MAX_SCAN_CHARS:
+                        break
+            finally:
+                pdf.close()
+
+        text = "\n".join(parts).strip()
+        return text or f"PDF: {filename}"
     
-    async def _extract_organization(self, text: str) -> Optional[str]:
-        """Extraer nombre de organización del texto"""
-        # Buscar patrones de organización
-        org_patterns = [
-            r'[Ee]mpresa[:\s]*([A-Z][a-z\s]+)',
-            r'[Cc]ompañía[:\s]*([A-Z][a-z\s]+)',
-            r'[Ii]nstitución[:\s]*([A-Z][a-z\s]+)',
-            r'[Oo]rganización[:\s]*([A-Z][a-z\s]+)'
-        ]
+    def _ocr_image(self, content: bytes) -> str:
+        """Ejecutar Tesseract sobre la imagen (bloqueante)"""
+        # Pillow y pytesseract se importan al primer OCR: no pesan en el arranque
+        from PIL import Image
+        import pytesseract
         
-        for pattern in org_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        record_operation("ocr_job")
+        # Crear archivo temporal
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
+            temp_file.write(content)
+            temp_file_path = temp_file.name
         
-        return None
+        try:
+            # Abrir imagen con Pillow
+            image = Image.open(temp_file_path)
+            
+            # Extraer texto con Tesseract
+            text = pytesseract.image_to_string(image, lang='spa+eng')
+            
+            return text.strip()
+        finally:
+            # Limpiar archivo temporal
+            if os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, date, time, timedelta
+from typing import Optional, List, Dict, Any
+from firebase_admin import firestore
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.models.audit_log import AuditDailySummary
+from app.services.audit_service import AUDIT_COLLECTION
+from app.utils.responses import trusted_model
+from app.utils.sparse_fields import DOCUMENT_ID_FIELD
+
+AUDIT_DAILY_COLLECTION = 'audit_daily'
+MAINTENANCE_COLLECTION = 'audit_maintenance'
+RETENTION_STATE_ID = 'retention'
+
+# Margen para que el escritor en lotes termine de volcar los eventos del día anterior
+ROLLUP_GRACE = timedelta(hours=1)
+
+
+def daily_summary_id(user_id: str, day: date) -> str:
+    return f"{user_id}_{day.isoformat()}"
+
+
+class AuditRetentionService:
+    """Retención de audit_logs: resúmenes diarios por usuario y borrado de eventos caducados
+
+    Los días completos se resumen en audit_daily (un documento por usuario y día) antes de
+    borrar sus eventos; el borrado va por fragmentos con pausa entre ellos y nunca alcanza días
+    sin resumir. La política TTL de Firestore sobre expire_at borra lo mismo sin coste, pero
+    sin plazo garantizado: este proceso es la garantía.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.chunk_size = min(settings.audit_retention_chunk_size, FIRESTORE_BATCH_LIMIT)
+        self.pause = settings.audit_retention_pause_ms / 1000
+
+    def _state_ref(self):
+        return self.db.collection(MAINTENANCE_COLLECTION).document(RETENTION_STATE_ID)
+
+    def _get_state(self) -> Dict[str, Any]:
+        doc = self._state_ref().get()
+        return (doc.to_dict() or {}) if doc.exists else {}
+
+    def _first_event_day(self) -> Optional[date]:
+        docs = list(self.db.collection(AUDIT_COLLECTION).order_by('created_at').select(['created_at']).limit(1).stream())
+        if not docs:
+            return None
+        created_at = docs[0].to_dict()['created_at']
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone().replace(tzinfo=None)
+        return created_at.date()
+
+    async def rollup_day(self, day: date) -> int:
+        """Resumir los eventos de un día por usuario; devuelve cuántos usuarios tuvieron actividad
+
+        Recalcula el día completo y sobrescribe los resúmenes, así que repetirlo es seguro.
+        """
+        start = datetime.combine(day, time.min)
+        query = (self.db.collection(AUDIT_COLLECTION)
+                 .where('created_at', '>=', start)
+                 .where('created_at', '<', start + timedelta(days=1))
+                 .order_by('created_at')
+                 .select(['user_id', 'action_type', 'success', 'created_at']))
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        last = None
+        while True:
+            page = query.start_after(last) if last is not None else query
+            docs = list(page.limit(self.chunk_size).stream())
+            for doc in docs:
+                event = doc.to_dict()
+                user_id = event.get('user_id') or 'unknown'
+                outcome = 'success' if event.get('success', True) else 'failure'
+                summary = summaries.get(user_id)
+                if summary is None:
+                    summary = summaries[user_id] = {
+                        'user_id': user_id, 'date': day.isoformat(),
+                        'total': 0, 'success': 0, 'failure': 0, 'by_action': {}
+                    }
+                summary['total'] += 1
+                summary[outcome] += 1
+                action = summary['by_action'].setdefault(event.get('action_type') or 'unknown', {'success': 0, 'failure': 0})
+                action[outcome] += 1
+            if len(docs) < self.chunk_size:
+                break
+            last = docs[-1]
+            await asyncio.sleep(self.pause)
+
+        items = list(summaries.values())
+        now = datetime.now()
+        for offset in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for summary in items[offset:offset + FIRESTORE_BATCH_LIMIT]:
+                summary['updated_at'] = now
+                ref = self.db.collection(AUDIT_DAILY_COLLECTION).document(daily_summary_id(summary['user_id'], day))
+                batch.set(ref, summary)
+            batch.commit()
+        return len(items)
+
+    async def rollup(self, now: Optional[datetime] = None, max_days: Optional[int] = None) -> Dict[str, Any]:
+        """Resumir los días completos desde el último punto de control"""
+        now = now or datetime.now()
+        max_days = max_days or settings.audit_rollup_max_days
+        last_day = (now - ROLLUP_GRACE).date() - timedelta(days=1)
+
+        state = self._get_state()
+        if state.get('rolled_up_through'):
+            day = date.fromisoformat(state['rolled_up_through']) + timedelta(days=1)
+        else:
+            day = self._first_event_day()
+            if day is None:
+                return {'days': 0, 'summaries': 0}
+
+        days = 0
+        summaries = 0
+        while day <= last_day and days < max_days:
+            summaries += await self.rollup_day(day)
+            # Punto de control por día: una ejecución interrumpida continúa en el día siguiente
+            self._state_ref().set({'rolled_up_through': day.isoformat(), 'updated_at': datetime.now()}, merge=True)
+            day += timedelta(days=1)
+            days += 1
+        return {'days': days, 'summaries': summaries}
+
+    async def purge(self, now: Optional[datetime] = None, max_deletes: Optional[int] = None) -> int:
+        """Borrar eventos más antiguos que la retención, solo de días ya resumidos"""
+        now = now or datetime.now()
+        max_deletes = max_deletes or settings.audit_retention_max_deletes
+
+        state = self._get_state()
+        if not state.get('rolled_up_through'):
+            return 0
+        rolled_up_end = datetime.combine(date.fromisoformat(state['rolled_up_through']) + timedelta(days=1), time.min)
+        cutoff = min(now - timedelta(days=settings.audit_retention_days), rolled_up_end)
+
+        query = (self.db.collection(AUDIT_COLLECTION)
+                 .where('created_at', '<', cutoff)
+                 .order_by('created_at')
+                 .select([DOCUMENT_ID_FIELD]))
+        deleted = 0
+        while deleted < max_deletes:
+            # Lo ya borrado desaparece de la consulta: cada fragmento empieza desde el principio
+            docs = list(query.limit(min(self.chunk_size, max_deletes - deleted)).stream())
+            if not docs:
+                break
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.set(self._state_ref(), {
+                'purged_total': firestore.Increment(len(docs)),
+                'purged_before': cutoff,
+                'updated_at': datetime.now()
+            }, merge=True)
+            batch.commit()
+            deleted += len(docs)
+            await asyncio.sleep(self.pause)
+        return deleted
+
+    async def run(self, now: Optional[datetime] = None, max_days: Optional[int] = None,
+                  max_deletes: Optional[int] = None) -> Dict[str, Any]:
+        """Resumir primero y después borrar"""
+        result = await self.rollup(now, max_days)
+        result['deleted'] = await self.purge(now, max_deletes)
+        return result
+
+    async def get_daily_summaries(self, user_id: str, start: date, end: date) -> List[AuditDailySummary]:
+        """Resúmenes diarios del usuario entre start y end (incluidos), por ids y sin consulta"""
+        days = (end - start).days + 1
+        refs = [
+            self.db.collection(AUDIT_DAILY_COLLECTION).document(daily_summary_id(user_id, start + timedelta(days=offset)))
+            for offset in range(days)
+        ]
+        summaries = []
+        for doc in self.db.get_all(refs):
+            if doc.exists:
+                summaries.append(trusted_model(AuditDailySummary, doc.to_dict()))
+        summaries.sort(key=lambda summary: summary.date)
+        return summaries
@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import contextvars
+import json
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Deque, Tuple
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.models.audit_log import ActionType, AuditLogCreate, AuditLogFilter, AuditLogResponse, AuditLogPage
+from app.utils.metrics import AUDIT_RECORDS_DROPPED, AUDIT_WRITE_FAILURES
+from app.utils.responses import trusted_model
+
+AUDIT_COLLECTION = 'audit_logs'
+
+# Políticas de desbordamiento de la cola
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class InvalidCursorError(ValueError):
+    """El cursor de paginación no es válido"""
+    pass
+
+
+class AuditLogWriter:
+    """Cola acotada en memoria que escribe los registros de auditoría en lotes, fuera del camino de la petición
+
+    record() nunca bloquea ni toca Firestore: la tarea de fondo vacía la cola cada
+    flush_interval_ms o en cuanto hay batch_size registros pendientes. Con la cola llena
+    se descarta el registro más antiguo o el nuevo según la política configurada.
+    """
+
+    def __init__(self, db=None, flush_interval_ms: Optional[int] = None, batch_size: Optional[int] = None,
+                 max_queue: Optional[int] = None, overflow_policy: Optional[str] = None):
+        self._db = db
+        self.flush_interval = (flush_interval_ms or settings.audit_flush_interval_ms) / 1000
+        self.batch_size = min(batch_size or settings.audit_batch_size, FIRESTORE_BATCH_LIMIT)
+        self.max_queue = max_queue or settings.audit_queue_max
+        self.overflow_policy = overflow_policy or settings.audit_overflow_policy
+        if self.overflow_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Política de desbordamiento no válida: {self.overflow_policy}")
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def db(self):
+        # El cliente se resuelve al escribir: el singleton se crea al importar el módulo
+        return self._db or DatabaseConfig.get_firestore_client()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def record(self, entry: AuditLogCreate) -> bool:
+        """Encolar un registro; devuelve False si se descartó"""
+        if not settings.audit_enabled:
+            return False
+
+        data = entry.dict()
+        data['action_type'] = entry.action_type.value
+        data['created_at'] = datetime.now()
+        # Campo de la política TTL de Firestore sobre audit_logs
+        data['expire_at'] = data['created_at'] + timedelta(days=settings.audit_retention_days)
+
+        if len(self._queue) >= self.max_queue:
+            self._count_dropped()
+            if self.overflow_policy == DROP_NEWEST:
+                return False
+            self._queue.popleft()
+        self._queue.append(data)
+
+        self._ensure_started()
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _count_dropped(self) -> None:
+        self.dropped += 1
+        AUDIT_RECORDS_DROPPED.labels(self.overflow_policy).inc()
+        if self.dropped == 1 or self.dropped % 1000 == 0:
+            print(f"⚠️ Cola de auditoría llena ({self.max_queue}): {self.dropped} registros descartados")
+
+    def _ensure_started(self) -> None:
+        """Arrancar la tarea de fondo en el bucle actual (o rearrancarla si el bucle cambió)"""
+        if self._stopping:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin bucle en marcha: los registros esperan al próximo arranque o a stop()
+            return
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        # Contexto vacío: las escrituras de fondo no se atribuyen a la petición que arrancó la tarea
+        self._task = loop.create_task(self._run(), context=contextvars.Context())
+
+    def start(self) -> None:
+        """Arrancar el escritor (en el lifespan de la aplicación)"""
+        self._stopping = False
+        self._ensure_started()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Escribir todo lo pendiente en lotes de batch_size registros"""
+        while self._queue:
+            records = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            await run_in_threadpool(self._write, records)
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        try:
+            collection = self.db.collection(AUDIT_COLLECTION)
+            batch = self.db.batch()
+            for record in records:
+                batch.set(collection.document(), record)
+            batch.commit()
+            self.written += len(records)
+        except Exception as e:
+            # La auditoría no reintenta: un fallo no debe acumular registros sin límite
+            self.failed += len(records)
+            AUDIT_WRITE_FAILURES.inc(len(records))
+            print(f"❌ Error escribiendo {len(records)} registros de auditoría: {e}")
+
+    async def stop(self) -> None:
+        """Detener la tarea de fondo y vaciar la cola (en el cierre de la aplicación)"""
+        self._stopping = True
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            if task.get_loop() is asyncio.get_running_loop():
+                self._wakeup.set()
+                await task
+            else:
+                task.cancel()
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+
+# Escritor compartido por toda la aplicación
+audit_writer = AuditLogWriter()
+
+
+def record_audit(request: Optional[Request], user_id: str, action_type: ActionType, resource_type: str,
+                 description: str, resource_id: Optional[str] = None,
+                 metadata: Optional[Dict[str, Any]] = None, success: bool = True,
+                 error_message: Optional[str] = None) -> bool:
+    """Encolar un registro de auditoría con la IP y el user agent de la petición"""
+    return audit_writer.record(AuditLogCreate(
+        user_id=user_id,
+        action_type=action_type,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        description=description,
+        ip_address=request.client.host if request is not None and request.client else None,
+        user_agent=request.headers.get('user-agent') if request is not None else None,
+        metadata=metadata,
+        success=success,
+        error_message=error_message
+    ))
+
+
+def encode_cursor(created_at: datetime, document_id: str) -> str:
+    """Cursor opaco con la posición (created_at, id) del último registro devuelto"""
+    payload = json.dumps({"t": created_at.isoformat(), "id": document_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Cursor de paginación no válido") from e
+
+
+class AuditService:
+    """Servicio para consultar logs de auditoría"""
+
+    def __init__(self):
+        self.db = DatabaseConfig.get_firestore_client()
+
+    async def query_logs(self, filters: AuditLogFilter, cursor: Optional[str] = None) -> AuditLogPage:
+        """Consultar logs con igualdades, rango de fechas y paginación por cursor
+
+        Orden created_at DESC, __name__ DESC; las combinaciones de igualdades se resuelven
+        fusionando los índices compuestos de firestore.indexes.json.
+        """
+        query = self.db.collection(AUDIT_COLLECTION)
+        if filters.user_id:
+            query = query.where('user_id', '==', filters.user_id)
+        if filters.action_type:
+            query = query.where('action_type', '==', filters.action_type.value)
+        if filters.resource_type:
+            query = query.where('resource_type', '==', filters.resource_type)
+        if filters.success_only:
+            query = query.where('success', '==', True)
+        if filters.start_date:
+            query = query.where('created_at', '>=', filters.start_date)
+        if filters.end_date:
+            query = query.where('created_at', '<=', filters.end_date)
+
+        query = query.order_by('created_at', direction='DESCENDING').order_by('__name__', direction='DESCENDING')
+        if cursor:
+            created_at, document_id = decode_cursor(cursor)
+            query = query.start_after({'created_at': created_at, '__name__': document_id})
+
+        # Un registro de más indica si hay otra página
+        items: List[AuditLogResponse] = []
+        next_cursor = None
+        for doc in query.limit(filters.limit + 1).stream():
+            if len(items) == filters.limit:
+                last = items[-1]
+                next_cursor = encode_cursor(last.created_at, last.id)
+                break
+            log_data = doc.to_dict()
+            log_data['id'] = doc.id
+            # Datos escritos por esta API: se construyen sin revalidar
+            items.append(trusted_model(AuditLogResponse, log_data))
+
+        return AuditLogPage(items=items, next_cursor=next_cursor)
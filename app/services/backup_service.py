@@ -0,0 +1,308 @@
+import tarfile
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.config.database import DatabaseConfig
+from app.config.settings import settings
+from app.models.backup_sync import SyncStatus, BackupType, BackupRequest, BackupSyncResponse
+from app.services.backup_sinks import BackupSink, get_backup_sink
+from app.services.storage_service import LocalStorageBackend, S3StorageBackend, owns_storage_key
+from app.utils.lease import acquire_lease
+from app.utils.responses import trusted_model, dumps_json
+
+BACKUP_STATE_COLLECTION = 'backup_state'
+BACKUP_SYNC_COLLECTION = 'backup_sync'
+
+# Referencias por llamada a get_all
+GET_ALL_LIMIT = 100
+
+STAT_KEYS = ('documents', 'files', 'file_bytes', 'archive_bytes', 'skipped')
+
+
+class BackupInProgressError(Exception):
+    """Ya hay un respaldo en curso para el usuario"""
+    pass
+
+
+class _ChunkReader:
+    """Archivo de solo lectura sobre un iterador de fragmentos, para tarfile.addfile"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.chunk = b""
+        self.position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        while size != 0:
+            if self.position >= len(self.chunk):
+                self.chunk = next(self.chunks, None)
+                self.position = 0
+                if self.chunk is None:
+                    self.chunk = b""
+                    break
+                continue
+            end = len(self.chunk) if size < 0 else min(len(self.chunk), self.position + size)
+            parts.append(self.chunk[self.position:end])
+            if size > 0:
+                size -= end - self.position
+            self.position = end
+        return b"".join(parts)
+
+
+class _CountingWriter:
+    """Envía al destino lo que escribe tarfile y cuenta los bytes del archivo"""
+
+    def __init__(self, sink: BackupSink):
+        self.sink = sink
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.sink.write(data)
+        self.written += len(data)
+        return len(data)
+
+
+def _archive_name(data: Dict[str, Any]) -> str:
+    """Nombre del archivo dentro del respaldo, sin separadores de ruta"""
+    name = (data.get('file_name') or data.get('drive_file_id') or 'archivo').replace('/', '_').replace('\\', '_')
+    return data['id'] if name in ('.', '..') else name
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, content: bytes, mtime: float) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    info.mtime = mtime
+    tar.addfile(info, _ChunkReader(iter([content])))
+
+
+class BackupService:
+    """Respaldos completos e incrementales de los documentos de un usuario
+
+    El respaldo es un tar (comprimido con gzip por defecto) que se escribe en streaming
+    hacia un destino intercambiable (directorio local o S3): por cada documento, sus
+    metadatos en documents/{id}.json y sus bytes (de Drive, S3 o local) en files/{id}/{nombre}, y al
+    final un manifest.json. Solo hay en memoria el fragmento en curso de cada archivo.
+
+    Un respaldo incremental incluye los documentos con updated_at posterior a la marca
+    de agua del último respaldo completado (el momento en que empezó a leer documentos).
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.page_size = min(settings.backup_page_size, GET_ALL_LIMIT)
+        self.chunk_size = settings.backup_download_chunk_kb * 1024
+
+    def _state_ref(self, user_id: str):
+        return self.db.collection(BACKUP_STATE_COLLECTION).document(user_id)
+
+    async def start_backup(self, user_id: str, options: BackupRequest) -> BackupSyncResponse:
+        """Registrar un respaldo en curso y reservarlo para el usuario"""
+        if options.encryption:
+            raise ValueError("El cifrado de respaldos aún no está disponible")
+        if options.backup_type == BackupType.SELECTIVE:
+            raise ValueError("Los respaldos selectivos aún no están disponibles")
+
+        now = datetime.now()
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document()
+        record: Dict[str, Any] = {}
+
+        def start(transaction, state):
+            # Sin respaldo previo completado, el incremental es completo
+            since = state.get('watermark') if options.backup_type == BackupType.INCREMENTAL else None
+            backup_type = BackupType.INCREMENTAL if since else BackupType.FULL
+            record.clear()
+            record.update({
+                'user_id': user_id,
+                'sync_type': 'backup',
+                'backup_type': backup_type.value,
+                'status': SyncStatus.IN_PROGRESS.value,
+                'description': options.description or (
+                    'Respaldo incremental de documentos' if since else 'Respaldo completo de documentos'
+                ),
+                'source_paths': ['firestore:documents', 'storage:files'],
+                'destination_folder_id': None,
+                'include_deleted': options.include_deleted,
+                'compression': options.compression,
+                'encryption': False,
+                'progress_percentage': 0.0,
+                'error_message': None,
+                'stats': {key: 0 for key in STAT_KEYS},
+                'archive_location': None,
+                'since': since,
+                'watermark': None,
+                'started_at': now,
+                'completed_at': None,
+                'created_at': now,
+                'updated_at': now
+            })
+            transaction.set(record_ref, record)
+            return {'last_backup_id': record_ref.id}
+
+        # Reserva y registro en una transacción: dos peticiones simultáneas no crean dos respaldos
+        if acquire_lease(self.db, self._state_ref(user_id), now, settings.backup_lease_seconds, start) is None:
+            raise BackupInProgressError("Ya hay un respaldo en curso")
+
+        record['id'] = record_ref.id
+        return trusted_model(BackupSyncResponse, record)
+
+    async def run_backup(self, record: BackupSyncResponse, drive_service=None) -> BackupSyncResponse:
+        """Escribir el archivo de un respaldo registrado con start_backup
+
+        Sin drive_service, los documentos guardados en Drive se respaldan sin sus bytes.
+        """
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document(record.id)
+        since = record_ref.get().to_dict().get('since')
+        updates: Dict[str, Any]
+        state: Dict[str, Any] = {'lease_until': None}
+        try:
+            location, stats, watermark = await run_in_threadpool(
+                self._write_archive, record, since, drive_service
+            )
+            updates = {
+                'status': SyncStatus.COMPLETED.value,
+                'progress_percentage': 100.0,
+                'stats': stats,
+                'archive_location': location,
+                'watermark': watermark,
+                'completed_at': datetime.now()
+            }
+            # La marca de agua solo avanza con un respaldo completado
+            state['watermark'] = watermark
+        except Exception as e:
+            print(f"❌ Error en el respaldo {record.id}: {e}")
+            updates = {'status': SyncStatus.FAILED.value, 'error_message': str(e)}
+
+        updates['updated_at'] = datetime.now()
+        batch = self.db.batch()
+        batch.update(record_ref, updates)
+        batch.set(self._state_ref(record.user_id), state, merge=True)
+        batch.commit()
+
+        data = record_ref.get().to_dict()
+        data['id'] = record.id
+        return trusted_model(BackupSyncResponse, data)
+
+    def _document_ids(self, record: BackupSyncResponse, since: Optional[datetime]) -> List[str]:
+        """Ids de los documentos a respaldar (solo se lee is_archived)"""
+        query = self.db.collection('documents').where('user_id', '==', record.user_id)
+        if since is not None:
+            query = query.where('updated_at', '>', since)
+        return [
+            doc.id for doc in query.select(['is_archived']).stream()
+            if record.include_deleted or not doc.to_dict().get('is_archived')
+        ]
+
+    def _file_source(self, user_id: str, data: Dict[str, Any], drive_service,
+                     backends: Dict[str, Any]) -> Optional[Tuple[Any, str]]:
+        """Origen de los bytes de un documento: (almacenamiento con stream_file, id del archivo)"""
+        storage_name = data.get('storage_backend') or 'drive'
+        if storage_name == 'drive':
+            if drive_service is None or not data.get('drive_file_id'):
+                return None
+            return drive_service, data['drive_file_id']
+        # Una clave fuera del prefijo del usuario no se respalda
+        if not owns_storage_key(storage_name, user_id, data.get('storage_key')):
+            return None
+        if storage_name not in backends:
+            backends[storage_name] = (LocalStorageBackend(user_id) if storage_name == 'local'
+                                      else S3StorageBackend(user_id))
+        return backends[storage_name], data['storage_key']
+
+    def _write_archive(self, record: BackupSyncResponse, since: Optional[datetime],
+                       drive_service) -> Tuple[str, Dict[str, int], datetime]:
+        """Generar el tar y enviarlo al destino (bloqueante: corre en el pool de hilos)"""
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document(record.id)
+        # Lo modificado a partir de aquí entra en el siguiente incremental
+        watermark = datetime.now()
+        document_ids = self._document_ids(record, since)
+
+        extension = 'tar.gz' if record.compression else 'tar'
+        sink = get_backup_sink(f"{record.user_id}/{watermark:%Y%m%dT%H%M%S}-{record.id}.{extension}")
+        writer = _CountingWriter(sink)
+        stats = {key: 0 for key in STAT_KEYS}
+        skipped: List[Dict[str, str]] = []
+        mtime = watermark.timestamp()
+        last_progress = time.monotonic()
+        processed = 0
+        backends: Dict[str, Any] = {}
+
+        try:
+            with tarfile.open(fileobj=writer, mode='w|gz' if record.compression else 'w|') as tar:
+                for offset in range(0, len(document_ids), self.page_size):
+                    references = [self.db.collection('documents').document(document_id)
+                                  for document_id in document_ids[offset:offset + self.page_size]]
+                    for snapshot in self.db.get_all(references):
+                        processed += 1
+                        if not snapshot.exists:
+                            skipped.append({'id': snapshot.id, 'reason': 'eliminado durante el respaldo'})
+                            stats['skipped'] += 1
+                            continue
+
+                        data = snapshot.to_dict()
+                        data['id'] = snapshot.id
+                        _add_bytes(tar, f"documents/{snapshot.id}.json", dumps_json(data), mtime)
+                        stats['documents'] += 1
+
+                        source = self._file_source(record.user_id, data, drive_service, backends)
+                        if source is None and data.get('drive_file_id'):
+                            skipped.append({'id': snapshot.id, 'reason': 'Google Drive no autorizado'})
+                            stats['skipped'] += 1
+                        elif source is not None:
+                            storage, file_id = source
+                            try:
+                                # El primer fragmento se lee aquí: un archivo ausente no deja una entrada a medias
+                                size, chunks = storage.stream_file(file_id, self.chunk_size)
+                            except Exception as e:
+                                skipped.append({'id': snapshot.id, 'reason': f"archivo no disponible: {e}"})
+                                stats['skipped'] += 1
+                            else:
+                                info = tarfile.TarInfo(f"files/{snapshot.id}/{_archive_name(data)}")
+                                info.size = size
+                                info.mtime = mtime
+                                tar.addfile(info, _ChunkReader(chunks))
+                                stats['files'] += 1
+                                stats['file_bytes'] += size
+
+                        if time.monotonic() - last_progress >= settings.backup_progress_interval_seconds:
+                            last_progress = time.monotonic()
+                            stats['archive_bytes'] = writer.written
+                            record_ref.update({
+                                'progress_percentage': round(processed * 100 / len(document_ids), 1),
+                                'stats': stats,
+                                'updated_at': datetime.now()
+                            })
+
+                _add_bytes(tar, "manifest.json", dumps_json({
+                    'backup_id': record.id,
+                    'user_id': record.user_id,
+                    'backup_type': record.backup_type,
+                    'since': since,
+                    'watermark': watermark,
+                    'include_deleted': record.include_deleted,
+                    'documents': stats['documents'],
+                    'files': stats['files'],
+                    'skipped': skipped
+                }), mtime)
+            stats['archive_bytes'] = writer.written
+            location = sink.commit()
+        except Exception:
+            sink.abort()
+            raise
+
+        return location, stats, watermark
+
+    async def get_backup(self, sync_id: str, user_id: str) -> Optional[BackupSyncResponse]:
+        """Obtener un registro de respaldo o sincronización del usuario"""
+        try:
+            doc = self.db.collection(BACKUP_SYNC_COLLECTION).document(sync_id).get()
+            if doc.exists:
+                data = doc.to_dict()
+                if data.get('user_id') == user_id:
+                    data['id'] = sync_id
+                    return trusted_model(BackupSyncResponse, data)
+            return None
+        except Exception as e:
+            print(f"Error obteniendo respaldo: {e}")
+            return None
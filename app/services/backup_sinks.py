@@ -0,0 +1,106 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Optional, Any
+from app.config.settings import settings
+from app.services.storage_service import S3MultipartUpload, S3_MIN_PART_BYTES
+
+
+class BackupSink(ABC):
+    """Destino de un archivo de respaldo escrito en streaming
+
+    Las escrituras llegan en orden y en fragmentos; commit() publica el archivo completo y
+    abort() descarta lo escrito. Los métodos son bloqueantes: se usan desde el pool de hilos.
+    """
+
+    @abstractmethod
+    def write(self, data: bytes) -> int:
+        ...
+
+    @abstractmethod
+    def commit(self) -> str:
+        """Publicar el archivo y devolver su ubicación"""
+
+    @abstractmethod
+    def abort(self) -> None:
+        ...
+
+
+class LocalDirectorySink(BackupSink):
+    """Archivo en un directorio local; se escribe como .part y se renombra al terminar"""
+
+    def __init__(self, directory: str, key: str):
+        self.path = os.path.join(directory, key)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.partial_path = f"{self.path}.part"
+        self.file = open(self.partial_path, 'wb')
+
+    def write(self, data: bytes) -> int:
+        return self.file.write(data)
+
+    def commit(self) -> str:
+        self.file.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class S3Sink(BackupSink):
+    """Archivo en S3 o un almacenamiento compatible, con subida multiparte
+
+    Las partes se suben en paralelo mientras se sigue escribiendo; en memoria quedan la
+    parte en curso y las que están subiéndose (backup_s3_part_size_mb cada una).
+    """
+
+    def __init__(self, bucket: str, key: str, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=settings.backup_s3_endpoint_url or None)
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(settings.backup_s3_part_size_mb * 1024 * 1024, S3_MIN_PART_BYTES)
+        self.buffer = bytearray()
+        self.upload = S3MultipartUpload(client, bucket, key, settings.storage_s3_upload_concurrency)
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self.upload.add_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def commit(self) -> str:
+        if self.buffer:
+            self.upload.add_part(bytes(self.buffer))
+            self.buffer.clear()
+        self.upload.complete()
+        return f"s3://{self.bucket}/{self.key}"
+
+    def abort(self) -> None:
+        self.buffer.clear()
+        self.upload.abort()
+
+
+def _default_sink(key: str) -> BackupSink:
+    if settings.backup_sink == 's3':
+        if not settings.backup_s3_bucket:
+            raise ValueError("BACKUP_S3_BUCKET no está configurado")
+        prefix = settings.backup_s3_prefix.strip('/')
+        return S3Sink(settings.backup_s3_bucket, f"{prefix}/{key}" if prefix else key)
+    return LocalDirectorySink(settings.backup_local_dir, key)
+
+
+# Fábrica usada por el servicio de respaldos para abrir el destino de cada archivo
+_backup_sink_factory = _default_sink
+
+def get_backup_sink(key: str) -> BackupSink:
+    """Abrir el destino configurado (BACKUP_SINK) para el archivo key"""
+    return _backup_sink_factory(key)
+
+def set_backup_sink_factory(factory: Optional[Any]) -> None:
+    """Reemplazar el destino de los respaldos; None restaura el configurado"""
+    global _backup_sink_factory
+    _backup_sink_factory = factory or _default_sink
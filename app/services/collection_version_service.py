@@ -0,0 +1,46 @@
+from typing import Optional, Dict, Any
+from firebase_admin import firestore
+from app.config.database import DatabaseConfig
+
+class CollectionVersionService:
+    """Sellos de versión por usuario y colección para peticiones condicionales (ETag/Last-Modified)
+
+    Cada escritura de un servicio incrementa el sello en el mismo lote que la escritura;
+    los listados comparan contra el sello sin releer la colección completa.
+    """
+
+    COLLECTION = 'collection_versions'
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+
+    def bump(self, batch, user_id: str, collection: str) -> None:
+        """Agregar al lote el incremento del sello de la colección del usuario"""
+        batch.set(self.db.collection(self.COLLECTION).document(user_id), {
+            collection: {
+                'version': firestore.Increment(1),
+                'updated_at': firestore.SERVER_TIMESTAMP
+            }
+        }, merge=True)
+
+    async def get_version(self, user_id: str, collection: str) -> Optional[Dict[str, Any]]:
+        """Obtener {version, updated_at} de la colección del usuario, o None si aún no hay sello"""
+        try:
+            doc = self.db.collection(self.COLLECTION).document(user_id).get()
+            if doc.exists:
+                stamp = (doc.to_dict() or {}).get(collection)
+                if stamp and stamp.get('version') is not None:
+                    return stamp
+            return None
+        except Exception as e:
+            print(f"Error obteniendo versión de {collection}: {e}")
+            return None
+
+    async def get_versions(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Obtener los sellos de todas las colecciones del usuario en una sola lectura"""
+        try:
+            doc = self.db.collection(self.COLLECTION).document(user_id).get()
+            return (doc.to_dict() or {}) if doc.exists else {}
+        except Exception as e:
+            print(f"Error obteniendo versiones: {e}")
+            return {}
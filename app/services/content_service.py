@@ -0,0 +1,238 @@
+from typing import Optional, Tuple, Iterator, BinaryIO
+from urllib.parse import quote
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.models.document import DocumentResponse
+from app.services.storage_service import get_storage_backend, owns_storage_key
+from app.utils.conditional import make_etag
+from app.utils.disk_cache import DiskLRUCache
+from app.utils.metrics import CONTENT_CACHE_REQUESTS
+
+
+class RangeNotSatisfiableError(Exception):
+    """El rango pedido empieza después del final del archivo"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Rango no satisfacible para un archivo de {size} bytes")
+        self.size = size
+
+
+def parse_range(header: Optional[str]) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """Interpretar un rango único: 'bytes=a-b', 'bytes=a-' o 'bytes=-n' (sufijo, devuelto como (None, n))
+
+    Los rangos múltiples o mal formados se ignoran (None) y se responde el archivo completo.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, separator, last = spec.strip().partition('-')
+    if not separator:
+        return None
+    try:
+        if not first:
+            return None, int(last)
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    return start, end
+
+
+def resolve_range(spec: Optional[Tuple[Optional[int], Optional[int]]], size: int) -> Tuple[int, int]:
+    """Primer y último byte (inclusive) a enviar de un archivo de size bytes"""
+    if spec is None:
+        return 0, size - 1
+    start, end = spec
+    if start is None:
+        if end <= 0 or size == 0:
+            raise RangeNotSatisfiableError(size)
+        return max(size - end, 0), size - 1
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def content_disposition(filename: Optional[str]) -> str:
+    """Content-Disposition inline con el nombre en UTF-8 (RFC 6266)"""
+    return f"inline; filename*=UTF-8''{quote(filename or 'archivo', safe='')}"
+
+
+def _slice(chunks: Iterator[bytes], skip: int, length: int) -> Iterator[bytes]:
+    """Saltar skip bytes y entregar los length siguientes; cierra el iterador de origen al terminar"""
+    try:
+        if length <= 0:
+            return
+        for chunk in chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            chunk = chunk[skip:skip + length]
+            skip = 0
+            length -= len(chunk)
+            yield chunk
+            # Sin pedir otro fragmento al almacenamiento
+            if length <= 0:
+                break
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def _tee(chunks: Iterator[bytes], cache: DiskLRUCache, key: str, size: int) -> Iterator[bytes]:
+    """Copiar a la caché lo que se envía; la entrada se publica solo si llegó el archivo completo
+
+    La entrada se abre al empezar a leer: si el iterador nunca arranca no queda un .part abierto.
+    """
+    writer = None
+    try:
+        writer = cache.writer(key)
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+    finally:
+        if writer is not None:
+            if writer.size == size:
+                writer.commit()
+            else:
+                writer.abort()
+
+
+def _read_file(source: BinaryIO, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """Leer length bytes desde start de un archivo ya abierto y cerrarlo al terminar"""
+    with source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+_content_cache: Optional[DiskLRUCache] = None
+
+def get_content_cache() -> Optional[DiskLRUCache]:
+    """Caché en disco compartida por el proceso; None si CONTENT_CACHE_MAX_MB es 0"""
+    global _content_cache
+    if settings.content_cache_max_mb <= 0:
+        return None
+    if _content_cache is None:
+        _content_cache = DiskLRUCache(settings.content_cache_dir, settings.content_cache_max_mb * 1024 * 1024)
+    return _content_cache
+
+
+class DocumentContent:
+    """Bytes de un documento listos para responder: el rango [start, end] de un archivo de size bytes
+
+    etag identifica la revisión de los bytes entregados (None si es desconocida).
+    """
+
+    def __init__(self, size: int, start: int, end: int, chunks: Iterator[bytes], partial: bool,
+                 etag: Optional[str] = None):
+        self.size = size
+        self.start = start
+        self.end = end
+        self.chunks = chunks
+        self.partial = partial
+        self.etag = etag
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+
+class DocumentContentService:
+    """Archivos de los documentos servidos desde su almacenamiento con una caché LRU en disco
+
+    La clave de la caché es el archivo y su revisión (el md5 de Drive, o la clave inmutable
+    en S3), así un archivo modificado nunca se sirve desde una entrada vieja. En Drive se
+    descarga la revisión actual por su id y la entrada se guarda con el md5 de esa revisión,
+    no con el registrado en el documento: si el archivo cambió en Drive y aún no se
+    sincronizó, los bytes nuevos no quedan bajo la revisión vieja. Solo las descargas que
+    llegan hasta el final del archivo llenan la caché; los rangos posteriores y las vistas
+    repetidas se sirven desde el disco sin llamar al almacenamiento.
+    """
+
+    def __init__(self, cache: Optional[DiskLRUCache] = None):
+        self.cache = cache or get_content_cache()
+        self.chunk_size = settings.content_stream_chunk_kb * 1024
+        self.max_file_bytes = settings.content_cache_max_file_mb * 1024 * 1024
+
+    @staticmethod
+    def source(document: DocumentResponse) -> Optional[Tuple[str, str, Optional[str]]]:
+        """(almacenamiento, id del archivo, revisión) de un documento, o None si no tiene archivo"""
+        storage_name = document.storage_backend or 'drive'
+        if storage_name == 'drive':
+            file_id = document.drive_file_id
+            revision = document.drive_md5_checksum or document.drive_modified_time
+        else:
+            # Las claves de S3 y local llevan un uuid: el contenido no cambia
+            file_id = document.storage_key
+            revision = 'inmutable'
+        if not file_id:
+            return None
+        return storage_name, file_id, revision
+
+    def etag(self, document: DocumentResponse) -> Optional[str]:
+        """ETag de la revisión registrada en el documento; None si es desconocida"""
+        source = self.source(document)
+        if source is None or source[2] is None:
+            return None
+        return make_etag('content', *source)
+
+    async def open(self, document: DocumentResponse, user_id: str,
+                   range_header: Optional[str] = None) -> Optional[DocumentContent]:
+        """Abrir el contenido (o el rango pedido) de un documento; None si no tiene archivo"""
+        source = self.source(document)
+        if source is None:
+            return None
+        storage_name, file_id, revision = source
+        # Antes de la caché y del almacenamiento: solo claves bajo el prefijo del usuario
+        if storage_name != 'drive' and not owns_storage_key(storage_name, user_id, file_id):
+            raise ValueError("Clave de archivo no válida")
+        spec = parse_range(range_header)
+
+        # Los archivos locales ya están en disco: no se copian a la caché. En Drive solo hay
+        # entradas bajo el md5 de sus propios bytes, así que un acierto es la revisión registrada
+        cache_key = f"{storage_name}:{file_id}:{revision}" if revision and storage_name != 'local' else None
+        if cache_key and self.cache:
+            # Abierta por la caché: un desalojo posterior no la corta; si ya no está, se lee del origen
+            cached = self.cache.open(cache_key)
+            CONTENT_CACHE_REQUESTS.labels(result='hit' if cached else 'miss').inc()
+            if cached:
+                cached_file, size = cached
+                try:
+                    start, end = resolve_range(spec, size)
+                except RangeNotSatisfiableError:
+                    cached_file.close()
+                    raise
+                return DocumentContent(size, start, end,
+                                       _read_file(cached_file, start, end - start + 1, self.chunk_size),
+                                       spec is not None, make_etag('content', *source))
+
+        storage = await get_storage_backend(user_id, name=storage_name)
+        offset = spec[0] if spec and spec[0] is not None else 0
+        if storage_name == 'drive':
+            # Clave y ETag de la revisión realmente descargada
+            size, revision, chunks = await run_in_threadpool(storage.stream_revision, file_id, offset, self.chunk_size)
+            cache_key = f"drive:{file_id}:{revision}" if revision else None
+        else:
+            size, chunks = await run_in_threadpool(storage.stream_range, file_id, offset, self.chunk_size)
+        etag = make_etag('content', storage_name, file_id, revision) if revision else None
+        try:
+            start, end = resolve_range(spec, size)
+        except RangeNotSatisfiableError:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+            raise
+
+        if cache_key and self.cache and start == 0 and end == size - 1 and 0 < size <= self.max_file_bytes:
+            chunks = _tee(chunks, self.cache, cache_key, size)
+        return DocumentContent(size, start, end, _slice(chunks, start - offset, end - start + 1),
+                               spec is not None, etag)
@@ -1,27 +1,54 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 from datetime import datetime, timedelta
-from app.config.database import DatabaseConfig
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
 from app.models.document import DocumentCreate, DocumentUpdate, DocumentResponse
+from app.services.collection_version_service import CollectionVersionService
+from app.services.folder_service import FolderService, document_folder
+from app.services.thumbnail_service import THUMBNAILS_COLLECTION
+from app.utils.responses import trusted_model
+from app.utils.sparse_fields import projection, slim_model
 
 class DocumentService:
     """Servicio para gestión de documentos"""
     
     def __init__(self):
         self.db = DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
+        self.folders = FolderService(self.db)
     
-    async def get_user_documents(self, user_id: str) -> List[DocumentResponse]:
-        """Obtener todos los documentos de un usuario"""
+    def _user_documents_query(self, user_id: str, fields: Optional[Tuple[str, ...]], required: Tuple[str, ...] = ()):
+        """Consulta de documentos del usuario, proyectada a los campos pedidos"""
+        query = self.db.collection('documents').where('user_id', '==', user_id)
+        if fields:
+            query = query.select(projection(fields, required))
+        return query
+    
+    async def get_user_documents(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> List[DocumentResponse]:
+        """Obtener todos los documentos de un usuario
+
+        Los errores se propagan: el listado se sirve con el ETag del sello de versión y
+        una lista vacía por error quedaría validada en la caché del cliente.
+        """
         try:
-            docs = self.db.collection('documents').where('user_id', '==', user_id).stream()
+            docs = self._user_documents_query(user_id, fields).stream()
+            model_cls = slim_model(DocumentResponse, fields) if fields else DocumentResponse
             documents = []
             for doc in docs:
                 doc_data = doc.to_dict()
                 doc_data['id'] = doc.id
-                documents.append(DocumentResponse(**doc_data))
+                # Datos escritos por esta API: se construyen sin revalidar
+                documents.append(trusted_model(model_cls, doc_data))
             return documents
         except Exception as e:
             print(f"Error obteniendo documentos: {e}")
-            return []
+            raise
+    
+    def iter_user_documents(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> Iterator[Dict[str, Any]]:
+        """Recorrer los documentos del usuario a medida que llegan, sin acumularlos en memoria"""
+        for doc in self._user_documents_query(user_id, fields).stream():
+            doc_data = doc.to_dict()
+            doc_data['id'] = doc.id
+            yield doc_data
     
     async def get_document_by_id(self, document_id: str, user_id: str) -> Optional[DocumentResponse]:
         """Obtener documento por ID"""
@@ -49,14 +76,70 @@ class DocumentService:
             doc_dict['is_archived'] = False
             doc_dict['is_favorite'] = False
             
-            doc_ref = self.db.collection('documents').add(doc_dict)
-            doc_dict['id'] = doc_ref[1].id
+            # El documento, su carpeta (si es nueva) y los sellos de versión se escriben juntos
+            doc_ref = self.db.collection('documents').document()
+            batch = self.db.batch()
+            batch.set(doc_ref, doc_dict)
+            self.folders.register_storage_folders(batch, user_id, [doc_dict])
+            self.versions.bump(batch, user_id, 'documents')
+            self.folders.count_documents(batch, user_id, {document_folder(doc_dict): 1})
+            batch.commit()
+            doc_dict['id'] = doc_ref.id
             
             return DocumentResponse(**doc_dict)
         except Exception as e:
             print(f"Error creando documento: {e}")
             raise
     
+    async def create_documents(self, user_id: str, documents_data: List[DocumentCreate]) -> List[DocumentResponse]:
+        """Crear varios documentos con escrituras en lote"""
+        try:
+            documents = []
+            doc_dicts = []
+            for document_data in documents_data:
+                doc_dict = document_data.dict()
+                doc_dict['user_id'] = user_id
+                doc_dict['created_at'] = datetime.now()
+                doc_dict['updated_at'] = datetime.now()
+                doc_dict['is_archived'] = False
+                doc_dict['is_favorite'] = False
+                doc_dicts.append(doc_dict)
+            
+            # Las carpetas nuevas van en el primer lote, con los primeros documentos
+            batch = self.db.batch()
+            pending = self.folders.register_storage_folders(batch, user_id, doc_dicts)
+            folder_counts: Dict[str, int] = {}
+            
+            for doc_dict in doc_dicts:
+                doc_ref = self.db.collection('documents').document()
+                batch.set(doc_ref, doc_dict)
+                pending += 1
+                folder_id = document_folder(doc_dict)
+                if folder_id:
+                    folder_counts[folder_id] = folder_counts.get(folder_id, 0) + 1
+                
+                doc_dict['id'] = doc_ref.id
+                documents.append(DocumentResponse(**doc_dict))
+                
+                # Firestore admite como máximo 500 operaciones por lote (dos son el sello y los contadores)
+                if pending == FIRESTORE_BATCH_LIMIT - 2:
+                    self.versions.bump(batch, user_id, 'documents')
+                    self.folders.count_documents(batch, user_id, folder_counts)
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+                    folder_counts = {}
+            
+            if pending:
+                self.versions.bump(batch, user_id, 'documents')
+                self.folders.count_documents(batch, user_id, folder_counts)
+                batch.commit()
+            
+            return documents
+        except Exception as e:
+            print(f"Error creando documentos en lote: {e}")
+            raise
+    
     async def update_document(self, document_id: str, user_id: str, document_data: DocumentUpdate) -> Optional[DocumentResponse]:
         """Actualizar documento"""
         try:
@@ -73,7 +156,10 @@ class DocumentService:
             update_data = document_data.dict(exclude_unset=True)
             update_data['updated_at'] = datetime.now()
             
-            doc_ref.update(update_data)
+            batch = self.db.batch()
+            batch.update(doc_ref, update_data)
+            self.versions.bump(batch, user_id, 'documents')
+            batch.commit()
             
             # Obtener documento actualizado
             updated_doc = doc_ref.get().to_dict()
@@ -97,7 +183,13 @@ class DocumentService:
             if doc_data.get('user_id') != user_id:
                 return False
             
-            doc_ref.delete()
+            batch = self.db.batch()
+            batch.delete(doc_ref)
+            if doc_data.get('thumbnail_etag'):
+                batch.delete(self.db.collection(THUMBNAILS_COLLECTION).document(document_id))
+            self.versions.bump(batch, user_id, 'documents')
+            self.folders.count_documents(batch, user_id, {document_folder(doc_data): -1})
+            batch.commit()
             return True
         except Exception as e:
             print(f"Error eliminando documento: {e}")
@@ -117,10 +209,12 @@ class DocumentService:
             print(f"Error obteniendo categorías: {e}")
             return []
     
-    async def get_expiring_documents(self, user_id: str, days: int = 30) -> List[DocumentResponse]:
+    async def get_expiring_documents(self, user_id: str, days: int = 30,
+                                     fields: Optional[Tuple[str, ...]] = None) -> List[DocumentResponse]:
         """Obtener documentos que vencen pronto"""
         try:
-            docs = self.db.collection('documents').where('user_id', '==', user_id).stream()
+            docs = self._user_documents_query(user_id, fields, ('expiry_date',)).stream()
+            model_cls = slim_model(DocumentResponse, fields) if fields else DocumentResponse
             expiring_docs = []
             cutoff_date = datetime.now() + timedelta(days=days)
             
@@ -128,10 +222,15 @@ class DocumentService:
                 doc_data = doc.to_dict()
                 if doc_data.get('expiry_date'):
                     try:
-                        expiry_date = datetime.fromisoformat(doc_data['expiry_date'].replace('Z', '+00:00'))
+                        expiry_date = doc_data['expiry_date']
+                        if isinstance(expiry_date, str):
+                            expiry_date = datetime.fromisoformat(expiry_date.replace('Z', '+00:00'))
+                        # Firestore devuelve fechas con zona horaria; comparar en hora local sin zona
+                        if expiry_date.tzinfo is not None:
+                            expiry_date = expiry_date.astimezone().replace(tzinfo=None)
                         if expiry_date <= cutoff_date:
                             doc_data['id'] = doc.id
-                            expiring_docs.append(DocumentResponse(**doc_data))
+                            expiring_docs.append(trusted_model(model_cls, doc_data))
                     except ValueError:
                         continue
             
@@ -140,21 +239,23 @@ class DocumentService:
             print(f"Error obteniendo documentos por vencer: {e}")
             return []
     
-    async def search_documents(self, user_id: str, query: str) -> List[DocumentResponse]:
+    async def search_documents(self, user_id: str, query: str,
+                               fields: Optional[Tuple[str, ...]] = None) -> List[DocumentResponse]:
         """Buscar documentos por texto"""
         try:
-            docs = self.db.collection('documents').where('user_id', '==', user_id).stream()
+            docs = self._user_documents_query(user_id, fields, ('name', 'description', 'category')).stream()
+            model_cls = slim_model(DocumentResponse, fields) if fields else DocumentResponse
             matching_docs = []
             query_lower = query.lower()
             
             for doc in docs:
                 doc_data = doc.to_dict()
                 # Buscar en nombre, descripción y categoría
-                if (query_lower in doc_data.get('name', '').lower() or
-                    query_lower in doc_data.get('description', '').lower() or
-                    query_lower in doc_data.get('category', '').lower()):
+                if (query_lower in (doc_data.get('name') or '').lower() or
+                    query_lower in (doc_data.get('description') or '').lower() or
+                    query_lower in (doc_data.get('category') or '').lower()):
                     doc_data['id'] = doc.id
-                    matching_docs.append(DocumentResponse(**doc_data))
+                    matching_docs.append(trusted_model(model_cls, doc_data))
             
             return matching_docs
         except Exception as e:
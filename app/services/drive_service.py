@@ -1,18 +1,58 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 import io
 import os
+import tempfile
 from datetime import datetime
+from app.utils.metrics import record_operation
+
+# Tamaño de cada fragmento de una descarga o subida por partes
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+class TrackedHttpRequest(HttpRequest):
+    """Petición de la API de Drive que se cuenta en las métricas"""
+    
+    def execute(self, *args, **kwargs):
+        record_operation("drive_call")
+        return super().execute(*args, **kwargs)
+
+# Campos de archivo que se piden a la API y se normalizan con _file_from_api
+FILE_FIELDS = 'id, name, mimeType, parents, trashed, size, md5Checksum, createdTime, modifiedTime'
+
+def _file_from_api(file: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalizar un archivo de la API de Drive"""
+    return {
+        'id': file['id'],
+        'name': file.get('name'),
+        'mime_type': file.get('mimeType'),
+        'parents': file.get('parents', []),
+        'trashed': file.get('trashed', False),
+        'size': file.get('size'),
+        'md5_checksum': file.get('md5Checksum'),
+        'created_time': file.get('createdTime'),
+        'modified_time': file.get('modifiedTime')
+    }
+
+def _change_from_api(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalizar un cambio de la API de Drive"""
+    file = change.get('file')
+    return {
+        'file_id': change.get('fileId'),
+        'removed': change.get('removed', False),
+        'time': change.get('time'),
+        'file': _file_from_api(file) if file else None
+    }
 
 class GoogleDriveService:
     """Servicio para integración con Google Drive"""
     
     def __init__(self, credentials: Credentials):
         self.credentials = credentials
-        self.service = build('drive', 'v3', credentials=credentials)
+        self.service = build('drive', 'v3', credentials=credentials, requestBuilder=TrackedHttpRequest)
         self.folders_cache = {}
     
     async def create_folder(self, name: str, parent_id: Optional[str] = None) -> str:
@@ -97,6 +137,57 @@ class GoogleDriveService:
             print(f'Error subiendo archivo: {error}')
             raise
     
+    async def upload_content(self, content: bytes, file_name: str, folder_id: str,
+                             mime_type: Optional[str] = None) -> str:
+        """Subir contenido en memoria a Google Drive sin archivo temporal"""
+        try:
+            if not mime_type:
+                mime_type = 'application/octet-stream'
+            
+            file_metadata = {
+                'name': file_name,
+                'parents': [folder_id]
+            }
+            
+            media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mime_type, resumable=True)
+            
+            file = self.service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id'
+            ).execute()
+            
+            return file.get('id')
+            
+        except HttpError as error:
+            print(f'Error subiendo archivo: {error}')
+            raise
+    
+    async def upload_stream(self, stream, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        """Subir un archivo abierto en fragmentos con una subida reanudable"""
+        try:
+            file_metadata = {
+                'name': file_name,
+                'parents': [folder_id]
+            }
+            
+            media = MediaIoBaseUpload(
+                stream, mimetype=mime_type or 'application/octet-stream', chunksize=UPLOAD_CHUNK_BYTES, resumable=True
+            )
+            
+            file = self.service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields=FILE_FIELDS
+            ).execute()
+            
+            return _file_from_api(file)
+            
+        except HttpError as error:
+            print(f'Error subiendo archivo: {error}')
+            raise
+    
     async def get_folder_structure(self, folder_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Obtener estructura de carpetas"""
         try:
@@ -155,6 +246,164 @@ class GoogleDriveService:
             print(f'Error obteniendo archivos: {error}')
             raise
     
+    async def get_start_page_token(self) -> str:
+        """Obtener el token a partir del cual el feed de cambios reporta modificaciones"""
+        try:
+            response = self.service.changes().getStartPageToken().execute()
+            return response['startPageToken']
+        except HttpError as error:
+            print(f'Error obteniendo token de cambios: {error}')
+            raise
+    
+    async def list_changes(self, page_token: str, page_size: int = 1000) -> Dict[str, Any]:
+        """Obtener una página del feed de cambios desde page_token
+        
+        Devuelve los cambios y next_page_token (quedan más páginas) o new_start_page_token
+        (feed al día: token para la próxima sincronización).
+        """
+        try:
+            response = self.service.changes().list(
+                pageToken=page_token,
+                pageSize=page_size,
+                spaces='drive',
+                includeRemoved=True,
+                fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, time, file({FILE_FIELDS}))'
+            ).execute()
+            
+            return {
+                'changes': [_change_from_api(change) for change in response.get('changes', [])],
+                'next_page_token': response.get('nextPageToken'),
+                'new_start_page_token': response.get('newStartPageToken')
+            }
+            
+        except HttpError as error:
+            print(f'Error obteniendo cambios: {error}')
+            raise
+    
+    async def list_files(self, page_token: Optional[str] = None, page_size: int = 1000) -> Dict[str, Any]:
+        """Obtener una página de todos los archivos (no carpetas) del usuario, incluidos los de la papelera"""
+        try:
+            response = self.service.files().list(
+                q="mimeType!='application/vnd.google-apps.folder'",
+                spaces='drive',
+                pageSize=page_size,
+                pageToken=page_token,
+                fields=f'nextPageToken, files({FILE_FIELDS})'
+            ).execute()
+            
+            return {
+                'files': [_file_from_api(file) for file in response.get('files', [])],
+                'next_page_token': response.get('nextPageToken')
+            }
+            
+        except HttpError as error:
+            print(f'Error listando archivos: {error}')
+            raise
+    
+    async def update_file(self, file_id: str, name: Optional[str] = None,
+                          trashed: Optional[bool] = None) -> Dict[str, Any]:
+        """Renombrar un archivo o sacarlo/enviarlo a la papelera"""
+        try:
+            body: Dict[str, Any] = {}
+            if name is not None:
+                body['name'] = name
+            if trashed is not None:
+                body['trashed'] = trashed
+            
+            file = self.service.files().update(fileId=file_id, body=body, fields=FILE_FIELDS).execute()
+            return _file_from_api(file)
+            
+        except HttpError as error:
+            print(f'Error actualizando archivo: {error}')
+            raise
+    
+    async def restore_revision(self, file_id: str, md5_checksum: str) -> Optional[Dict[str, Any]]:
+        """Volver a subir como versión actual la revisión con ese md5
+        
+        Drive no restaura revisiones directamente: se descarga la revisión a un archivo
+        temporal (en disco si es grande) y se sube como contenido nuevo. Devuelve el archivo
+        actualizado o None si la revisión ya no está en el historial.
+        """
+        try:
+            revisions = self.service.revisions().list(
+                fileId=file_id,
+                fields='revisions(id, md5Checksum, mimeType)'
+            ).execute().get('revisions', [])
+            revision = next((item for item in revisions if item.get('md5Checksum') == md5_checksum), None)
+            if revision is None:
+                return None
+            
+            with tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_CHUNK_BYTES * 8) as buffer:
+                downloader = MediaIoBaseDownload(
+                    buffer,
+                    self.service.revisions().get_media(fileId=file_id, revisionId=revision['id']),
+                    chunksize=DOWNLOAD_CHUNK_BYTES
+                )
+                done = False
+                while not done:
+                    _, done = downloader.next_chunk()
+                buffer.seek(0)
+                
+                media = MediaIoBaseUpload(
+                    buffer, mimetype=revision.get('mimeType') or 'application/octet-stream', resumable=True
+                )
+                file = self.service.files().update(fileId=file_id, media_body=media, fields=FILE_FIELDS).execute()
+            return _file_from_api(file)
+            
+        except HttpError as error:
+            print(f'Error restaurando revisión: {error}')
+            raise
+    
+    def stream_file(self, file_id: str, chunk_size: int = DOWNLOAD_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        """Descargar un archivo por fragmentos sin cargarlo entero en memoria
+        
+        Devuelve el tamaño total y un iterador de fragmentos. El primer fragmento se descarga
+        aquí, así un archivo inexistente falla antes de empezar a consumir el iterador.
+        Es bloqueante: se usa desde el pool de hilos.
+        """
+        return self._stream_media(self.service.files().get_media(fileId=file_id), chunk_size)
+    
+    def stream_head_revision(self, file_id: str, chunk_size: int = DOWNLOAD_CHUNK_BYTES) -> Tuple[int, Optional[str], Iterator[bytes]]:
+        """Descargar por fragmentos la revisión actual junto con su md5
+        
+        La metadata y los bytes se piden por id de revisión: si el archivo cambia entre una
+        llamada y otra, los bytes siguen siendo los de ese md5. Los archivos sin revisiones
+        binarias (documentos de Google) se descargan sin md5. Bloqueante, como stream_file.
+        """
+        file = self.service.files().get(fileId=file_id, fields='md5Checksum, headRevisionId').execute()
+        record_operation("drive_call")
+        revision_id = file.get('headRevisionId')
+        if not revision_id:
+            size, chunks = self.stream_file(file_id, chunk_size)
+            return size, None, chunks
+        request = self.service.revisions().get_media(fileId=file_id, revisionId=revision_id)
+        size, chunks = self._stream_media(request, chunk_size)
+        return size, file.get('md5Checksum'), chunks
+    
+    def _stream_media(self, request, chunk_size: int) -> Tuple[int, Iterator[bytes]]:
+        """Tamaño total y fragmentos de una descarga de media, con el primer fragmento ya descargado"""
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+        
+        def take() -> bytes:
+            record_operation("drive_call")
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+        
+        status, done = downloader.next_chunk()
+        first = take()
+        
+        def chunks() -> Iterator[bytes]:
+            nonlocal done
+            yield first
+            while not done:
+                _, done = downloader.next_chunk()
+                yield take()
+        
+        return (status.total_size if status and status.total_size is not None else len(first)), chunks()
+    
     async def delete_file(self, file_id: str) -> bool:
         """Eliminar archivo de Google Drive"""
         try:
@@ -177,3 +426,15 @@ class GoogleDriveService:
         except HttpError as error:
             print(f'Error obteniendo URL de descarga: {error}')
             return ''
+
+# Fábrica usada por los endpoints para construir el servicio de Drive
+_drive_service_factory = GoogleDriveService
+
+def get_drive_service(credentials: Credentials) -> GoogleDriveService:
+    """Construir el servicio de Drive para las credenciales del usuario"""
+    return _drive_service_factory(credentials)
+
+def set_drive_service_factory(factory) -> None:
+    """Reemplazar la implementación de Drive (p. ej. por InMemoryDriveService); None restaura la real"""
+    global _drive_service_factory
+    _drive_service_factory = factory or GoogleDriveService
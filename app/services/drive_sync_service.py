@@ -0,0 +1,291 @@
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.models.backup_sync import SyncStatus, BackupType, BackupSyncResponse
+from app.services.collection_version_service import CollectionVersionService
+from app.services.folder_service import FolderService
+from app.utils.lease import acquire_lease
+from app.utils.responses import trusted_model
+
+SYNC_STATE_COLLECTION = 'drive_sync_state'
+BACKUP_SYNC_COLLECTION = 'backup_sync'
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Máximo de valores de un filtro 'in' de Firestore
+FIRESTORE_IN_LIMIT = 30
+
+# Operaciones fijas por lote además de una por cambio: estado, registro, dos sellos y contadores
+FIXED_BATCH_OPERATIONS = 5
+
+STAT_KEYS = ('changes', 'created', 'renamed', 'moved', 'trashed', 'restored', 'deleted', 'folders_renamed', 'skipped')
+
+
+class SyncInProgressError(Exception):
+    """Ya hay una sincronización en curso para el usuario"""
+    pass
+
+
+def _chunks(values: List[str], size: int):
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+class DriveSyncService:
+    """Sincronización incremental Drive → Keepi con el feed de cambios de Drive
+
+    Cada usuario guarda su token del feed en drive_sync_state; una ejecución pide solo las
+    páginas de cambios desde ese token y aplica creaciones, renombrados, movimientos y
+    papeleras a los documentos de Firestore. Cada página se aplica en un lote junto con el
+    nuevo token y el progreso del registro de backup_sync, así que una ejecución que falla
+    a mitad continúa desde la última página aplicada.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
+        self.folders = FolderService(self.db)
+        self.page_size = min(settings.drive_sync_page_size, FIRESTORE_BATCH_LIMIT - FIXED_BATCH_OPERATIONS)
+
+    def _state_ref(self, user_id: str):
+        return self.db.collection(SYNC_STATE_COLLECTION).document(user_id)
+
+    async def sync_user(self, user_id: str, drive_service, max_pages: Optional[int] = None) -> BackupSyncResponse:
+        """Aplicar los cambios de Drive desde la última sincronización del usuario"""
+        max_pages = max_pages or settings.drive_sync_max_pages
+        now = datetime.now()
+        state_ref = self._state_ref(user_id)
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document()
+        record = {
+            'user_id': user_id,
+            'sync_type': 'sync',
+            'backup_type': BackupType.INCREMENTAL.value,
+            'status': SyncStatus.IN_PROGRESS.value,
+            'description': 'Sincronización incremental desde Google Drive',
+            'source_paths': ['drive:changes'],
+            'destination_folder_id': None,
+            'include_deleted': True,
+            'compression': False,
+            'encryption': False,
+            'progress_percentage': 0.0,
+            'error_message': None,
+            'stats': {key: 0 for key in STAT_KEYS},
+            'started_at': now,
+            'completed_at': None,
+            'created_at': now,
+            'updated_at': now
+        }
+
+        def start(transaction, state):
+            transaction.set(record_ref, record)
+            return {'last_sync_id': record_ref.id}
+
+        # La reserva se comprueba y se toma en la misma transacción: dos ejecuciones
+        # concurrentes no pueden aplicar las mismas páginas de cambios
+        state = acquire_lease(self.db, state_ref, now, settings.drive_sync_lease_seconds, start)
+        if state is None:
+            raise SyncInProgressError("Ya hay una sincronización de Drive en curso")
+
+        try:
+            token = state.get('page_token')
+            if not token:
+                # Primera ejecución: solo se registra el punto de partida del feed
+                token = await drive_service.get_start_page_token()
+                record['description'] = 'Punto de partida del feed de cambios registrado'
+                status = SyncStatus.COMPLETED
+            else:
+                status = SyncStatus.PARTIAL
+                context = _SyncContext()
+                for _ in range(max_pages):
+                    page = await drive_service.list_changes(token, self.page_size)
+                    token = page['next_page_token'] or page['new_start_page_token']
+                    batch = self.db.batch()
+                    self._apply_changes(batch, user_id, page['changes'], record['stats'], context)
+                    batch.set(state_ref, {'page_token': token, 'updated_at': datetime.now()}, merge=True)
+                    batch.update(record_ref, {'stats': record['stats'], 'updated_at': datetime.now()})
+                    batch.commit()
+                    if page['new_start_page_token']:
+                        status = SyncStatus.COMPLETED
+                        break
+
+            record.update({
+                'status': status.value,
+                'progress_percentage': 100.0 if status == SyncStatus.COMPLETED else record['progress_percentage'],
+                'completed_at': datetime.now() if status == SyncStatus.COMPLETED else None,
+                'updated_at': datetime.now()
+            })
+            batch = self.db.batch()
+            batch.set(state_ref, {'page_token': token, 'lease_until': None, 'last_synced_at': datetime.now()}, merge=True)
+            batch.set(record_ref, record)
+            batch.commit()
+        except Exception as e:
+            print(f"❌ Error sincronizando Drive de {user_id}: {e}")
+            record.update({'status': SyncStatus.FAILED.value, 'error_message': str(e), 'updated_at': datetime.now()})
+            batch = self.db.batch()
+            batch.set(state_ref, {'lease_until': None}, merge=True)
+            batch.set(record_ref, record)
+            batch.commit()
+
+        record['id'] = record_ref.id
+        return trusted_model(BackupSyncResponse, record)
+
+    def _lookup(self, user_id: str, collection: str, field: str, values: List[str]) -> Dict[str, Tuple[Any, Dict[str, Any]]]:
+        """Buscar documentos del usuario por un campo con consultas 'in' de hasta 30 valores"""
+        found = {}
+        for chunk in _chunks(values, FIRESTORE_IN_LIMIT):
+            query = self.db.collection(collection).where('user_id', '==', user_id).where(field, 'in', chunk)
+            for doc in query.stream():
+                data = doc.to_dict()
+                found[data[field]] = (doc.reference, data)
+        return found
+
+    def _known_folders(self, user_id: str, context: "_SyncContext") -> Dict[str, Optional[str]]:
+        """Carpetas de Drive de Keepi (id → categoría) donde un archivo nuevo se registra como documento"""
+        if context.known_folders is None:
+            known: Dict[str, Optional[str]] = {}
+            counters = self.db.collection(FolderService.COUNTERS_COLLECTION).document(user_id).get()
+            if counters.exists:
+                known.update({folder_id: None for folder_id in ((counters.to_dict() or {}).get('documents') or {})})
+            for doc in self.db.collection('folders').where('user_id', '==', user_id).stream():
+                data = doc.to_dict()
+                if data.get('drive_folder_id'):
+                    known[data['drive_folder_id']] = data.get('category')
+            context.known_folders = known
+        return context.known_folders
+
+    def _folder_category(self, user_id: str, folder_id: str, context: "_SyncContext") -> str:
+        """Categoría de una carpeta de Drive: la de su carpeta de Keepi o la de un documento que contiene"""
+        known = self._known_folders(user_id, context)
+        if known.get(folder_id) is None:
+            docs = list(self.db.collection('documents').where('user_id', '==', user_id)
+                        .where('drive_folder_id', '==', folder_id).select(['category']).limit(1).stream())
+            known[folder_id] = (docs[0].to_dict().get('category') if docs else None) or 'General'
+        return known[folder_id]
+
+    def _apply_changes(self, batch, user_id: str, changes: List[Dict[str, Any]],
+                       stats: Dict[str, int], context: "_SyncContext") -> None:
+        """Agregar al lote las escrituras de una página de cambios"""
+        # Último estado por archivo dentro de la página
+        latest = {change['file_id']: change for change in changes}
+        stats['changes'] += len(latest)
+
+        file_ids = [file_id for file_id, change in latest.items()
+                    if not change['file'] or change['file']['mime_type'] != FOLDER_MIME_TYPE]
+        folder_ids = [file_id for file_id in latest if file_id not in set(file_ids)]
+        documents = self._lookup(user_id, 'documents', 'drive_file_id', file_ids) if file_ids else {}
+        keepi_folders = self._lookup(user_id, 'folders', 'drive_folder_id', folder_ids) if folder_ids else {}
+
+        now = datetime.now()
+        counts: Dict[str, int] = {}
+        documents_written = folders_written = False
+
+        for file_id, change in latest.items():
+            file = change['file']
+            if file_id in keepi_folders:
+                reference, data = keepi_folders[file_id]
+                if file and not change['removed'] and file['name'] and file['name'] != data.get('name'):
+                    batch.update(reference, {'name': file['name'], 'updated_at': now})
+                    stats['folders_renamed'] += 1
+                    folders_written = True
+                else:
+                    stats['skipped'] += 1
+                continue
+
+            existing = documents.get(file_id)
+            if change['removed'] or file is None:
+                if existing is None:
+                    stats['skipped'] += 1
+                    continue
+                reference, data = existing
+                batch.delete(reference)
+                counts[data.get('drive_folder_id')] = counts.get(data.get('drive_folder_id'), 0) - 1
+                stats['deleted'] += 1
+                documents_written = True
+                continue
+
+            parent_id = file['parents'][0] if file['parents'] else None
+            if existing is None:
+                # Archivo nuevo: solo se registra si está en una carpeta de Keepi y no en la papelera
+                if file['trashed'] or file['mime_type'] == FOLDER_MIME_TYPE or parent_id not in self._known_folders(user_id, context):
+                    stats['skipped'] += 1
+                    continue
+                batch.set(self.db.collection('documents').document(), {
+                    'name': file['name'],
+                    'category': self._folder_category(user_id, parent_id, context),
+                    'description': 'Documento sincronizado desde Google Drive',
+                    'file_url': f"https://drive.google.com/file/d/{file_id}/view",
+                    'file_name': file['name'],
+                    'file_size': int(file['size']) if file.get('size') else None,
+                    'file_type': file['mime_type'],
+                    'expiry_date': None,
+                    'metadata': {},
+                    'tags': [],
+                    'drive_file_id': file_id,
+                    'drive_folder_id': parent_id,
+                    'drive_md5_checksum': file.get('md5_checksum'),
+                    'drive_modified_time': file.get('modified_time'),
+                    'user_id': user_id,
+                    'created_at': now,
+                    'updated_at': now,
+                    'is_archived': False,
+                    'is_favorite': False
+                })
+                counts[parent_id] = counts.get(parent_id, 0) + 1
+                stats['created'] += 1
+                documents_written = True
+                continue
+
+            reference, data = existing
+            updates: Dict[str, Any] = {}
+            if file['trashed'] and not data.get('drive_trashed'):
+                updates.update({'is_archived': True, 'drive_trashed': True})
+                stats['trashed'] += 1
+            elif not file['trashed'] and data.get('drive_trashed'):
+                updates.update({'is_archived': False, 'drive_trashed': False})
+                stats['restored'] += 1
+            if file['name'] and file['name'] != data.get('name'):
+                updates.update({'name': file['name'], 'file_name': file['name']})
+                stats['renamed'] += 1
+            if parent_id and parent_id != data.get('drive_folder_id'):
+                updates['drive_folder_id'] = parent_id
+                counts[data.get('drive_folder_id')] = counts.get(data.get('drive_folder_id'), 0) - 1
+                counts[parent_id] = counts.get(parent_id, 0) + 1
+                # Mover a una carpeta de categoría conocida también cambia la categoría
+                category = self._known_folders(user_id, context).get(parent_id)
+                if category and category != data.get('category'):
+                    updates['category'] = category
+                stats['moved'] += 1
+            if not updates:
+                stats['skipped'] += 1
+                continue
+            updates['updated_at'] = now
+            batch.update(reference, updates)
+            documents_written = True
+
+        if documents_written:
+            self.versions.bump(batch, user_id, 'documents')
+            self.folders.count_documents(batch, user_id, counts)
+        if folders_written:
+            self.versions.bump(batch, user_id, 'folders')
+
+    async def get_sync_history(self, user_id: str, limit: int = 20) -> List[BackupSyncResponse]:
+        """Últimas sincronizaciones del usuario"""
+        try:
+            docs = (self.db.collection(BACKUP_SYNC_COLLECTION).where('user_id', '==', user_id)
+                    .order_by('created_at', direction='DESCENDING').limit(limit).stream())
+            records = []
+            for doc in docs:
+                data = doc.to_dict()
+                data['id'] = doc.id
+                records.append(trusted_model(BackupSyncResponse, data))
+            return records
+        except Exception as e:
+            print(f"Error obteniendo historial de sincronización: {e}")
+            return []
+
+
+class _SyncContext:
+    """Datos que se cargan una vez por ejecución"""
+
+    def __init__(self):
+        self.known_folders: Optional[Dict[str, Optional[str]]] = None
@@ -0,0 +1,288 @@
+import hashlib
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from firebase_admin import firestore
+from app.config.database import DatabaseConfig
+from app.config.settings import settings
+from app.models.folder import FolderCreate, FolderUpdate, FolderResponse
+from app.services.collection_version_service import CollectionVersionService
+from app.utils.ttl_cache import TTLCache
+
+# Árbol de carpetas por usuario junto con los sellos (folders, documents) con los que se construyó
+_tree_cache: TTLCache[Tuple[Tuple, List[Dict[str, Any]]]] = TTLCache(
+    settings.folder_tree_cache_max_entries, settings.folder_tree_cache_ttl_seconds
+)
+
+
+class FolderCycleError(ValueError):
+    """El cambio de carpeta padre crearía un ciclo"""
+    pass
+
+
+class FolderNotEmptyError(ValueError):
+    """La carpeta tiene subcarpetas"""
+    pass
+
+
+def tree_stamp_key(stamps: Dict[str, Dict[str, Any]]) -> Tuple:
+    """Clave de validez del árbol: cambia con cualquier escritura de carpetas o documentos"""
+    return tuple((stamps.get(collection) or {}).get('version') for collection in ('folders', 'documents'))
+
+
+def document_folder(data: Dict[str, Any]) -> Optional[str]:
+    """Carpeta del almacenamiento que contiene un documento: la de Drive o el prefijo de su clave en S3 o local"""
+    if data.get('drive_folder_id'):
+        return data['drive_folder_id']
+    return (data.get('storage_key') or '').rpartition('/')[0] or None
+
+
+class FolderService:
+    """Servicio para gestión de carpetas"""
+
+    COUNTERS_COLLECTION = 'folder_counters'
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
+
+    def count_documents(self, batch, user_id: str, counts: Dict[str, int]) -> None:
+        """Agregar al lote el ajuste de los contadores de documentos por carpeta del almacenamiento"""
+        counts = {folder_id: delta for folder_id, delta in counts.items() if folder_id and delta}
+        if not counts:
+            return
+        batch.set(self.db.collection(self.COUNTERS_COLLECTION).document(user_id), {
+            'documents': {folder_id: firestore.Increment(delta) for folder_id, delta in counts.items()}
+        }, merge=True)
+
+    def register_storage_folders(self, batch, user_id: str, documents: List[Dict[str, Any]]) -> int:
+        """Agregar al lote las carpetas por categoría de los documentos que aún no están en folders
+
+        Las subidas crean la carpeta de la categoría en el almacenamiento; aquí se registra la primera
+        vez, junto con el documento. El id se deriva de la carpeta del almacenamiento, así dos subidas
+        simultáneas escriben la misma carpeta. Devuelve el número de operaciones agregadas al lote.
+        """
+        folders: Dict[str, Dict[str, Any]] = {}
+        for data in documents:
+            folder_id = document_folder(data)
+            if folder_id:
+                folders.setdefault(folder_id, data)
+
+        operations = 0
+        now = datetime.now()
+        for folder_id, data in folders.items():
+            on_drive = bool(data.get('drive_folder_id'))
+            field = 'drive_folder_id' if on_drive else 'storage_folder_id'
+            existing = (self.db.collection('folders').where('user_id', '==', user_id)
+                        .where(field, '==', folder_id).limit(1).stream())
+            if any(True for _ in existing):
+                continue
+            doc_id = hashlib.sha1(f"{user_id}:{folder_id}".encode('utf-8')).hexdigest()
+            batch.set(self.db.collection('folders').document(doc_id), {
+                'name': data.get('category', ''),
+                'category': data.get('category', ''),
+                'description': None,
+                'parent_folder_id': None,
+                'drive_folder_id': folder_id if on_drive else '',
+                'drive_parent_id': None,
+                'storage_backend': data.get('storage_backend') or 'drive',
+                'storage_folder_id': None if on_drive else folder_id,
+                'color': None,
+                'icon': None,
+                'user_id': user_id,
+                'documents_count': 0,
+                'subfolders_count': 0,
+                'is_archived': False,
+                'is_favorite': False,
+                'created_at': now,
+                'updated_at': now
+            })
+            operations += 1
+
+        if operations:
+            self.versions.bump(batch, user_id, 'folders')
+            operations += 1
+        return operations
+
+    def _load_tree(self, user_id: str) -> List[Dict[str, Any]]:
+        """Construir el árbol con una consulta de carpetas y una lectura de contadores"""
+        counters_doc = self.db.collection(self.COUNTERS_COLLECTION).document(user_id).get()
+        document_counts = ((counters_doc.to_dict() or {}).get('documents') or {}) if counters_doc.exists else {}
+
+        # Una sola pasada: cada carpeta se indexa y se agrupa bajo el id de su padre
+        nodes: Dict[str, Dict[str, Any]] = {}
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        parent_of: Dict[str, Optional[str]] = {}
+        for doc in self.db.collection('folders').where('user_id', '==', user_id).stream():
+            data = doc.to_dict()
+            node = {
+                'id': doc.id,
+                'name': data.get('name', ''),
+                'category': data.get('category', ''),
+                'drive_folder_id': data.get('drive_folder_id', ''),
+                'documents_count': max(document_counts.get(data.get('drive_folder_id') or data.get('storage_folder_id'), 0), 0),
+                'subfolders_count': 0,
+                'subfolders': [],
+                'created_at': data.get('created_at'),
+                'updated_at': data.get('updated_at')
+            }
+            nodes[doc.id] = node
+            parent_of[doc.id] = data.get('parent_folder_id')
+            children.setdefault(data.get('parent_folder_id'), []).append(node)
+
+        for parent_id, siblings in children.items():
+            siblings.sort(key=lambda node: node['name'].lower())
+            parent = nodes.get(parent_id)
+            if parent is not None:
+                parent['subfolders'] = siblings
+                parent['subfolders_count'] = len(siblings)
+
+        # Raíces: sin padre o con un padre que ya no existe
+        roots = [node for parent_id, siblings in children.items() if parent_id not in nodes for node in siblings]
+
+        # Carpetas en un ciclo (datos inconsistentes) no cuelgan de ninguna raíz: se cortan y se muestran como raíces
+        seen = set()
+        pending = list(roots)
+        while len(seen) < len(nodes):
+            while pending:
+                node = pending.pop()
+                seen.add(node['id'])
+                pending.extend(node['subfolders'])
+            unseen = [node for node in nodes.values() if node['id'] not in seen]
+            if not unseen:
+                break
+            node = min(unseen, key=lambda node: node['name'].lower())
+            parent = nodes[parent_of[node['id']]]
+            parent['subfolders'] = [child for child in parent['subfolders'] if child is not node]
+            parent['subfolders_count'] = len(parent['subfolders'])
+            roots.append(node)
+            pending = [node]
+        roots.sort(key=lambda node: node['name'].lower())
+        return roots
+
+    async def get_folder_tree(self, user_id: str, stamps: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Obtener el árbol de carpetas con sus conteos, desde la caché si los sellos no cambiaron
+
+        Los errores se propagan: el árbol se sirve con el ETag de los sellos (ver conditional_json).
+        """
+        try:
+            if stamps is None:
+                stamps = await self.versions.get_versions(user_id)
+            key = tree_stamp_key(stamps)
+            cached = _tree_cache.get(user_id)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            tree = self._load_tree(user_id)
+            _tree_cache.set(user_id, (key, tree))
+            return tree
+        except Exception as e:
+            print(f"Error obteniendo árbol de carpetas: {e}")
+            raise
+
+    async def get_folder_by_id(self, folder_id: str, user_id: str) -> Optional[FolderResponse]:
+        """Obtener carpeta por ID"""
+        try:
+            doc = self.db.collection('folders').document(folder_id).get()
+            if doc.exists:
+                folder_data = doc.to_dict()
+                if folder_data.get('user_id') == user_id:
+                    folder_data['id'] = folder_id
+                    return FolderResponse(**folder_data)
+            return None
+        except Exception as e:
+            print(f"Error obteniendo carpeta: {e}")
+            return None
+
+    def _parent_map(self, user_id: str) -> Dict[str, Optional[str]]:
+        return {
+            doc.id: doc.to_dict().get('parent_folder_id')
+            for doc in self.db.collection('folders').where('user_id', '==', user_id)
+            .select(['parent_folder_id']).stream()
+        }
+
+    def _check_parent(self, user_id: str, folder_id: Optional[str], parent_folder_id: Optional[str]) -> None:
+        """Validar que el padre exista y que no sea la propia carpeta ni una descendiente"""
+        if parent_folder_id is None:
+            return
+        parents = self._parent_map(user_id)
+        if parent_folder_id not in parents:
+            raise ValueError("Carpeta padre no encontrada")
+        current: Optional[str] = parent_folder_id
+        for _ in range(len(parents) + 1):
+            if current is None:
+                return
+            if current == folder_id:
+                raise FolderCycleError("Una carpeta no puede moverse dentro de sí misma o de una subcarpeta")
+            current = parents.get(current)
+
+    async def create_folder(self, user_id: str, folder_data: FolderCreate) -> FolderResponse:
+        """Crear nueva carpeta"""
+        try:
+            self._check_parent(user_id, None, folder_data.parent_folder_id)
+            folder_dict = folder_data.dict()
+            folder_dict['user_id'] = user_id
+            folder_dict['documents_count'] = 0
+            folder_dict['subfolders_count'] = 0
+            folder_dict['is_archived'] = False
+            folder_dict['is_favorite'] = False
+            folder_dict['created_at'] = datetime.now()
+            folder_dict['updated_at'] = datetime.now()
+
+            # La carpeta y el sello de versión se escriben juntos: el sello invalida el árbol en caché
+            doc_ref = self.db.collection('folders').document()
+            batch = self.db.batch()
+            batch.set(doc_ref, folder_dict)
+            self.versions.bump(batch, user_id, 'folders')
+            batch.commit()
+            folder_dict['id'] = doc_ref.id
+
+            return FolderResponse(**folder_dict)
+        except Exception as e:
+            print(f"Error creando carpeta: {e}")
+            raise
+
+    async def update_folder(self, folder_id: str, user_id: str, folder_data: FolderUpdate) -> Optional[FolderResponse]:
+        """Actualizar carpeta"""
+        doc_ref = self.db.collection('folders').document(folder_id)
+        doc = doc_ref.get()
+        if not doc.exists or doc.to_dict().get('user_id') != user_id:
+            return None
+
+        update_data = folder_data.dict(exclude_unset=True)
+        if 'parent_folder_id' in update_data:
+            self._check_parent(user_id, folder_id, update_data['parent_folder_id'])
+        update_data['updated_at'] = datetime.now()
+
+        try:
+            batch = self.db.batch()
+            batch.update(doc_ref, update_data)
+            self.versions.bump(batch, user_id, 'folders')
+            batch.commit()
+
+            updated_folder = doc_ref.get().to_dict()
+            updated_folder['id'] = folder_id
+            return FolderResponse(**updated_folder)
+        except Exception as e:
+            print(f"Error actualizando carpeta: {e}")
+            return None
+
+    async def delete_folder(self, folder_id: str, user_id: str) -> bool:
+        """Eliminar carpeta (solo si no tiene subcarpetas)"""
+        doc_ref = self.db.collection('folders').document(folder_id)
+        doc = doc_ref.get()
+        if not doc.exists or doc.to_dict().get('user_id') != user_id:
+            return False
+
+        subfolders = (self.db.collection('folders').where('user_id', '==', user_id)
+                      .where('parent_folder_id', '==', folder_id).limit(1).stream())
+        if any(True for _ in subfolders):
+            raise FolderNotEmptyError("La carpeta tiene subcarpetas")
+
+        try:
+            batch = self.db.batch()
+            batch.delete(doc_ref)
+            self.versions.bump(batch, user_id, 'folders')
+            batch.commit()
+            return True
+        except Exception as e:
+            print(f"Error eliminando carpeta: {e}")
+            return False
@@ -1,27 +1,35 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
+from firebase_admin import firestore
 from app.config.database import DatabaseConfig
 from app.models.notification import NotificationCreate, NotificationUpdate, NotificationResponse
+from app.services.collection_version_service import CollectionVersionService
+from app.utils.responses import trusted_model
+from app.utils.sparse_fields import projection, slim_model
 
 class NotificationService:
     """Servicio para gestión de notificaciones"""
     
     def __init__(self):
         self.db = DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
     
-    async def get_user_notifications(self, user_id: str) -> List[NotificationResponse]:
-        """Obtener todas las notificaciones de un usuario"""
+    async def get_user_notifications(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> List[NotificationResponse]:
+        """Obtener todas las notificaciones de un usuario (los errores se propagan, ver get_user_documents)"""
         try:
-            docs = self.db.collection('notifications').where('user_id', '==', user_id).order_by('created_at', direction='desc').stream()
+            query = self.db.collection('notifications').where('user_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING)
+            if fields:
+                query = query.select(projection(fields))
+            model_cls = slim_model(NotificationResponse, fields) if fields else NotificationResponse
             notifications = []
-            for doc in docs:
+            for doc in query.stream():
                 notification_data = doc.to_dict()
                 notification_data['id'] = doc.id
-                notifications.append(NotificationResponse(**notification_data))
+                notifications.append(trusted_model(model_cls, notification_data))
             return notifications
         except Exception as e:
             print(f"Error obteniendo notificaciones: {e}")
-            return []
+            raise
     
     async def get_notification_by_id(self, notification_id: str, user_id: str) -> Optional[NotificationResponse]:
         """Obtener notificación por ID"""
@@ -47,8 +55,13 @@ class NotificationService:
             notification_dict['read'] = False
             notification_dict['created_at'] = datetime.now()
             
-            doc_ref = self.db.collection('notifications').add(notification_dict)
-            notification_dict['id'] = doc_ref[1].id
+            # La notificación y el sello de versión de la colección se escriben juntos
+            doc_ref = self.db.collection('notifications').document()
+            batch = self.db.batch()
+            batch.set(doc_ref, notification_dict)
+            self.versions.bump(batch, user_id, 'notifications')
+            batch.commit()
+            notification_dict['id'] = doc_ref.id
             
             return NotificationResponse(**notification_dict)
         except Exception as e:
@@ -68,10 +81,13 @@ class NotificationService:
             if notification_data.get('user_id') != user_id:
                 return False
             
-            doc_ref.update({
+            batch = self.db.batch()
+            batch.update(doc_ref, {
                 "read": True,
                 "read_at": datetime.now()
             })
+            self.versions.bump(batch, user_id, 'notifications')
+            batch.commit()
             return True
         except Exception as e:
             print(f"Error marcando notificación como leída: {e}")
@@ -90,7 +106,10 @@ class NotificationService:
             if notification_data.get('user_id') != user_id:
                 return False
             
-            doc_ref.delete()
+            batch = self.db.batch()
+            batch.delete(doc_ref)
+            self.versions.bump(batch, user_id, 'notifications')
+            batch.commit()
             return True
         except Exception as e:
             print(f"Error eliminando notificación: {e}")
@@ -1,6 +1,5 @@
 from typing import Dict, Any, Optional
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
 import json
 import os
@@ -23,14 +22,20 @@ class GoogleOAuthService:
         # URL de callback desde variables de entorno
         self.redirect_uri = settings.google_redirect_uri or f"{settings.host}/api/v1/auth/google/callback"
     
+    def _flow(self):
+        """Flujo OAuth de la aplicación (google_auth_oauthlib se importa al primer uso)"""
+        from google_auth_oauthlib.flow import Flow
+        
+        return Flow.from_client_secrets_file(
+            self.client_secrets_file,
+            scopes=self.scopes,
+            redirect_uri=self.redirect_uri
+        )
+    
     async def get_authorization_url(self, user_id: str) -> Dict[str, str]:
         """Generar URL de autorización para Google Drive"""
         try:
-            flow = Flow.from_client_secrets_file(
-                self.client_secrets_file,
-                scopes=self.scopes,
-                redirect_uri=self.redirect_uri
-            )
+            flow = self._flow()
             
             # Generar state personalizado con el user_id
             state = base64.b64encode(user_id.encode('utf-8')).decode('utf-8')
@@ -62,11 +67,7 @@ class GoogleOAuthService:
         """Intercambiar código de autorización por tokens"""
         try:
             # Crear nuevo flow para intercambiar tokens
-            flow = Flow.from_client_secrets_file(
-                self.client_secrets_file,
-                scopes=self.scopes,
-                redirect_uri=self.redirect_uri
-            )
+            flow = self._flow()
             
             # Intercambiar código por tokens
             flow.fetch_token(code=authorization_code)
@@ -176,11 +177,7 @@ class GoogleOAuthService:
         """Obtener user_id desde un código de autorización temporal"""
         try:
             # Crear un flow temporal para obtener información del código
-            flow = Flow.from_client_secrets_file(
-                self.client_secrets_file,
-                scopes=self.scopes,
-                redirect_uri=self.redirect_uri
-            )
+            flow = self._flow()
             
             # Intentar obtener tokens para extraer información
             flow.fetch_token(code=code)
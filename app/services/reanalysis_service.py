@@ -0,0 +1,200 @@
+import asyncio
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.models.ai_analysis import AnalysisTier
+from app.models.user import UserSettings
+from app.services.ai_analysis_service import STAGE_VERSIONS, AI_MODEL_VERSION
+from app.services.collection_version_service import CollectionVersionService
+from app.services.user_service import UserService
+from app.utils.text_classifier import classify_text
+from app.utils.metadata_extractor import extract_metadata_fields
+
+CHECKPOINT_COLLECTION = 'job_checkpoints'
+REANALYSIS_JOB_ID = 'reanalysis'
+
+# Versión de las etapas en los análisis guardados antes de registrar stage_versions
+BASELINE_STAGE_VERSION = "1.0.0"
+
+# Operaciones por documento en el lote: análisis, documento, historial y sello de versión
+OPERATIONS_PER_DOCUMENT = 4
+
+
+def stale_stages(stored_versions: Optional[Dict[str, str]]) -> List[str]:
+    """Etapas cuya lógica cambió desde el análisis guardado
+
+    La extracción nunca se repite: el texto guardado es la entrada del reanálisis.
+    """
+    stored_versions = stored_versions or {}
+    return [
+        stage for stage, version in STAGE_VERSIONS.items()
+        if stage != "extract" and stored_versions.get(stage, BASELINE_STAGE_VERSION) != version
+    ]
+
+
+class ReanalysisService:
+    """Reclasificación masiva de los análisis con una versión anterior de AI_MODEL_VERSION
+
+    Recorre ai_analysis por (ai_model_version, __name__) con un cursor que se guarda en el
+    mismo lote que las escrituras de cada página, así que una ejecución interrumpida continúa
+    donde quedó. Cada usuario tiene un máximo de documentos por ejecución; los que lo superan
+    siguen desactualizados y se retoman en la pasada siguiente.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
+        # El punto de control de cada página ocupa una operación más del lote
+        self.page_size = min(settings.reanalysis_page_size, (FIRESTORE_BATCH_LIMIT - 1) // OPERATIONS_PER_DOCUMENT)
+        self.pause = settings.reanalysis_pause_ms / 1000
+        self.max_per_user = settings.reanalysis_max_per_user
+        self._user_settings: Dict[str, UserSettings] = {}
+
+    def _checkpoint_ref(self):
+        return self.db.collection(CHECKPOINT_COLLECTION).document(REANALYSIS_JOB_ID)
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        doc = self._checkpoint_ref().get()
+        checkpoint = (doc.to_dict() or {}) if doc.exists else {}
+        if checkpoint.get('target_version') != AI_MODEL_VERSION:
+            # Nueva versión del analizador: la pasada empieza desde el principio
+            checkpoint = {'target_version': AI_MODEL_VERSION, 'pass': 1, 'processed': 0, 'changed': 0, 'deferred': 0}
+        return checkpoint
+
+    async def _settings_for(self, user_id: str) -> UserSettings:
+        if user_id not in self._user_settings:
+            self._user_settings[user_id] = await UserService().get_user_settings(user_id)
+        return self._user_settings[user_id]
+
+    def _stale_query(self):
+        return (self.db.collection('ai_analysis')
+                .where('ai_model_version', '!=', AI_MODEL_VERSION)
+                .order_by('ai_model_version')
+                .order_by('__name__'))
+
+    async def reanalyze(self, analysis: Dict[str, Any], document: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Rehacer las etapas desactualizadas de un análisis guardado
+
+        Devuelve los campos a actualizar y la categoría anterior si la categoría cambió.
+        """
+        stored_versions = analysis.get('stage_versions') or {}
+        stages = stale_stages(stored_versions)
+        # Las etapas no repetidas ya estaban al día; el texto conserva la versión con la que se extrajo
+        stage_versions = {**STAGE_VERSIONS, 'extract': stored_versions.get('extract', BASELINE_STAGE_VERSION)}
+        updates: Dict[str, Any] = {
+            'ai_model_version': AI_MODEL_VERSION,
+            'stage_versions': stage_versions,
+            'analysis_version': (analysis.get('analysis_version') or 1) + 1,
+            'updated_at': datetime.now()
+        }
+        text = analysis.get('extracted_text') or ''
+        previous_category = None
+
+        user_settings = await self._settings_for(analysis.get('user_id', ''))
+        categorize = (analysis.get('analysis_tier') != AnalysisTier.NONE.value
+                      and user_settings.ai_analysis_enabled and user_settings.auto_categorization)
+        if 'classify' in stages and categorize:
+            classification = classify_text(text, (document or {}).get('name') or '')
+            updates.update({
+                'suggested_category': classification['category'],
+                'confidence_score': classification['confidence'],
+                'tags': classification['tags']
+            })
+            if classification['category'] != analysis.get('suggested_category'):
+                previous_category = analysis.get('suggested_category')
+
+        if 'metadata' in stages and text:
+            updates.update(extract_metadata_fields(text))
+
+        return updates, previous_category
+
+    async def run(self, max_documents: Optional[int] = None) -> Dict[str, Any]:
+        """Procesar análisis desactualizados desde el último punto de control"""
+        checkpoint = self._load_checkpoint()
+        # Totales de la pasada hasta la ejecución anterior
+        base = {key: checkpoint.get(key, 0) for key in ('processed', 'changed', 'deferred')}
+        per_user: Dict[str, int] = {}
+        processed = changed = deferred = 0
+        finished = False
+
+        while max_documents is None or processed < max_documents:
+            query = self._stale_query()
+            if checkpoint.get('cursor_id'):
+                query = query.start_after({'ai_model_version': checkpoint['cursor_version'], '__name__': checkpoint['cursor_id']})
+            limit = self.page_size if max_documents is None else min(self.page_size, max_documents - processed)
+            page = list(query.limit(limit).stream())
+            if not page:
+                finished = True
+                break
+
+            # Documentos de la página en una sola lectura
+            analyses = [(doc.id, doc.to_dict()) for doc in page]
+            document_refs = [self.db.collection('documents').document(data['document_id'])
+                             for _, data in analyses if data.get('document_id')]
+            documents = {snapshot.id: snapshot.to_dict() for snapshot in self.db.get_all(document_refs) if snapshot.exists}
+
+            batch = self.db.batch()
+            bumped = set()
+            for analysis_id, analysis in analyses:
+                user_id = analysis.get('user_id')
+                if per_user.get(user_id, 0) >= self.max_per_user:
+                    deferred += 1
+                    continue
+                per_user[user_id] = per_user.get(user_id, 0) + 1
+
+                document = documents.get(analysis.get('document_id'))
+                if document is not None and document.get('user_id') != user_id:
+                    document = None
+                updates, previous_category = await self.reanalyze(analysis, document)
+                batch.update(self.db.collection('ai_analysis').document(analysis_id), updates)
+                processed += 1
+
+                if previous_category is None:
+                    continue
+                changed += 1
+                batch.set(self.db.collection('ai_analysis_history').document(), {
+                    'document_id': analysis['document_id'],
+                    'user_id': user_id,
+                    'analysis_version': updates['analysis_version'],
+                    'previous_category': previous_category,
+                    'new_category': updates['suggested_category'],
+                    'confidence_score': updates['confidence_score'],
+                    'reason_for_change': f"Reclasificación {analysis.get('ai_model_version')} -> {AI_MODEL_VERSION}",
+                    'created_at': datetime.now()
+                })
+                # Solo se mueve el documento si su categoría sigue siendo la sugerida (no la eligió el usuario)
+                if document is not None and document.get('category') == previous_category:
+                    batch.update(self.db.collection('documents').document(analysis['document_id']), {
+                        'category': updates['suggested_category'],
+                        'tags': updates['tags'],
+                        'updated_at': datetime.now()
+                    })
+                    if user_id not in bumped:
+                        self.versions.bump(batch, user_id, 'documents')
+                        bumped.add(user_id)
+
+            last_id, last = analyses[-1]
+            checkpoint.update({
+                'cursor_id': last_id,
+                'cursor_version': last.get('ai_model_version'),
+                'processed': base['processed'] + processed,
+                'changed': base['changed'] + changed,
+                'deferred': base['deferred'] + deferred,
+                'updated_at': datetime.now()
+            })
+            # El cursor avanza en el mismo lote que las escrituras de la página
+            batch.set(self._checkpoint_ref(), checkpoint)
+            batch.commit()
+            await asyncio.sleep(self.pause)
+
+        if finished:
+            # Fin de la pasada: la siguiente vuelve al principio para retomar los aplazados
+            if checkpoint.get('deferred'):
+                checkpoint.update({'pass': checkpoint.get('pass', 1) + 1, 'deferred': 0})
+            else:
+                checkpoint['completed_at'] = datetime.now()
+            checkpoint.update({'cursor_id': None, 'cursor_version': None, 'updated_at': datetime.now()})
+            self._checkpoint_ref().set(checkpoint)
+
+        return {'processed': processed, 'changed': changed, 'deferred': deferred, 'finished': finished}
@@ -0,0 +1,400 @@
+import hashlib
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, List, Dict, Any, BinaryIO, Iterator, Tuple, Set
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.models.user import UserSettings
+
+# Tamaño de lectura de la entrada y de cada fragmento al servir un archivo
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+# Tamaño mínimo de una parte de subida multiparte en S3 (excepto la última)
+S3_MIN_PART_BYTES = 5 * 1024 * 1024
+
+STORAGE_BACKENDS = ('drive', 's3', 'local')
+
+
+class StorageAuthorizationError(Exception):
+    """El usuario no autorizó el almacenamiento elegido (Google Drive)"""
+    pass
+
+
+def _safe_name(name: str) -> str:
+    """Nombre utilizable como segmento de ruta o de clave"""
+    name = re.sub(r'[\\/\x00-\x1f]', '_', name or '').strip()
+    return name if name not in ('', '.', '..') else 'archivo'
+
+
+def user_key_prefix(storage_name: str, user_id: str) -> str:
+    """Prefijo bajo el que quedan las claves de los archivos de un usuario en S3 o local"""
+    if storage_name == 's3':
+        return "/".join(filter(None, [settings.storage_s3_prefix.strip('/'), user_id])) + "/"
+    return f"{_safe_name(user_id)}/"
+
+
+def owns_storage_key(storage_name: str, user_id: str, key: Optional[str]) -> bool:
+    """La clave está bajo el prefijo del usuario y no sale de él con segmentos '..'"""
+    return bool(key) and key.startswith(user_key_prefix(storage_name, user_id)) and '..' not in key.split('/')
+
+
+def _read_parts(stream: BinaryIO, size: int) -> Iterator[bytes]:
+    """Leer la entrada en bloques de size bytes (el último puede ser menor)"""
+    while True:
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = stream.read(min(STREAM_CHUNK_BYTES, size - len(buffer)))
+            if not chunk:
+                break
+            buffer += chunk
+        if not buffer:
+            return
+        yield bytes(buffer)
+        if len(buffer) < size:
+            return
+
+
+def _skip(chunks: Iterator[bytes], offset: int) -> Iterator[bytes]:
+    """Descartar los primeros offset bytes de un iterador de fragmentos"""
+    for chunk in chunks:
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        yield chunk[offset:] if offset else chunk
+        offset = 0
+
+
+class S3MultipartUpload:
+    """Subida multiparte a S3 con varias partes en vuelo a la vez
+
+    add_part() no bloquea mientras haya menos de max_in_flight partes subiéndose, así que
+    la memoria queda acotada a max_in_flight partes.
+    """
+
+    def __init__(self, client, bucket: str, key: str, max_in_flight: int, content_type: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.max_in_flight = max(max_in_flight, 1)
+        extra = {'ContentType': content_type} if content_type else {}
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, **extra)['UploadId']
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self.in_flight: Set[Future] = set()
+        self.parts: List[Dict[str, Any]] = []
+
+    def _upload(self, number: int, data: bytes) -> Dict[str, Any]:
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+        )
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def _collect(self, futures) -> None:
+        for future in futures:
+            self.in_flight.discard(future)
+            self.parts.append(future.result())
+
+    def add_part(self, data: bytes) -> None:
+        if len(self.in_flight) >= self.max_in_flight:
+            done, _ = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        number = len(self.parts) + len(self.in_flight) + 1
+        self.in_flight.add(self.executor.submit(self._upload, number, data))
+
+    def complete(self) -> None:
+        try:
+            self._collect(list(self.in_flight))
+            if not self.parts:
+                self.parts.append(self._upload(1, b""))
+            self.parts.sort(key=lambda part: part['PartNumber'])
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={'Parts': self.parts}
+            )
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def abort(self) -> None:
+        for future in self.in_flight:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"⚠️ No se pudo cancelar la subida multiparte {self.upload_id}: {e}")
+
+
+def s3_client():
+    """Cliente de S3 (o compatible) con la configuración de la implantación"""
+    import boto3
+    return boto3.client('s3', endpoint_url=settings.storage_s3_endpoint_url or None)
+
+
+class StorageBackend(ABC):
+    """Almacenamiento de los archivos de los documentos
+
+    Las subidas reciben un archivo abierto y lo leen por bloques; devuelven
+    {file_id, folder_id, url, md5_checksum, size}.
+    """
+
+    name = ''
+
+    @abstractmethod
+    async def get_or_create_folder(self, name: str) -> str:
+        ...
+
+    @abstractmethod
+    async def upload_stream(self, stream: BinaryIO, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def stream_file(self, file_id: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        """Tamaño y fragmentos de un archivo (bloqueante: se usa desde el pool de hilos)"""
+
+    def stream_range(self, file_id: str, start: int,
+                     chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        """Tamaño total y fragmentos desde el byte start; por defecto se descarta lo anterior"""
+        size, chunks = self.stream_file(file_id, chunk_size)
+        return size, _skip(chunks, start)
+
+    @abstractmethod
+    async def delete_file(self, file_id: str) -> bool:
+        ...
+
+
+class DriveStorageBackend(StorageBackend):
+    """Archivos en el Google Drive del usuario, en una carpeta por categoría"""
+
+    name = 'drive'
+
+    def __init__(self, drive_service):
+        self.drive = drive_service
+
+    async def get_or_create_folder(self, name: str) -> str:
+        return await self.drive.get_or_create_folder(name)
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        file = await self.drive.upload_stream(stream, file_name, folder_id, mime_type)
+        return {
+            'file_id': file['id'],
+            'folder_id': folder_id,
+            'url': f"https://drive.google.com/file/d/{file['id']}/view",
+            'md5_checksum': file.get('md5_checksum'),
+            'size': int(file['size']) if file.get('size') else None
+        }
+
+    def stream_file(self, file_id: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        return self.drive.stream_file(file_id, chunk_size)
+
+    def stream_revision(self, file_id: str, start: int,
+                        chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Optional[str], Iterator[bytes]]:
+        """Como stream_range, con el md5 de la revisión descargada (None si Drive no lo da)"""
+        size, md5_checksum, chunks = self.drive.stream_head_revision(file_id, chunk_size)
+        return size, md5_checksum, _skip(chunks, start)
+
+    async def delete_file(self, file_id: str) -> bool:
+        return await self.drive.delete_file(file_id)
+
+
+class S3StorageBackend(StorageBackend):
+    """Archivos en S3 o un almacenamiento compatible, bajo {prefijo}/{usuario}/{carpeta}/
+
+    Los archivos de más de una parte se suben en multiparte con varias partes en paralelo.
+    """
+
+    name = 's3'
+
+    def __init__(self, user_id: str, client=None, bucket: Optional[str] = None):
+        self.user_id = user_id
+        self.client = client or s3_client()
+        self.bucket = bucket or settings.storage_s3_bucket
+        if not self.bucket:
+            raise ValueError("STORAGE_S3_BUCKET no está configurado")
+        self.prefix = settings.storage_s3_prefix.strip('/')
+        self.part_size = max(settings.storage_s3_part_size_mb * 1024 * 1024, S3_MIN_PART_BYTES)
+        self.concurrency = settings.storage_s3_upload_concurrency
+
+    async def get_or_create_folder(self, name: str) -> str:
+        # En S3 las carpetas son prefijos: no hay nada que crear
+        return _safe_name(name)
+
+    def _upload(self, stream: BinaryIO, key: str, mime_type: Optional[str]) -> Tuple[str, int]:
+        md5 = hashlib.md5()
+        size = 0
+        parts = _read_parts(stream, self.part_size)
+        first = next(parts, b"")
+        md5.update(first)
+        size += len(first)
+        if len(first) < self.part_size:
+            # Cabe en una parte: una sola petición
+            extra = {'ContentType': mime_type} if mime_type else {}
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first, **extra)
+            return md5.hexdigest(), size
+
+        upload = S3MultipartUpload(self.client, self.bucket, key, self.concurrency, mime_type)
+        try:
+            upload.add_part(first)
+            for part in parts:
+                md5.update(part)
+                size += len(part)
+                upload.add_part(part)
+            upload.complete()
+        except Exception:
+            upload.abort()
+            raise
+        return md5.hexdigest(), size
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        key = "/".join(filter(None, [self.prefix, self.user_id, folder_id, f"{uuid.uuid4().hex}-{_safe_name(file_name)}"]))
+        md5_checksum, size = await run_in_threadpool(self._upload, stream, key, mime_type)
+        return {
+            'file_id': key,
+            'folder_id': folder_id,
+            'url': f"s3://{self.bucket}/{key}",
+            'md5_checksum': md5_checksum,
+            'size': size
+        }
+
+    def _key(self, file_id: str) -> str:
+        """Clave de un archivo del usuario; las de otros usuarios se rechazan"""
+        if not owns_storage_key(self.name, self.user_id, file_id):
+            raise ValueError("Clave de archivo no válida")
+        return file_id
+
+    def stream_file(self, file_id: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        key = self._key(file_id)
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response['ContentLength'], response['Body'].iter_chunks(chunk_size)
+
+    def stream_range(self, file_id: str, start: int,
+                     chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        if start <= 0:
+            return self.stream_file(file_id, chunk_size)
+        key = self._key(file_id)
+        size = self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        if start >= size:
+            return size, iter(())
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-")
+        return size, response['Body'].iter_chunks(chunk_size)
+
+    async def delete_file(self, file_id: str) -> bool:
+        try:
+            await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=self._key(file_id))
+            return True
+        except Exception as e:
+            print(f"Error eliminando archivo de S3: {e}")
+            return False
+
+
+class LocalStorageBackend(StorageBackend):
+    """Archivos en un directorio local, bajo {raíz}/{usuario}/{carpeta}/
+
+    No necesita credenciales ni red: sirve para instalaciones sin nube y para medir la
+    ruta de subida completa sin servicios externos.
+    """
+
+    name = 'local'
+
+    def __init__(self, user_id: str, root: Optional[str] = None):
+        self.user_id = user_id
+        self.root = os.path.abspath(root or settings.storage_local_dir)
+
+    def _path(self, file_id: str) -> str:
+        """Ruta de un archivo o carpeta del usuario: tiene que quedar bajo {raíz}/{usuario}/"""
+        path = os.path.abspath(os.path.join(self.root, file_id))
+        if not path.startswith(os.path.join(self.root, _safe_name(self.user_id)) + os.sep):
+            raise ValueError("Ruta de archivo no válida")
+        return path
+
+    async def get_or_create_folder(self, name: str) -> str:
+        folder_id = f"{_safe_name(self.user_id)}/{_safe_name(name)}"
+        await run_in_threadpool(os.makedirs, self._path(folder_id), exist_ok=True)
+        return folder_id
+
+    def _upload(self, stream: BinaryIO, file_id: str) -> Tuple[str, int]:
+        md5 = hashlib.md5()
+        size = 0
+        path = self._path(file_id)
+        partial_path = f"{path}.part"
+        try:
+            with open(partial_path, 'wb') as target:
+                for chunk in iter(lambda: stream.read(STREAM_CHUNK_BYTES), b""):
+                    md5.update(chunk)
+                    size += len(chunk)
+                    target.write(chunk)
+            os.replace(partial_path, path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        return md5.hexdigest(), size
+
+    async def upload_stream(self, stream: BinaryIO, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        file_id = f"{folder_id}/{uuid.uuid4().hex}-{_safe_name(file_name)}"
+        md5_checksum, size = await run_in_threadpool(self._upload, stream, file_id)
+        return {
+            'file_id': file_id,
+            'folder_id': folder_id,
+            'url': f"file://{self._path(file_id)}",
+            'md5_checksum': md5_checksum,
+            'size': size
+        }
+
+    def stream_file(self, file_id: str, chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        return self.stream_range(file_id, 0, chunk_size)
+
+    def stream_range(self, file_id: str, start: int,
+                     chunk_size: int = STREAM_CHUNK_BYTES) -> Tuple[int, Iterator[bytes]]:
+        path = self._path(file_id)
+        size = os.path.getsize(path)
+
+        def chunks() -> Iterator[bytes]:
+            with open(path, 'rb') as source:
+                source.seek(start)
+                yield from iter(lambda: source.read(chunk_size), b"")
+
+        return size, chunks()
+
+    async def delete_file(self, file_id: str) -> bool:
+        try:
+            await run_in_threadpool(os.remove, self._path(file_id))
+            return True
+        except OSError as e:
+            print(f"Error eliminando archivo local: {e}")
+            return False
+
+
+def resolve_storage_name(user_settings: Optional[UserSettings] = None) -> str:
+    """Almacenamiento elegido por el usuario o, si no eligió, el de la implantación
+
+    El usuario solo puede elegir Drive o S3; el local se activa únicamente con STORAGE_BACKEND.
+    """
+    name = (user_settings.storage_backend if user_settings else None) or settings.storage_backend
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Almacenamiento no soportado: {name}")
+    return name
+
+
+async def get_storage_backend(user_id: str, user_settings: Optional[UserSettings] = None,
+                              name: Optional[str] = None) -> StorageBackend:
+    """Construir el almacenamiento de un usuario (el indicado o el que resulte de su configuración)"""
+    name = name or resolve_storage_name(user_settings)
+    if name == 'local':
+        return LocalStorageBackend(user_id)
+    if name == 's3':
+        return S3StorageBackend(user_id)
+
+    from app.services.oauth_service import GoogleOAuthService
+    from app.services.drive_service import get_drive_service
+
+    user_credentials = await GoogleOAuthService().refresh_user_tokens(user_id)
+    if not user_credentials:
+        raise StorageAuthorizationError(
+            "Usuario no ha autorizado acceso a Google Drive. Use /api/v1/auth/google/authorize primero."
+        )
+    return DriveStorageBackend(get_drive_service(user_credentials))
@@ -0,0 +1,377 @@
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.models.backup_sync import (
+    SyncStatus, BackupSyncResponse, SyncConflict, ConflictType, ConflictResolution, ConflictResolveResult
+)
+from app.services.collection_version_service import CollectionVersionService
+from app.services.folder_service import FolderService
+from app.services.thumbnail_service import THUMBNAILS_COLLECTION
+from app.utils.responses import trusted_model
+
+CONFLICTS_COLLECTION = 'sync_conflicts'
+BACKUP_SYNC_COLLECTION = 'backup_sync'
+
+# Campos del documento de Keepi que intervienen en la comparación
+COMPARED_FIELDS = ['name', 'file_name', 'drive_file_id', 'drive_folder_id', 'drive_md5_checksum', 'drive_modified_time']
+
+STAT_KEYS = ('checked', 'modified', 'renamed', 'deleted', 'baselined', 'unchanged', 'cleared')
+
+
+def _local_version(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'name': data.get('file_name') or data.get('name'),
+        'md5_checksum': data.get('drive_md5_checksum'),
+        'modified_time': data.get('drive_modified_time')
+    }
+
+
+def _remote_version(file: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'name': file['name'],
+        'md5_checksum': file['md5_checksum'],
+        'modified_time': file['modified_time'],
+        'size': file['size'],
+        'trashed': file['trashed']
+    }
+
+
+class SyncConflictService:
+    """Detección y resolución de conflictos entre los documentos de Keepi y Drive
+
+    La detección no descarga contenidos: recorre los archivos de Drive en páginas grandes
+    (solo metadatos) y compara su md5Checksum, modifiedTime y nombre con los guardados en
+    cada documento. Los documentos sin suma guardada toman la de Drive como base sin
+    generar conflicto. Los conflictos tienen id {documento}_{tipo}, así que repetir la
+    detección no los duplica, y los pendientes que ya no se reproducen se eliminan.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+        self.versions = CollectionVersionService(self.db)
+        self.folders = FolderService(self.db)
+        self.page_size = settings.sync_conflict_page_size
+
+    def _pending_conflicts_query(self, user_id: str):
+        return (self.db.collection(CONFLICTS_COLLECTION)
+                .where('user_id', '==', user_id)
+                .where('resolved_at', '==', None))
+
+    async def start_detection(self, user_id: str) -> BackupSyncResponse:
+        """Registrar una detección de conflictos en curso"""
+        now = datetime.now()
+        record = {
+            'user_id': user_id,
+            'sync_type': 'sync',
+            'backup_type': None,
+            'status': SyncStatus.IN_PROGRESS.value,
+            'description': 'Detección de conflictos con Google Drive',
+            'source_paths': ['drive:files'],
+            'destination_folder_id': None,
+            'include_deleted': True,
+            'compression': False,
+            'encryption': False,
+            'progress_percentage': 0.0,
+            'error_message': None,
+            'stats': {key: 0 for key in STAT_KEYS},
+            'started_at': now,
+            'completed_at': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document()
+        record_ref.set(record)
+        record['id'] = record_ref.id
+        return trusted_model(BackupSyncResponse, record)
+
+    async def detect_conflicts(self, record: BackupSyncResponse, drive_service) -> BackupSyncResponse:
+        """Comparar los documentos del usuario con sus archivos de Drive y guardar los conflictos"""
+        user_id = record.user_id
+        record_ref = self.db.collection(BACKUP_SYNC_COLLECTION).document(record.id)
+        stats = {key: 0 for key in STAT_KEYS}
+        try:
+            # Solo los campos comparados: una entrada pequeña por documento con archivo en Drive
+            documents: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+            query = self.db.collection('documents').where('user_id', '==', user_id).select(COMPARED_FIELDS)
+            for doc in query.stream():
+                data = doc.to_dict()
+                if data.get('drive_file_id'):
+                    documents[data['drive_file_id']] = (doc.id, data)
+
+            pending = {
+                doc.id: doc.to_dict().get('remote_version')
+                for doc in self._pending_conflicts_query(user_id).select(['remote_version']).stream()
+            }
+            detected = set()
+            writer = _BatchWriter(self, user_id)
+
+            def conflict(conflict_type: ConflictType, doc_id: str, data: Dict[str, Any],
+                         remote: Optional[Dict[str, Any]]) -> None:
+                conflict_id = f"{doc_id}_{conflict_type.value}"
+                detected.add(conflict_id)
+                stats[conflict_type.value] += 1
+                if conflict_id in pending and pending[conflict_id] == remote:
+                    return
+                writer.set(self.db.collection(CONFLICTS_COLLECTION).document(conflict_id), {
+                    'backup_sync_id': record.id,
+                    'user_id': user_id,
+                    'document_id': doc_id,
+                    'drive_file_id': data['drive_file_id'],
+                    'file_path': data.get('file_name') or data.get('name') or data['drive_file_id'],
+                    'conflict_type': conflict_type.value,
+                    'local_version': _local_version(data),
+                    'remote_version': remote,
+                    'resolution': None,
+                    'created_at': datetime.now(),
+                    'resolved_at': None
+                })
+
+            seen = set()
+            token = None
+            while True:
+                page = await drive_service.list_files(token, self.page_size)
+                for file in page['files']:
+                    entry = documents.get(file['id'])
+                    if entry is None:
+                        continue
+                    seen.add(file['id'])
+                    stats['checked'] += 1
+                    doc_id, data = entry
+                    remote = _remote_version(file)
+
+                    if file['trashed']:
+                        conflict(ConflictType.DELETED, doc_id, data, remote)
+                        continue
+
+                    stored_md5 = data.get('drive_md5_checksum')
+                    stored_time = data.get('drive_modified_time')
+                    if stored_md5 is None and stored_time is None:
+                        # Sin base guardada: se adopta la de Drive
+                        writer.update_document(doc_id, {
+                            'drive_md5_checksum': file['md5_checksum'],
+                            'drive_modified_time': file['modified_time']
+                        })
+                        stats['baselined'] += 1
+                        continue
+
+                    found = False
+                    if file['md5_checksum'] and stored_md5:
+                        modified = file['md5_checksum'] != stored_md5
+                    else:
+                        # Archivos nativos de Google no tienen md5: se compara la fecha de modificación
+                        modified = stored_time is not None and file['modified_time'] != stored_time
+                    if modified:
+                        conflict(ConflictType.MODIFIED, doc_id, data, remote)
+                        found = True
+                    elif stored_time is None:
+                        writer.update_document(doc_id, {'drive_modified_time': file['modified_time']})
+                        stats['baselined'] += 1
+
+                    local_name = data.get('file_name')
+                    if local_name and file['name'] != local_name:
+                        conflict(ConflictType.RENAMED, doc_id, data, remote)
+                        found = True
+                    if not found:
+                        stats['unchanged'] += 1
+
+                token = page['next_page_token']
+                if not token:
+                    break
+
+            # Lo que no apareció en Drive se eliminó definitivamente
+            for drive_file_id, (doc_id, data) in documents.items():
+                if drive_file_id not in seen:
+                    conflict(ConflictType.DELETED, doc_id, data, None)
+
+            for conflict_id in pending:
+                if conflict_id not in detected:
+                    writer.delete(self.db.collection(CONFLICTS_COLLECTION).document(conflict_id))
+                    stats['cleared'] += 1
+
+            writer.commit()
+            updates = {
+                'status': SyncStatus.COMPLETED.value,
+                'progress_percentage': 100.0,
+                'completed_at': datetime.now()
+            }
+        except Exception as e:
+            print(f"❌ Error detectando conflictos de {user_id}: {e}")
+            updates = {'status': SyncStatus.FAILED.value, 'error_message': str(e)}
+
+        updates.update({'stats': stats, 'updated_at': datetime.now()})
+        record_ref.update(updates)
+        data = record_ref.get().to_dict()
+        data['id'] = record.id
+        return trusted_model(BackupSyncResponse, data)
+
+    async def get_pending_conflicts(self, user_id: str, limit: int = 100) -> List[SyncConflict]:
+        """Conflictos sin resolver del usuario, del más reciente al más antiguo"""
+        try:
+            docs = (self._pending_conflicts_query(user_id)
+                    .order_by('created_at', direction='DESCENDING').limit(limit).stream())
+            conflicts = []
+            for doc in docs:
+                data = doc.to_dict()
+                data['id'] = doc.id
+                conflicts.append(trusted_model(SyncConflict, data))
+            return conflicts
+        except Exception as e:
+            print(f"Error obteniendo conflictos: {e}")
+            return []
+
+    async def resolve_conflicts(self, user_id: str, conflict_ids: List[str],
+                                resolution: ConflictResolution, drive_service) -> ConflictResolveResult:
+        """Resolver varios conflictos: keep_local impone Keepi sobre Drive y keep_remote al revés
+
+        Las escrituras de Firestore de todas las resoluciones van en un solo lote.
+        """
+        if resolution == ConflictResolution.MERGE:
+            raise ValueError("La resolución merge no está disponible para conflictos de archivos")
+
+        result = ConflictResolveResult()
+        conflict_ids = list(dict.fromkeys(conflict_ids))
+        conflicts = {}
+        for snapshot in self.db.get_all([self.db.collection(CONFLICTS_COLLECTION).document(conflict_id)
+                                         for conflict_id in conflict_ids]):
+            data = snapshot.to_dict() if snapshot.exists else None
+            if data is None or data.get('user_id') != user_id:
+                result.failed[snapshot.id] = "Conflicto no encontrado"
+            elif data.get('resolved_at') is not None:
+                result.failed[snapshot.id] = "El conflicto ya está resuelto"
+            else:
+                conflicts[snapshot.id] = data
+
+        documents = {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in self.db.get_all([self.db.collection('documents').document(data['document_id'])
+                                             for data in conflicts.values()])
+            if snapshot.exists
+        }
+
+        writer = _BatchWriter(self, user_id)
+        now = datetime.now()
+        for conflict_id, data in conflicts.items():
+            document = documents.get(data['document_id'])
+            if document is None or document.get('user_id') != user_id:
+                result.failed[conflict_id] = "El documento ya no existe en Keepi"
+                continue
+            try:
+                error = await self._apply_resolution(writer, data, document, resolution, drive_service)
+            except Exception as e:
+                error = f"Error en Google Drive: {e}"
+            if error:
+                result.failed[conflict_id] = error
+                continue
+            writer.update(self.db.collection(CONFLICTS_COLLECTION).document(conflict_id), {
+                'resolution': resolution.value,
+                'resolved_at': now
+            })
+            result.resolved.append(conflict_id)
+
+        writer.commit()
+        return result
+
+    async def _apply_resolution(self, writer: "_BatchWriter", conflict: Dict[str, Any], document: Dict[str, Any],
+                                resolution: ConflictResolution, drive_service) -> Optional[str]:
+        """Aplicar una resolución; devuelve el motivo si no se puede aplicar"""
+        document_id = conflict['document_id']
+        drive_file_id = conflict['drive_file_id']
+        local = conflict.get('local_version') or {}
+        remote = conflict.get('remote_version')
+        conflict_type = conflict['conflict_type']
+
+        if conflict_type == ConflictType.DELETED.value:
+            if resolution == ConflictResolution.KEEP_REMOTE:
+                writer.delete_document(document_id, document)
+                return None
+            if remote is None:
+                return "El archivo ya no existe en Google Drive"
+            file = await drive_service.update_file(drive_file_id, trashed=False)
+        elif conflict_type == ConflictType.RENAMED.value:
+            if resolution == ConflictResolution.KEEP_REMOTE:
+                writer.update_document(document_id, {'name': remote['name'], 'file_name': remote['name'],
+                                                     'drive_modified_time': remote['modified_time']}, touch=True)
+                return None
+            file = await drive_service.update_file(drive_file_id, name=local.get('name'))
+        else:
+            if resolution == ConflictResolution.KEEP_REMOTE:
+                writer.update_document(document_id, {
+                    'drive_md5_checksum': remote['md5_checksum'],
+                    'drive_modified_time': remote['modified_time'],
+                    'file_size': int(remote['size']) if remote.get('size') else document.get('file_size')
+                }, touch=True)
+                return None
+            if not local.get('md5_checksum'):
+                return "Keepi no tiene la suma de la versión anterior"
+            file = await drive_service.restore_revision(drive_file_id, local['md5_checksum'])
+            if file is None:
+                return "La versión de Keepi ya no está en el historial de Google Drive"
+
+        # Drive quedó como Keepi: el documento toma los nuevos valores de referencia
+        writer.update_document(document_id, {
+            'drive_md5_checksum': file['md5_checksum'],
+            'drive_modified_time': file['modified_time']
+        })
+        return None
+
+
+class _BatchWriter:
+    """Lotes de hasta 500 operaciones con el sello de documentos y los contadores de carpetas"""
+
+    # Operaciones reservadas por lote para el sello y los contadores
+    RESERVED = 2
+
+    def __init__(self, service: SyncConflictService, user_id: str):
+        self.service = service
+        self.db = service.db
+        self.user_id = user_id
+        self.batch = self.db.batch()
+        self.pending = 0
+        self.documents_written = False
+        self.folder_counts: Dict[str, int] = {}
+
+    def _added(self) -> None:
+        self.pending += 1
+        if self.pending >= FIRESTORE_BATCH_LIMIT - self.RESERVED:
+            self.commit()
+
+    def set(self, reference, data: Dict[str, Any]) -> None:
+        self.batch.set(reference, data)
+        self._added()
+
+    def update(self, reference, data: Dict[str, Any]) -> None:
+        self.batch.update(reference, data)
+        self._added()
+
+    def delete(self, reference) -> None:
+        self.batch.delete(reference)
+        self._added()
+
+    def update_document(self, document_id: str, data: Dict[str, Any], touch: bool = False) -> None:
+        """Actualizar un documento; touch marca updated_at (cambios visibles para el usuario)"""
+        if touch:
+            data['updated_at'] = datetime.now()
+        self.documents_written = True
+        self.update(self.db.collection('documents').document(document_id), data)
+
+    def delete_document(self, document_id: str, data: Dict[str, Any]) -> None:
+        folder_id = data.get('drive_folder_id')
+        if folder_id:
+            self.folder_counts[folder_id] = self.folder_counts.get(folder_id, 0) - 1
+        self.documents_written = True
+        self.delete(self.db.collection('documents').document(document_id))
+        if data.get('thumbnail_etag'):
+            self.delete(self.db.collection(THUMBNAILS_COLLECTION).document(document_id))
+
+    def commit(self) -> None:
+        if not self.pending:
+            return
+        if self.documents_written:
+            self.service.versions.bump(self.batch, self.user_id, 'documents')
+            self.service.folders.count_documents(self.batch, self.user_id, self.folder_counts)
+        self.batch.commit()
+        self.batch = self.db.batch()
+        self.pending = 0
+        self.documents_written = False
+        self.folder_counts = {}
@@ -0,0 +1,140 @@
+import hashlib
+import io
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+from starlette.concurrency import run_in_threadpool
+from app.config.database import DatabaseConfig, FIRESTORE_BATCH_LIMIT
+from app.config.settings import settings
+from app.utils.pdfium import pdfium_lock, load_pdfium
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+THUMBNAILS_COLLECTION = 'document_thumbnails'
+
+# Formato de salida → (formato de Pillow, content type)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg')
+}
+
+
+def _render_pdf_page(content: bytes, max_size: int) -> Optional["Image.Image"]:
+    """Primera página de un PDF como imagen (requiere pypdfium2; sin él no hay miniatura)"""
+    pdfium = load_pdfium()
+    if pdfium is None:
+        return None
+
+    # El mismo lock que la lectura de texto del análisis: PDFium no es seguro entre hilos
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(content)
+        try:
+            if len(pdf) == 0:
+                return None
+            page = pdf[0]
+            width, height = page.get_size()
+            # Escala para que el lado mayor mida max_size puntos de salida
+            bitmap = page.render(scale=max_size / max(width, height, 1))
+            return bitmap.to_pil()
+        finally:
+            pdf.close()
+
+
+def generate_thumbnail(content: bytes, content_type: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Miniatura de una imagen o de la primera página de un PDF (bloqueante: corre en el pool de hilos)
+
+    Devuelve {content, content_type, width, height, etag} o None si el tipo no tiene miniatura.
+    """
+    # Pillow se importa al generar la primera miniatura: no pesa en el arranque
+    from PIL import Image, ImageOps
+
+    max_size = settings.thumbnail_max_px
+    output_format, output_type = THUMBNAIL_FORMATS.get(settings.thumbnail_format, THUMBNAIL_FORMATS['webp'])
+
+    if content_type and content_type.startswith('image/'):
+        image = Image.open(io.BytesIO(content))
+        # Los JPEG se decodifican directamente a escala reducida
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+    elif content_type == 'application/pdf':
+        image = _render_pdf_page(content, max_size)
+        if image is None:
+            return None
+    else:
+        return None
+
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    if image.mode == 'RGBA' and output_format == 'JPEG':
+        image = image.convert('RGB')
+    image.thumbnail((max_size, max_size))
+
+    output = io.BytesIO()
+    image.save(output, format=output_format, quality=settings.thumbnail_quality)
+    data = output.getvalue()
+    return {
+        'content': data,
+        'content_type': output_type,
+        'width': image.width,
+        'height': image.height,
+        'etag': f'"{hashlib.sha1(data).hexdigest()[:32]}"'
+    }
+
+
+class ThumbnailService:
+    """Miniaturas de los documentos, guardadas junto al documento en document_thumbnails/{id}
+
+    La colección aparte mantiene livianas las lecturas de documentos; el documento solo
+    guarda thumbnail_etag, que permite responder 304 sin leer los bytes.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConfig.get_firestore_client()
+
+    async def generate(self, content: bytes, content_type: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Generar la miniatura en el pool de hilos; un archivo ilegible no impide la subida"""
+        if not settings.thumbnails_enabled:
+            return None
+        try:
+            return await run_in_threadpool(generate_thumbnail, content, content_type)
+        except Exception as e:
+            print(f"⚠️ No se pudo generar la miniatura: {e}")
+            return None
+
+    async def save_thumbnails(self, user_id: str, thumbnails: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Guardar las miniaturas de documentos recién creados con escrituras en lote"""
+        try:
+            batch = self.db.batch()
+            pending = 0
+
+            for document_id, thumbnail in thumbnails:
+                batch.set(self.db.collection(THUMBNAILS_COLLECTION).document(document_id), {
+                    'user_id': user_id,
+                    'content': thumbnail['content'],
+                    'content_type': thumbnail['content_type'],
+                    'width': thumbnail['width'],
+                    'height': thumbnail['height'],
+                    'etag': thumbnail['etag'],
+                    'created_at': datetime.now()
+                })
+                pending += 1
+
+                if pending == FIRESTORE_BATCH_LIMIT:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+        except Exception as e:
+            # La miniatura no debe impedir la subida del documento
+            print(f"Error guardando miniaturas: {e}")
+
+    async def get_thumbnail(self, document_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Obtener la miniatura de un documento del usuario"""
+        doc = self.db.collection(THUMBNAILS_COLLECTION).document(document_id).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        return data if data.get('user_id') == user_id else None
@@ -1,7 +1,14 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.config.database import DatabaseConfig
+from app.config.settings import settings as app_settings
 from app.models.user import UserCreate, UserUpdate, UserResponse, UserSettings
+from app.utils.ttl_cache import TTLCache
+
+# Perfiles por UID compartidos entre peticiones; las escrituras de este servicio los invalidan
+_user_cache: TTLCache[UserResponse] = TTLCache(
+    app_settings.user_cache_max_entries, app_settings.user_cache_ttl_seconds
+)
 
 class UserService:
     """Servicio para gestión de usuarios"""
@@ -11,12 +18,18 @@ class UserService:
     
     async def get_user_by_uid(self, uid: str) -> Optional[UserResponse]:
         """Obtener usuario por UID"""
+        cached = _user_cache.get(uid)
+        if cached is not None:
+            return cached
+        
         try:
             user_doc = self.db.collection('users').document(uid).get()
             if user_doc.exists:
                 user_data = user_doc.to_dict()
                 user_data['uid'] = uid
-                return UserResponse(**user_data)
+                user = UserResponse(**user_data)
+                _user_cache.set(uid, user)
+                return user
             return None
         except Exception as e:
             print(f"Error obteniendo usuario: {e}")
@@ -33,7 +46,9 @@ class UserService:
             self.db.collection('users').document(user_data.uid).set(user_dict)
             user_dict['uid'] = user_data.uid
             
-            return UserResponse(**user_dict)
+            user = UserResponse(**user_dict)
+            _user_cache.set(user_data.uid, user)
+            return user
         except Exception as e:
             print(f"Error creando usuario: {e}")
             raise
@@ -46,13 +61,16 @@ class UserService:
             
             user_ref = self.db.collection('users').document(uid)
             user_ref.update(update_data)
+            _user_cache.invalidate(uid)
             
             # Obtener usuario actualizado
             updated_doc = user_ref.get()
             if updated_doc.exists:
                 user_dict = updated_doc.to_dict()
                 user_dict['uid'] = uid
-                return UserResponse(**user_dict)
+                user = UserResponse(**user_dict)
+                _user_cache.set(uid, user)
+                return user
             return None
         except Exception as e:
             print(f"Error actualizando usuario: {e}")
@@ -76,6 +94,7 @@ class UserService:
         """Eliminar usuario"""
         try:
             self.db.collection('users').document(uid).delete()
+            _user_cache.invalidate(uid)
             return True
         except Exception as e:
             print(f"Error eliminando usuario: {e}")
@@ -89,7 +108,19 @@ class UserService:
                 'settings': settings.dict(),
                 'updated_at': datetime.now()
             })
+            _user_cache.invalidate(uid)
             return True
         except Exception as e:
             print(f"Error actualizando configuración: {e}")
             return False
+    
+    async def get_user_settings(self, uid: str) -> UserSettings:
+        """Obtener la configuración del usuario (desde la caché de perfiles)"""
+        user = await self.get_user_by_uid(uid)
+        if user and user.settings:
+            user_settings = dict(user.settings)
+            # Valores guardados antes de validar el almacenamiento (p. ej. "local") usan el de la implantación
+            if user_settings.get('storage_backend') not in (None, 'drive', 's3'):
+                user_settings['storage_backend'] = None
+            return UserSettings(**user_settings)
+        return UserSettings()
@@ -0,0 +1 @@
+# Testing Package
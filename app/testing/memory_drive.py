@@ -0,0 +1,280 @@
+"""
+Servicio de Google Drive en memoria para benchmarks y pruebas locales
+
+Expone la misma interfaz asíncrona que GoogleDriveService. Se inyecta con
+set_drive_service_factory(InMemoryDriveService).
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.metrics import record_operation
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+class InMemoryDriveStore:
+    """Almacén compartido de archivos (simula la cuenta de Drive)"""
+
+    def __init__(self):
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+        # Feed de cambios: ids de archivo en orden; el token es la posición en la lista
+        self.changes: List[str] = []
+        # Contenidos anteriores de cada archivo, del más antiguo al actual
+        self.revisions: Dict[str, List[bytes]] = {}
+
+    def modify(self, file_id: str, content: Optional[bytes] = None, **fields: Any) -> None:
+        """Simular un cambio hecho por el usuario en Drive (name, parents, trashed, content...)"""
+        with self.lock:
+            file = self.files[file_id]
+            file.update(fields)
+            if content is not None:
+                self._set_content(file, content)
+            file['modifiedTime'] = datetime.now(timezone.utc).isoformat()
+            self.changes.append(file_id)
+
+    def _set_content(self, file: Dict[str, Any], content: bytes) -> None:
+        """Reemplazar el contenido y guardarlo como revisión (con el lock tomado)"""
+        file['size'] = str(len(content))
+        file['md5Checksum'] = hashlib.md5(content).hexdigest()
+        self.contents[file['id']] = content
+        self.revisions.setdefault(file['id'], []).append(content)
+
+
+def _normalized(file: Dict[str, Any]) -> Dict[str, Any]:
+    """Archivo con la forma que devuelve GoogleDriveService"""
+    return {
+        'id': file['id'],
+        'name': file['name'],
+        'mime_type': file['mimeType'],
+        'parents': list(file['parents']),
+        'trashed': file['trashed'],
+        'size': file['size'],
+        'md5_checksum': file['md5Checksum'],
+        'created_time': file['createdTime'],
+        'modified_time': file['modifiedTime']
+    }
+
+
+class InMemoryDriveService:
+    """Sustituto en memoria de GoogleDriveService"""
+
+    # Almacén por defecto compartido entre instancias, como una cuenta real
+    default_store = InMemoryDriveStore()
+    latency_ms: float = 0.0
+
+    def __init__(self, credentials: Any = None, store: Optional[InMemoryDriveStore] = None):
+        self.credentials = credentials
+        self.store = store or self.default_store
+        self.folders_cache: Dict[str, str] = {}
+
+    def _call(self) -> None:
+        """Registrar la llamada y simular la latencia de la API"""
+        record_operation("drive_call")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _add(self, name: str, mime_type: str, parent_id: Optional[str], content: bytes = b"") -> str:
+        now = datetime.now(timezone.utc).isoformat()
+        file_id = uuid.uuid4().hex
+        with self.store.lock:
+            self.store.files[file_id] = {
+                'id': file_id,
+                'name': name,
+                'mimeType': mime_type,
+                'parents': [parent_id or 'root'],
+                'createdTime': now,
+                'modifiedTime': now,
+                'trashed': False
+            }
+            self.store._set_content(self.store.files[file_id], content)
+            self.store.changes.append(file_id)
+        return file_id
+
+    async def create_folder(self, name: str, parent_id: Optional[str] = None) -> str:
+        """Crear carpeta"""
+        self._call()
+        folder_id = self._add(name, FOLDER_MIME_TYPE, parent_id)
+        self.folders_cache[name] = folder_id
+        return folder_id
+
+    async def get_or_create_folder(self, name: str, parent_id: Optional[str] = None) -> str:
+        """Obtener carpeta existente o crear nueva"""
+        if name in self.folders_cache:
+            return self.folders_cache[name]
+
+        self._call()
+        with self.store.lock:
+            for file in self.store.files.values():
+                if (file['name'] == name and file['mimeType'] == FOLDER_MIME_TYPE
+                        and (not parent_id or parent_id in file['parents'])):
+                    self.folders_cache[name] = file['id']
+                    return file['id']
+        return await self.create_folder(name, parent_id)
+
+    async def upload_file(self, file_path: str, file_name: str, folder_id: str,
+                          mime_type: Optional[str] = None) -> str:
+        """Subir archivo desde disco"""
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        return await self.upload_content(content, file_name, folder_id, mime_type)
+
+    async def upload_content(self, content: bytes, file_name: str, folder_id: str,
+                             mime_type: Optional[str] = None) -> str:
+        """Subir contenido en memoria"""
+        self._call()
+        return self._add(file_name, mime_type or 'application/octet-stream', folder_id, content)
+
+    async def upload_stream(self, stream, file_name: str, folder_id: str,
+                            mime_type: Optional[str] = None) -> Dict[str, Any]:
+        """Subir un archivo abierto"""
+        self._call()
+        file_id = self._add(file_name, mime_type or 'application/octet-stream', folder_id, stream.read())
+        with self.store.lock:
+            return _normalized(self.store.files[file_id])
+
+    def _list(self, predicate) -> List[Dict[str, Any]]:
+        with self.store.lock:
+            files = [dict(file) for file in self.store.files.values() if not file['trashed'] and predicate(file)]
+        return sorted(files, key=lambda file: file['name'])
+
+    async def get_folder_structure(self, folder_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Obtener estructura de carpetas"""
+        self._call()
+        parent = folder_id or 'root'
+        return [
+            {
+                'id': folder['id'],
+                'name': folder['name'],
+                'created_time': folder['createdTime'],
+                'modified_time': folder['modifiedTime']
+            }
+            for folder in self._list(lambda file: file['mimeType'] == FOLDER_MIME_TYPE and parent in file['parents'])
+        ]
+
+    async def get_files_in_folder(self, folder_id: str) -> List[Dict[str, Any]]:
+        """Obtener archivos en una carpeta específica"""
+        self._call()
+        return [
+            {
+                'id': file['id'],
+                'name': file['name'],
+                'size': file['size'],
+                'mime_type': file['mimeType'],
+                'created_time': file['createdTime'],
+                'modified_time': file['modifiedTime']
+            }
+            for file in self._list(lambda file: file['mimeType'] != FOLDER_MIME_TYPE and folder_id in file['parents'])
+        ]
+
+    async def list_files(self, page_token: Optional[str] = None, page_size: int = 1000) -> Dict[str, Any]:
+        """Obtener una página de todos los archivos (no carpetas), incluidos los de la papelera"""
+        self._call()
+        start = int(page_token or 0)
+        with self.store.lock:
+            files = sorted(
+                (file for file in self.store.files.values() if file['mimeType'] != FOLDER_MIME_TYPE),
+                key=lambda file: file['id']
+            )
+            page = [_normalized(file) for file in files[start:start + page_size]]
+        more = start + page_size < len(files)
+        return {'files': page, 'next_page_token': str(start + page_size) if more else None}
+
+    async def update_file(self, file_id: str, name: Optional[str] = None,
+                          trashed: Optional[bool] = None) -> Dict[str, Any]:
+        """Renombrar un archivo o sacarlo/enviarlo a la papelera"""
+        self._call()
+        fields = {key: value for key, value in (('name', name), ('trashed', trashed)) if value is not None}
+        self.store.modify(file_id, **fields)
+        with self.store.lock:
+            return _normalized(self.store.files[file_id])
+
+    async def restore_revision(self, file_id: str, md5_checksum: str) -> Optional[Dict[str, Any]]:
+        """Volver a subir como versión actual la revisión con ese md5"""
+        self._call()
+        with self.store.lock:
+            revision = next((content for content in self.store.revisions.get(file_id, [])
+                             if hashlib.md5(content).hexdigest() == md5_checksum), None)
+        if revision is None:
+            return None
+        self.store.modify(file_id, content=revision)
+        with self.store.lock:
+            return _normalized(self.store.files[file_id])
+
+    def stream_file(self, file_id: str, chunk_size: int = 1024 * 1024) -> Tuple[int, Iterator[bytes]]:
+        """Descargar un archivo por fragmentos"""
+        self._call()
+        with self.store.lock:
+            if file_id not in self.store.contents:
+                raise FileNotFoundError(file_id)
+            content = self.store.contents[file_id]
+
+        def chunks() -> Iterator[bytes]:
+            for offset in range(0, len(content), chunk_size):
+                yield content[offset:offset + chunk_size]
+
+        return len(content), chunks()
+
+    def stream_head_revision(self, file_id: str, chunk_size: int = 1024 * 1024) -> Tuple[int, Optional[str], Iterator[bytes]]:
+        """Descargar la revisión actual junto con su md5"""
+        self._call()
+        with self.store.lock:
+            if file_id not in self.store.contents:
+                raise FileNotFoundError(file_id)
+            content = self.store.contents[file_id]
+            md5_checksum = self.store.files[file_id]['md5Checksum']
+
+        def chunks() -> Iterator[bytes]:
+            for offset in range(0, len(content), chunk_size):
+                yield content[offset:offset + chunk_size]
+
+        return len(content), md5_checksum, chunks()
+
+    async def delete_file(self, file_id: str) -> bool:
+        """Eliminar archivo"""
+        self._call()
+        with self.store.lock:
+            self.store.contents.pop(file_id, None)
+            removed = self.store.files.pop(file_id, None) is not None
+            if removed:
+                self.store.changes.append(file_id)
+            return removed
+
+    async def get_file_download_url(self, file_id: str) -> str:
+        """Obtener URL de descarga del archivo"""
+        self._call()
+        return f"memory://drive/{file_id}" if file_id in self.store.files else ''
+
+    async def get_start_page_token(self) -> str:
+        """Obtener el token a partir del cual el feed de cambios reporta modificaciones"""
+        self._call()
+        with self.store.lock:
+            return str(len(self.store.changes))
+
+    async def list_changes(self, page_token: str, page_size: int = 1000) -> Dict[str, Any]:
+        """Obtener una página del feed de cambios (el estado actual de cada archivo cambiado)"""
+        self._call()
+        start = int(page_token)
+        with self.store.lock:
+            end = min(start + page_size, len(self.store.changes))
+            changes = []
+            for file_id in self.store.changes[start:end]:
+                file = self.store.files.get(file_id)
+                changes.append({
+                    'file_id': file_id,
+                    'removed': file is None,
+                    'time': datetime.now(timezone.utc).isoformat(),
+                    'file': _normalized(file) if file is not None else None
+                })
+            more = end < len(self.store.changes)
+        return {
+            'changes': changes,
+            'next_page_token': str(end) if more else None,
+            'new_start_page_token': None if more else str(end)
+        }
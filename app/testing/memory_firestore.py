@@ -0,0 +1,528 @@
+"""
+Cliente de Firestore en memoria para benchmarks y pruebas locales
+
+Implementa el subconjunto de la API de google-cloud-firestore que usa la aplicación:
+colecciones, documentos, where/order_by/limit/offset/select/cursores, stream/get,
+lotes de escritura y transacciones. Se inyecta con DatabaseConfig.set_firestore_client().
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.api_core.exceptions import Aborted, AlreadyExists, NotFound
+from google.cloud.firestore_v1 import DELETE_FIELD, SERVER_TIMESTAMP, Increment
+
+_MISSING = object()
+
+
+def _copy(value: Any) -> Any:
+    """Copiar diccionarios y listas para no compartir estado con el llamador"""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _get_field(data: Dict[str, Any], field_path: str) -> Any:
+    """Leer un campo, admitiendo rutas con puntos ("settings.language")"""
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _order_value(document_id: str, data: Dict[str, Any], field_path: str) -> Any:
+    """Valor de ordenación de un campo; __name__ es el id del documento"""
+    if field_path == "__name__":
+        return document_id
+    return _get_field(data, field_path)
+
+
+def _document_id(value: Any) -> str:
+    """Id a partir de una referencia, una ruta o un id"""
+    return value.id if hasattr(value, "id") else str(value).rsplit("/", 1)[-1]
+
+
+def _set_field(data: Dict[str, Any], field_path: str, value: Any) -> None:
+    """Escribir un campo aplicando las transformaciones de Firestore"""
+    parts = field_path.split(".")
+    target = data
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    last = parts[-1]
+    if value is DELETE_FIELD:
+        target.pop(last, None)
+    elif value is SERVER_TIMESTAMP:
+        target[last] = datetime.now(timezone.utc)
+    elif isinstance(value, Increment):
+        current = target.get(last, 0)
+        target[last] = (current if isinstance(current, (int, float)) else 0) + value.value
+    else:
+        target[last] = _copy(value)
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Combinar datos de forma recursiva (set con merge=True)"""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            # Los mapas anidados se combinan para aplicar transformaciones a cualquier profundidad
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            _set_field(target, key, value)
+
+
+def _compare(left: Any, op: str, right: Any) -> bool:
+    """Evaluar un operador de filtro de Firestore"""
+    try:
+        if op == "==":
+            return left == right
+        if op == "!=":
+            # Firestore excluye los documentos sin el campo o con valor nulo
+            return left is not _MISSING and left is not None and left != right
+        if left is _MISSING:
+            return False
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+        if op == "in":
+            return left in right
+        if op == "not-in":
+            return left is not None and left not in right
+        if op == "array-contains":
+            return isinstance(left, list) and right in left
+        if op == "array-contains-any":
+            return isinstance(left, list) and any(item in left for item in right)
+    except TypeError:
+        # Firestore solo compara valores del mismo tipo
+        return False
+    raise ValueError(f"Operador no soportado: {op}")
+
+
+class MemoryDocumentSnapshot:
+    """Instantánea de un documento"""
+
+    def __init__(self, reference: "MemoryDocumentReference", data: Optional[Dict[str, Any]],
+                 update_time: Optional[datetime] = None, field_paths: Optional[Iterable[str]] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self.create_time = update_time
+        self._data = data
+        self._field_paths = list(field_paths) if field_paths else None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        if self._data is None:
+            return None
+        if self._field_paths is None:
+            return _copy(self._data)
+        projected: Dict[str, Any] = {}
+        for field_path in self._field_paths:
+            value = _get_field(self._data, field_path)
+            if value is not _MISSING:
+                _set_field(projected, field_path, value)
+        return projected
+
+    def get(self, field_path: str) -> Any:
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _copy(value)
+
+
+class MemoryDocumentReference:
+    """Referencia a un documento"""
+
+    def __init__(self, client: "InMemoryFirestore", collection_path: str, document_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = document_id
+        self.path = f"{collection_path}/{document_id}"
+
+    @property
+    def parent(self) -> "MemoryCollectionReference":
+        return MemoryCollectionReference(self._client, self._collection_path)
+
+    def collection(self, name: str) -> "MemoryCollectionReference":
+        return MemoryCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[Iterable[str]] = None, transaction=None) -> MemoryDocumentSnapshot:
+        if transaction is not None:
+            return next(transaction.get(self))
+        self._client._rpc()
+        data, update_time = self._client._read(self._collection_path, self.id)
+        return MemoryDocumentSnapshot(self, data, update_time, field_paths)
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        self._client._rpc()
+        return self._client._apply([("set", self, document_data, merge)])[0]
+
+    def create(self, document_data: Dict[str, Any]):
+        self._client._rpc()
+        return self._client._apply([("create", self, document_data, False)])[0]
+
+    def update(self, field_updates: Dict[str, Any], option=None):
+        self._client._rpc()
+        return self._client._apply([("update", self, field_updates, False)])[0]
+
+    def delete(self, option=None):
+        self._client._rpc()
+        return self._client._apply([("delete", self, None, False)])[0]
+
+
+class MemoryQuery:
+    """Consulta inmutable sobre una colección"""
+
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client: "InMemoryFirestore", collection_path: str,
+                 filters: Tuple = (), orders: Tuple = (), limit: Optional[int] = None,
+                 limit_to_last: bool = False, offset: int = 0, start: Optional[Tuple] = None,
+                 end: Optional[Tuple] = None, projection: Optional[Tuple[str, ...]] = None):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._limit_to_last = limit_to_last
+        self._offset = offset
+        self._start = start
+        self._end = end
+        self._projection = projection
+
+    def _copy_with(self, **changes) -> "MemoryQuery":
+        values = {
+            "filters": self._filters, "orders": self._orders, "limit": self._limit,
+            "limit_to_last": self._limit_to_last, "offset": self._offset,
+            "start": self._start, "end": self._end, "projection": self._projection
+        }
+        values.update(changes)
+        return MemoryQuery(self._client, self._collection_path, **values)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None,
+              value: Any = None, *, filter=None) -> "MemoryQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy_with(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "MemoryQuery":
+        # Igual que el cliente real: solo se aceptan ASCENDING o DESCENDING
+        if direction not in (self.ASCENDING, self.DESCENDING):
+            raise ValueError(f"Dirección inválida: {direction!r}")
+        descending = direction == self.DESCENDING
+        return self._copy_with(orders=self._orders + ((field_path, descending),))
+
+    def limit(self, count: int) -> "MemoryQuery":
+        return self._copy_with(limit=count, limit_to_last=False)
+
+    def limit_to_last(self, count: int) -> "MemoryQuery":
+        return self._copy_with(limit=count, limit_to_last=True)
+
+    def offset(self, num_to_skip: int) -> "MemoryQuery":
+        return self._copy_with(offset=num_to_skip)
+
+    def select(self, field_paths: Iterable[str]) -> "MemoryQuery":
+        return self._copy_with(projection=tuple(field_paths))
+
+    def start_at(self, document_fields_or_snapshot) -> "MemoryQuery":
+        return self._copy_with(start=(document_fields_or_snapshot, True))
+
+    def start_after(self, document_fields_or_snapshot) -> "MemoryQuery":
+        return self._copy_with(start=(document_fields_or_snapshot, False))
+
+    def end_at(self, document_fields_or_snapshot) -> "MemoryQuery":
+        return self._copy_with(end=(document_fields_or_snapshot, True))
+
+    def end_before(self, document_fields_or_snapshot) -> "MemoryQuery":
+        return self._copy_with(end=(document_fields_or_snapshot, False))
+
+    def _cursor_key(self, cursor: Any) -> Tuple:
+        """Convertir un cursor (snapshot, dict o valores) en la clave de ordenación"""
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            data = cursor._data or {}
+            return tuple(_order_value(cursor.id, data, field) for field, _ in self._orders) + (cursor.id,)
+        if isinstance(cursor, dict):
+            return tuple(
+                _document_id(cursor[field]) if field == "__name__" and field in cursor else cursor.get(field, _MISSING)
+                for field, _ in self._orders
+            )
+        return tuple(cursor)
+
+    def _sort_key(self, document_id: str, data: Dict[str, Any]) -> Tuple:
+        return tuple(_order_value(document_id, data, field) for field, _ in self._orders) + (document_id,)
+
+    def _implicit_descending(self) -> bool:
+        """Firestore desempata por __name__ en la dirección del último orden"""
+        return self._orders[-1][1] if self._orders else False
+
+    def _compare_keys(self, left: Tuple, right: Tuple) -> int:
+        """Comparar claves respetando la dirección de cada campo"""
+        directions = [descending for _, descending in self._orders] + [self._implicit_descending()]
+        for left_value, right_value, descending in zip(left, right, directions):
+            if left_value == right_value:
+                continue
+            result = -1 if left_value < right_value else 1
+            return -result if descending else result
+        return 0
+
+    def _matches(self) -> List[Tuple[str, Dict[str, Any], datetime]]:
+        documents = self._client._snapshot(self._collection_path)
+        results = []
+        for document_id, (data, update_time) in documents.items():
+            if all(_compare(_get_field(data, field), op, value) for field, op, value in self._filters):
+                # Firestore excluye los documentos sin el campo de ordenación
+                if all(_order_value(document_id, data, field) is not _MISSING for field, _ in self._orders):
+                    results.append((document_id, data, update_time))
+
+        # Orden estable: primero por __name__, luego por cada campo de menor a mayor prioridad
+        results.sort(key=lambda item: item[0], reverse=self._implicit_descending())
+        for field, descending in reversed(self._orders):
+            results.sort(key=lambda item: _order_value(item[0], item[1], field), reverse=descending)
+
+        if self._start is not None:
+            cursor, inclusive = self._start
+            key = self._cursor_key(cursor)
+            results = [item for item in results
+                       if (self._compare_keys(self._sort_key(item[0], item[1])[:len(key)], key) >= 0
+                           if inclusive else
+                           self._compare_keys(self._sort_key(item[0], item[1])[:len(key)], key) > 0)]
+        if self._end is not None:
+            cursor, inclusive = self._end
+            key = self._cursor_key(cursor)
+            results = [item for item in results
+                       if (self._compare_keys(self._sort_key(item[0], item[1])[:len(key)], key) <= 0
+                           if inclusive else
+                           self._compare_keys(self._sort_key(item[0], item[1])[:len(key)], key) < 0)]
+
+        results = results[self._offset:]
+        if self._limit is not None:
+            results = results[-self._limit:] if self._limit_to_last else results[:self._limit]
+        return results
+
+    def stream(self, transaction=None) -> Iterator[MemoryDocumentSnapshot]:
+        self._client._rpc()
+        for document_id, data, update_time in self._matches():
+            reference = MemoryDocumentReference(self._client, self._collection_path, document_id)
+            yield MemoryDocumentSnapshot(reference, data, update_time, self._projection)
+
+    def get(self, transaction=None) -> List[MemoryDocumentSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """Referencia a una colección"""
+
+    def __init__(self, client: "InMemoryFirestore", path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+        self.path = path
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._client, self._collection_path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        write_time = reference.create(document_data)
+        return write_time, reference
+
+    def list_documents(self) -> List[MemoryDocumentReference]:
+        return [self.document(document_id) for document_id in self._client._snapshot(self._collection_path)]
+
+
+class MemoryWriteBatch:
+    """Lote de escrituras que se aplica de forma atómica en commit()"""
+
+    def __init__(self, client: "InMemoryFirestore"):
+        self._client = client
+        self._writes: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference: MemoryDocumentReference, document_data: Dict[str, Any], merge: bool = False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def create(self, reference: MemoryDocumentReference, document_data: Dict[str, Any]):
+        self._writes.append(("create", reference, document_data, False))
+
+    def update(self, reference: MemoryDocumentReference, field_updates: Dict[str, Any], option=None):
+        self._writes.append(("update", reference, field_updates, False))
+
+    def delete(self, reference: MemoryDocumentReference, option=None):
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self):
+        self._client._rpc()
+        writes, self._writes = self._writes, []
+        return self._client._apply(writes)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """Transacción: lecturas directas y escrituras aplicadas atómicamente en commit()
+
+    Las lecturas se sirven del estado actual; al confirmar se verifica que ningún
+    documento leído haya cambiado entre tanto (concurrencia optimista) y, si cambió,
+    se lanza Aborted como Firestore, de modo que firestore.transactional reintenta.
+    """
+
+    def __init__(self, client: "InMemoryFirestore", max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._read_versions: Dict[str, Optional[datetime]] = {}
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id: Optional[bytes] = None
+
+    def get(self, reference_or_query):
+        if isinstance(reference_or_query, MemoryDocumentReference):
+            snapshot = reference_or_query.get()
+            self._read_versions[reference_or_query.path] = snapshot.update_time
+            return iter([snapshot])
+        snapshots = reference_or_query.get()
+        for snapshot in snapshots:
+            self._read_versions[snapshot.reference.path] = snapshot.update_time
+        return iter(snapshots)
+
+    def get_all(self, references: Iterable[MemoryDocumentReference]):
+        return iter([next(self.get(reference)) for reference in references])
+
+    def commit(self):
+        self._client._rpc()
+        writes, self._writes = self._writes, []
+        return self._client._apply(writes, self._read_versions)
+
+    def rollback(self):
+        self._writes = []
+        self._read_versions = {}
+
+    # Protocolo que usa el decorador firestore.transactional
+    def _clean_up(self):
+        self.rollback()
+        self._id = None
+
+    def _begin(self, retry_id: Optional[bytes] = None):
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            return self.commit()
+        finally:
+            self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class InMemoryFirestore:
+    """Cliente de Firestore en memoria con latencia simulada opcional"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self._collections: Dict[str, Dict[str, Tuple[Dict[str, Any], datetime]]] = {}
+        self._lock = threading.RLock()
+
+    def _rpc(self) -> None:
+        """Simular la latencia de una llamada remota (bloqueante, como el cliente real)"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _read(self, collection_path: str, document_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+        with self._lock:
+            entry = self._collections.get(collection_path, {}).get(document_id)
+        return entry if entry is not None else (None, None)
+
+    def _snapshot(self, collection_path: str) -> Dict[str, Tuple[Dict[str, Any], datetime]]:
+        with self._lock:
+            return dict(self._collections.get(collection_path, {}))
+
+    def _apply(self, writes: List[Tuple], read_versions: Optional[Dict[str, Optional[datetime]]] = None) -> List[datetime]:
+        """Aplicar escrituras de forma atómica"""
+        with self._lock:
+            if read_versions:
+                for path, version in read_versions.items():
+                    collection_path, document_id = path.rsplit("/", 1)
+                    _, current = self._read(collection_path, document_id)
+                    if current != version:
+                        raise Aborted(f"Documento modificado durante la transacción: {path}")
+
+            # Validar antes de escribir para que el lote sea todo o nada
+            staged: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+            for operation, reference, data, merge in writes:
+                key = (reference._collection_path, reference.id)
+                current = staged[key] if key in staged else self._read(*key)[0]
+                if operation == "create":
+                    if current is not None:
+                        raise AlreadyExists(f"El documento ya existe: {reference.path}")
+                    new_data: Dict[str, Any] = {}
+                    _merge(new_data, data)
+                elif operation == "set":
+                    new_data = _copy(current) if merge and current is not None else {}
+                    _merge(new_data, data)
+                elif operation == "update":
+                    if current is None:
+                        raise NotFound(f"No existe el documento: {reference.path}")
+                    new_data = _copy(current)
+                    for field_path, value in data.items():
+                        _set_field(new_data, field_path, value)
+                else:
+                    new_data = None
+                staged[key] = new_data
+
+            write_time = datetime.now(timezone.utc)
+            for (collection_path, document_id), data in staged.items():
+                collection = self._collections.setdefault(collection_path, {})
+                if data is None:
+                    collection.pop(document_id, None)
+                else:
+                    collection[document_id] = (data, write_time)
+            return [write_time for _ in writes]
+
+    def collection(self, collection_path: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, collection_path)
+
+    def collection_group(self, collection_id: str) -> MemoryQuery:
+        raise NotImplementedError("collection_group no está soportado en el cliente en memoria")
+
+    def document(self, document_path: str) -> MemoryDocumentReference:
+        collection_path, document_id = document_path.rsplit("/", 1)
+        return MemoryDocumentReference(self, collection_path, document_id)
+
+    def get_all(self, references: Iterable[MemoryDocumentReference], field_paths=None,
+                transaction=None) -> Iterator[MemoryDocumentSnapshot]:
+        """Leer varios documentos en una sola llamada"""
+        self._rpc()
+        for reference in references:
+            data, update_time = self._read(reference._collection_path, reference.id)
+            yield MemoryDocumentSnapshot(reference, data, update_time, field_paths)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> MemoryTransaction:
+        return MemoryTransaction(self, max_attempts, read_only)
+
+    def load(self, collection_path: str, documents: Dict[str, Dict[str, Any]]) -> None:
+        """Cargar documentos directamente, sin latencia (para preparar datos)"""
+        write_time = datetime.now(timezone.utc)
+        with self._lock:
+            collection = self._collections.setdefault(collection_path, {})
+            for document_id, data in documents.items():
+                collection[document_id] = (_copy(data), write_time)
+
+    def count(self, collection_path: str) -> int:
+        """Cantidad de documentos de una colección"""
+        with self._lock:
+            return len(self._collections.get(collection_path, {}))
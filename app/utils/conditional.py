@@ -0,0 +1,80 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import Request, Response
+from app.utils.responses import TrustedJSONResponse
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag fuerte a partir de los valores que identifican la representación"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def to_utc(value: datetime) -> datetime:
+    """Las fechas sin zona horaria se escribieron con datetime.now() (hora local)"""
+    return value.astimezone(timezone.utc)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    """Cabeceras para que el cliente revalide en cada uso"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(to_utc(last_modified), usegmt=True)
+    return headers
+
+
+def cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    """Cabeceras para contenido que el cliente puede reutilizar sin revalidar durante max_age segundos"""
+    return {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluar If-None-Match (prioritario) o If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparación débil, como exige If-None-Match
+        return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # Las fechas HTTP tienen resolución de segundos
+        return to_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    """Respuesta 304 sin cuerpo"""
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+async def conditional_json(request: Request, load: Callable[[], Awaitable[Any]],
+                           etag: Optional[str] = None,
+                           last_modified: Optional[datetime] = None) -> Response:
+    """Responder un listado con ETag, o 304 si el cliente ya tiene esa versión
+
+    Con un ETag conocido de antemano (sello de versión) el 304 se decide sin cargar los datos;
+    sin él, el ETag es el hash del cuerpo y solo se ahorra la transferencia.
+    load no debe capturar sus errores devolviendo un valor por defecto: esa respuesta
+    recibiría el ETag de la versión y el cliente la conservaría con cada 304.
+    """
+    if etag is not None and is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    response = TrustedJSONResponse(await load())
+    if etag is None:
+        etag = f'"{hashlib.sha1(response.body).hexdigest()[:32]}"'
+        if is_not_modified(request, etag, None):
+            return not_modified(etag, None)
+
+    response.headers.update(validator_headers(etag, last_modified))
+    return response
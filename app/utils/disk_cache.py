@@ -0,0 +1,153 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, BinaryIO
+
+
+class DiskCacheWriter:
+    """Entrada en escritura: se publica con commit() o se descarta con abort()"""
+
+    def __init__(self, cache: "DiskLRUCache", key: str):
+        self.cache = cache
+        self.key = key
+        descriptor, self.partial_path = tempfile.mkstemp(dir=cache.directory, suffix='.part')
+        self.file = os.fdopen(descriptor, 'wb')
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> None:
+        self.file.close()
+        if self.size > self.cache.max_bytes:
+            os.remove(self.partial_path)
+            return
+        self.cache._publish(self.key, self.partial_path, self.size)
+
+    def abort(self) -> None:
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class DiskLRUCache:
+    """Caché de archivos en disco acotada en bytes con desalojo LRU
+
+    Cada entrada es un archivo con el hash de la clave como nombre. El índice vive en memoria
+    y se reconstruye al arrancar a partir de las fechas de modificación, que se actualizan en
+    cada acierto. Las entradas se escriben como .part y se publican con un rename atómico.
+
+    Varios procesos (workers) pueden compartir el directorio, pero cada uno lleva su propio
+    índice y su propio total: max_bytes es un límite por proceso, y con N workers el
+    directorio puede llegar a N × max_bytes. Un .part solo se considera abandonado cuando
+    lleva stale_part_seconds sin modificarse; antes puede ser la escritura de otro worker.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, stale_part_seconds: float = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stale_part_seconds = stale_part_seconds
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _load(self) -> None:
+        """Cargar el índice desde el directorio (con el lock tomado)"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        stale_before = time.time() - self.stale_part_seconds
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # Publicada o borrada por otro proceso mientras se recorría el directorio
+                continue
+            if entry.name.endswith('.part'):
+                # Escritura interrumpida de una ejecución anterior; las recientes pueden ser de otro worker
+                if stat.st_mtime < stale_before:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                continue
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+        self._loaded = True
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def open(self, key: str) -> Optional[Tuple[BinaryIO, int]]:
+        """Abrir una entrada para leerla y devolver el archivo y su tamaño, o None si no está
+
+        El archivo se abre con el lock tomado: un desalojo posterior lo borra del directorio,
+        pero quien ya lo abrió lo sigue leyendo completo.
+        """
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            size = self._entries.get(name)
+            source = None
+            if size is not None:
+                try:
+                    source = open(path, 'rb')
+                except OSError:
+                    # Desalojada por otro proceso que comparte el directorio
+                    del self._entries[name]
+                    self._total -= size
+            if source is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return source, size
+
+    def writer(self, key: str) -> DiskCacheWriter:
+        """Abrir una entrada para escribirla en streaming"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        return DiskCacheWriter(self, key)
+
+    def _publish(self, key: str, partial_path: str, size: int) -> None:
+        name = self._name(key)
+        with self._lock:
+            try:
+                os.replace(partial_path, os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Otro proceso lo dio por abandonado: la entrada simplemente no se guarda
+                return
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+
+    def stats(self) -> dict:
+        """Aciertos, fallos, entradas y bytes ocupados"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._total}
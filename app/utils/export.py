@@ -0,0 +1,49 @@
+import csv
+import io
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List
+from app.utils.responses import dumps_json
+
+# Tamaño aproximado de cada fragmento enviado al cliente
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def ndjson_chunks(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """Una línea JSON por documento, agrupadas en fragmentos de ~64 KB"""
+    buffer = bytearray()
+    for row in rows:
+        buffer += dumps_json({column: row.get(column) for column in columns})
+        buffer += b"\n"
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _csv_value(value: Any) -> Any:
+    """Aplanar valores anidados para una celda CSV"""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set)):
+        return ";".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return dumps_json(value).decode("utf-8")
+    return value
+
+
+def csv_chunks(rows: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """Cabecera y una fila por documento, agrupadas en fragmentos de ~64 KB"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(column)) for column in columns])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,198 @@
+from typing import Any, Iterator
+from app.config.settings import settings
+from app.utils.metrics import record_operation, current_operations
+
+# Métodos de Query/CollectionReference que devuelven una nueva consulta
+_QUERY_METHODS = frozenset({
+    "where", "order_by", "limit", "limit_to_last", "offset", "select",
+    "start_at", "start_after", "end_at", "end_before"
+})
+
+# Métodos de DocumentReference/WriteBatch que escriben un documento
+_WRITE_METHODS = frozenset({"set", "update", "delete", "create"})
+
+
+class FirestoreReadBudgetExceeded(Exception):
+    """Una petición leyó más documentos de Firestore que el presupuesto configurado"""
+    pass
+
+
+def _format_call(name: str, args: tuple, kwargs: dict) -> str:
+    """Representar una llamada de consulta de forma legible para los logs"""
+    parts = [repr(arg) for arg in args]
+    parts.extend(f"{key}={value!r}" for key, value in kwargs.items())
+    call = f"{name}({', '.join(parts)})"
+    return call if len(call) <= 200 else call[:197] + "..."
+
+
+def _record_reads(description: str, count: int = 1) -> None:
+    """Contar lecturas y avisar cuando la petición supera el presupuesto"""
+    record_operation("firestore_read", count)
+    operations = current_operations()
+    if operations is None:
+        return
+    reads = operations.get("firestore_read", 0)
+    budget = settings.firestore_read_budget
+    # Avisar una sola vez por petición, en la lectura que cruza el límite
+    if reads > budget >= reads - count:
+        print(f"⚠️ Presupuesto de lecturas de Firestore superado ({budget}) por la consulta: {description}")
+
+
+def _unwrap(value: Any) -> Any:
+    """Obtener el objeto original de Firestore detrás de un proxy"""
+    return value._target if isinstance(value, _TrackedProxy) else value
+
+
+class _TrackedProxy:
+    """Proxy base que delega todo en el objeto original"""
+
+    __slots__ = ("_target",)
+
+    def __init__(self, target: Any):
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target, name)
+
+
+class TrackedQuery(_TrackedProxy):
+    """Consulta o colección que cuenta los documentos leídos"""
+
+    __slots__ = ("_description",)
+
+    def __init__(self, target: Any, description: str):
+        super().__init__(target)
+        self._description = description
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name in _QUERY_METHODS:
+            def query_method(*args, **kwargs):
+                description = f"{self._description}.{_format_call(name, args, kwargs)}"
+                return TrackedQuery(attr(*args, **kwargs), description)
+            return query_method
+        return attr
+
+    def stream(self, *args, **kwargs) -> Iterator[Any]:
+        """Contar cada documento a medida que se recibe"""
+        for snapshot in self._target.stream(*args, **kwargs):
+            _record_reads(self._description)
+            yield snapshot
+
+    def get(self, *args, **kwargs):
+        snapshots = self._target.get(*args, **kwargs)
+        _record_reads(self._description, max(len(snapshots), 1))
+        return snapshots
+
+    def document(self, *args, **kwargs) -> "TrackedDocument":
+        return TrackedDocument(self._target.document(*args, **kwargs))
+
+    def add(self, document_data, *args, **kwargs):
+        record_operation("firestore_write")
+        return self._target.add(document_data, *args, **kwargs)
+
+
+class TrackedDocument(_TrackedProxy):
+    """Referencia de documento que cuenta lecturas y escrituras"""
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name in _WRITE_METHODS:
+            def write_method(*args, **kwargs):
+                record_operation("firestore_write")
+                return attr(*args, **kwargs)
+            return write_method
+        return attr
+
+    def get(self, *args, **kwargs):
+        _record_reads(f"{getattr(self._target, 'path', '?')}.get()")
+        return self._target.get(*args, **kwargs)
+
+    def collection(self, name: str, *args, **kwargs) -> TrackedQuery:
+        description = f"{getattr(self._target, 'path', '?')}/{name}"
+        return TrackedQuery(self._target.collection(name, *args, **kwargs), description)
+
+
+class TrackedBatch(_TrackedProxy):
+    """Lote de escritura que cuenta las operaciones al confirmar"""
+
+    __slots__ = ("_pending",)
+
+    def __init__(self, target: Any):
+        super().__init__(target)
+        self._pending = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name in _WRITE_METHODS:
+            def write_method(reference, *args, **kwargs):
+                self._pending += 1
+                return attr(_unwrap(reference), *args, **kwargs)
+            return write_method
+        return attr
+
+    def commit(self, *args, **kwargs):
+        result = self._target.commit(*args, **kwargs)
+        record_operation("firestore_write", self._pending)
+        self._pending = 0
+        return result
+
+
+class TrackedFirestoreClient(_TrackedProxy):
+    """Cliente de Firestore instrumentado para contar lecturas y escrituras"""
+
+    __slots__ = ()
+
+    def collection(self, name: str, *args, **kwargs) -> TrackedQuery:
+        return TrackedQuery(self._target.collection(name, *args, **kwargs), name)
+
+    def collection_group(self, name: str, *args, **kwargs) -> TrackedQuery:
+        return TrackedQuery(self._target.collection_group(name, *args, **kwargs), f"collection_group({name!r})")
+
+    def document(self, *args, **kwargs) -> TrackedDocument:
+        return TrackedDocument(self._target.document(*args, **kwargs))
+
+    def batch(self, *args, **kwargs) -> TrackedBatch:
+        return TrackedBatch(self._target.batch(*args, **kwargs))
+
+    def get_all(self, references, *args, **kwargs) -> Iterator[Any]:
+        """Contar cada documento leído en la lectura múltiple"""
+        for snapshot in self._target.get_all([_unwrap(reference) for reference in references], *args, **kwargs):
+            _record_reads("get_all()")
+            yield snapshot
+
+
+class FirestoreBudgetMiddleware:
+    """Middleware ASGI que expone las lecturas/escrituras por petición y aplica el presupuesto
+    
+    Se monta dentro de MetricsMiddleware, que es quien inicia los contadores de la petición.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.debug:
+                operations = current_operations() or {}
+                headers = list(message.get("headers", []))
+                headers.append((b"x-firestore-reads", str(operations.get("firestore_read", 0)).encode()))
+                headers.append((b"x-firestore-writes", str(operations.get("firestore_write", 0)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        if settings.firestore_read_budget_strict:
+            reads = (current_operations() or {}).get("firestore_read", 0)
+            if reads > settings.firestore_read_budget:
+                raise FirestoreReadBudgetExceeded(
+                    f"{scope['method']} {scope['path']} leyó {reads} documentos de Firestore "
+                    f"(presupuesto: {settings.firestore_read_budget})"
+                )
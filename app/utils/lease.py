@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from firebase_admin import firestore
+
+
+def lease_active(state: Dict[str, Any], now: datetime) -> bool:
+    """Indicar si la reserva guardada en el estado sigue vigente (en hora local, como datetime.now())"""
+    lease_until = state.get('lease_until')
+    if lease_until is None:
+        return False
+    if lease_until.tzinfo is not None:
+        lease_until = lease_until.astimezone().replace(tzinfo=None)
+    return lease_until > now
+
+
+def acquire_lease(db, state_ref, now: datetime, lease_seconds: int,
+                  start: Callable[[Any, Dict[str, Any]], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Tomar la reserva del documento de estado dentro de una transacción
+
+    start(transaction, state) agrega a la transacción las escrituras que acompañan a la
+    reserva (el registro de la ejecución) y devuelve los campos extra del estado. Si dos
+    ejecuciones compiten, Firestore aborta la que confirma después y la transacción se
+    reintenta: en el reintento ve la reserva de la otra. Devuelve el estado anterior, o
+    None si la reserva está tomada.
+    """
+    @firestore.transactional
+    def take(transaction) -> Optional[Dict[str, Any]]:
+        snapshot = state_ref.get(transaction=transaction)
+        state = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        if lease_active(state, now):
+            return None
+        fields = start(transaction, state)
+        transaction.set(state_ref, {'lease_until': now + timedelta(seconds=lease_seconds), **fields}, merge=True)
+        return state
+
+    return take(db.transaction())
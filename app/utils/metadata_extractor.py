@@ -0,0 +1,103 @@
+import re
+from typing import Dict, Any, List, Optional
+
+# Versión de la lógica de extracción: subirla al cambiar patrones o normalizaciones
+EXTRACTOR_VERSION = "1.0.0"
+
+# Máximo de caracteres analizados por documento
+MAX_SCAN_CHARS = 200_000
+
+# Máximo de valores únicos guardados por campo de metadatos
+MAX_RESULTS_PER_FIELD = 20
+
+_DATE = r"\d{1,2}[/-]\d{1,2}[/-]\d{4}"
+_CODE = r"[A-Z]{1,3}-?\d{4,20}"
+
+# Etiquetas (sin distinguir mayúsculas) de cada campo
+_EXPIRY_LABELS = ("venc[ei]miento", "expir[ae]", "validez", "vigencia")
+_NUMBER_LABELS = ("número", "código", "referencia", "id")
+_ORGANIZATION_LABELS = ("empresa", "compañía", "institución", "organización")
+
+# Iniciales en minúscula de las etiquetas: las mayúsculas ya entran en el filtro por A-Z
+_LABEL_INITIALS = "".join(sorted({
+    label[0] for label in _EXPIRY_LABELS + _NUMBER_LABELS + _ORGANIZATION_LABELS
+}))
+
+# Todos los patrones en una sola expresión. En una misma posición gana la primera
+# alternativa, por eso las etiquetas van antes que los valores sueltos.
+_FUSED_PATTERN = re.compile(
+    # Filtro previo: solo se prueban las alternativas en inicios de palabra que
+    # pueden abrir un patrón (dígito, mayúscula, inicial de etiqueta) o en "$"
+    rf"(?:\b(?=[\dA-Z{_LABEL_INITIALS}])|(?=\$))(?:"
+    # Fecha de vencimiento con etiqueta
+    rf"(?i:\b(?:{'|'.join(_EXPIRY_LABELS)}))[:\s]*(?P<expiry>{_DATE})"
+    # Número de documento con etiqueta
+    rf"|(?i:\b(?:{'|'.join(_NUMBER_LABELS)})[:\s]*(?P<labeled_number>{_CODE}))"
+    # Organización con etiqueta (limitada a una línea)
+    rf"|(?i:\b(?:{'|'.join(_ORGANIZATION_LABELS)})[:\s]*(?P<organization>[a-z][a-z \t]{{0,79}}))"
+    # Fechas: DD/MM/YYYY, DD-MM-YYYY, YYYY-MM-DD
+    r"|\b(?P<date>\d{1,2}/\d{1,2}/\d{4}|\d{1,2}-\d{1,2}-\d{4}|\d{4}-\d{1,2}-\d{1,2})\b"
+    # Montos: S/. 150.00, $ 150.00, 150.00 USD
+    r"|(?P<amount>S/\.\s*\d{1,15}[,.]?\d{0,15}|\$\s*\d{1,15}[,.]?\d{0,15}|\b\d{1,15}[,.]?\d{0,15}\s*USD)"
+    # Números de documento: F001-2024, F0012024, 2024001
+    r"|\b(?P<number>[A-Z]{1,3}-?\d{4,20}|\d{4,20})\b"
+    r")"
+)
+
+
+def extract_metadata_fields(text: str, max_chars: int = MAX_SCAN_CHARS,
+                            max_results: int = MAX_RESULTS_PER_FIELD) -> Dict[str, Any]:
+    """Extraer metadatos, vencimiento, número de documento y organización en una sola pasada"""
+    dates: Dict[str, None] = {}
+    amounts: Dict[str, None] = {}
+    numbers: Dict[str, None] = {}
+    expiry_date: Optional[str] = None
+    document_number: Optional[str] = None
+    organization: Optional[str] = None
+
+    for match in _FUSED_PATTERN.finditer(text or "", 0, max_chars):
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        if kind == "expiry":
+            if expiry_date is None:
+                expiry_date = value
+            if len(dates) < max_results:
+                dates[value] = None
+        elif kind == "labeled_number":
+            if document_number is None:
+                document_number = value
+            if len(numbers) < max_results:
+                numbers[value] = None
+        elif kind == "organization":
+            if organization is None:
+                organization = value.strip()
+        elif kind == "date":
+            if len(dates) < max_results:
+                dates[value] = None
+        elif kind == "amount":
+            if len(amounts) < max_results:
+                amounts[value] = None
+        elif len(numbers) < max_results:
+            numbers[value] = None
+
+        # Detener el escaneo cuando todos los campos están completos
+        if (expiry_date is not None and document_number is not None and organization is not None
+                and len(dates) >= max_results and len(amounts) >= max_results
+                and len(numbers) >= max_results):
+            break
+
+    metadata: Dict[str, List[str]] = {}
+    if dates:
+        metadata['fechas_encontradas'] = list(dates)
+    if amounts:
+        metadata['montos'] = list(amounts)
+    if numbers:
+        metadata['numeros_documento'] = list(numbers)
+
+    return {
+        "metadata": metadata,
+        "expiry_date": expiry_date,
+        "document_number": document_number,
+        "organization": organization
+    }
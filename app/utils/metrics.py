@@ -0,0 +1,179 @@
+import time
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+from prometheus_client import Counter, Gauge, Histogram
+from app.config.settings import settings
+
+# Buckets en segundos: desde regex sobre textos cortos hasta OCR de imágenes grandes
+ANALYSIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+ANALYSIS_STAGE_SECONDS = Histogram(
+    "keepi_analysis_stage_seconds",
+    "Duración de cada etapa del análisis de documentos",
+    ["stage", "content_type"],
+    buckets=ANALYSIS_BUCKETS
+)
+
+ANALYSIS_SECONDS = Histogram(
+    "keepi_analysis_seconds",
+    "Duración total del análisis de documentos",
+    ["content_type"],
+    buckets=ANALYSIS_BUCKETS
+)
+
+
+# Por nivel de análisis (none, filename, text, ocr): latencia y CPU, incluido el OCR en el pool de hilos
+ANALYSIS_TIER_SECONDS = Histogram(
+    "keepi_analysis_tier_seconds",
+    "Duración total del análisis por nivel",
+    ["tier"],
+    buckets=ANALYSIS_BUCKETS
+)
+
+ANALYSIS_TIER_CPU_SECONDS = Histogram(
+    "keepi_analysis_tier_cpu_seconds",
+    "Tiempo de CPU del análisis por nivel",
+    ["tier"],
+    buckets=ANALYSIS_BUCKETS
+)
+
+def content_type_label(content_type: Optional[str]) -> str:
+    """Normalizar el content type para acotar la cardinalidad de las etiquetas"""
+    if content_type in settings.allowed_file_types:
+        return content_type
+    if content_type and content_type.startswith("image/"):
+        return "image/other"
+    return "other"
+
+
+# Métricas HTTP
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "keepi_http_request_seconds",
+    "Latencia de las peticiones HTTP por ruta",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "keepi_http_requests_in_flight",
+    "Peticiones HTTP en curso"
+)
+
+# Dependencias externas: firestore_read, firestore_write, drive_call, ocr_job
+DEPENDENCY_OPERATIONS = Counter(
+    "keepi_dependency_operations_total",
+    "Operaciones sobre dependencias externas",
+    ["operation"]
+)
+
+DEPENDENCY_OPERATIONS_PER_REQUEST = Histogram(
+    "keepi_dependency_operations_per_request",
+    "Operaciones sobre dependencias externas por petición",
+    ["route", "operation"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+)
+
+# Auditoría: registros descartados por cola llena y registros que no se pudieron escribir
+AUDIT_RECORDS_DROPPED = Counter(
+    "keepi_audit_records_dropped_total",
+    "Registros de auditoría descartados por cola llena",
+    ["policy"]
+)
+
+AUDIT_WRITE_FAILURES = Counter(
+    "keepi_audit_write_failures_total",
+    "Registros de auditoría que no se pudieron escribir"
+)
+
+# Caché en disco de archivos servidos por /documents/{id}/content
+CONTENT_CACHE_REQUESTS = Counter(
+    "keepi_content_cache_requests_total",
+    "Descargas de archivos según si se sirvieron desde la caché en disco",
+    ["result"]
+)
+
+# Contadores de la petición en curso
+_request_operations: ContextVar[Optional[Dict[str, int]]] = ContextVar("request_operations", default=None)
+
+
+# Caché de series ya etiquetadas: labels() toma un lock y valida en cada llamada
+_labelled_series: Dict[tuple, Any] = {}
+
+
+def _series(metric, *labels):
+    """Obtener la serie de una métrica para los valores de etiqueta dados"""
+    key = (metric, labels)
+    series = _labelled_series.get(key)
+    if series is None:
+        series = _labelled_series[key] = metric.labels(*labels)
+    return series
+
+
+def record_operation(operation: str, count: int = 1) -> None:
+    """Registrar operaciones sobre una dependencia externa"""
+    if count <= 0:
+        return
+    _series(DEPENDENCY_OPERATIONS, operation).inc(count)
+    operations = _request_operations.get()
+    if operations is not None:
+        operations[operation] = operations.get(operation, 0) + count
+
+
+def current_operations() -> Optional[Dict[str, int]]:
+    """Obtener los contadores de la petición en curso"""
+    return _request_operations.get()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide latencia por ruta y operaciones por petición"""
+    
+    def __init__(self, app):
+        self.app = app
+        self._route_templates: Dict[Any, str] = {}
+    
+    def _route_template(self, scope) -> str:
+        """Obtener la plantilla de la ruta (p. ej. /api/v1/documents/{document_id})"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._route_templates.get(endpoint)
+        if template is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            else:
+                template = "unmatched"
+            self._route_templates[endpoint] = template
+        return template
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        operations: Dict[str, int] = {}
+        token = _request_operations.set(operations)
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            _request_operations.reset(token)
+            
+            route = self._route_template(scope)
+            _series(HTTP_REQUEST_SECONDS, scope["method"], route, str(status_code)).observe(elapsed)
+            for operation, count in operations.items():
+                _series(DEPENDENCY_OPERATIONS_PER_REQUEST, route, operation).observe(count)
@@ -0,0 +1,15 @@
+import threading
+from types import ModuleType
+from typing import Optional
+
+# PDFium no es seguro entre hilos: todo acceso a documentos (abrir, leer, cerrar) pasa por este lock
+pdfium_lock = threading.Lock()
+
+
+def load_pdfium() -> Optional[ModuleType]:
+    """pypdfium2, importado al primer uso para no pesar en el arranque; None si no está instalado"""
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    return pypdfium2
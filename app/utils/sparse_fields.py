@@ -0,0 +1,42 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Type
+from pydantic import BaseModel, create_model
+
+# Proyección que solo devuelve el nombre del documento (una proyección vacía devuelve todo)
+DOCUMENT_ID_FIELD = "__name__"
+
+
+class InvalidFieldsError(ValueError):
+    """El parámetro fields= pide campos que el modelo no tiene"""
+    pass
+
+
+def parse_fields(fields: Optional[str], model_cls: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Interpretar fields=a,b,c; None si no se pide una proyección"""
+    if fields is None or not fields.strip():
+        return None
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in model_cls.model_fields]
+    if unknown:
+        raise InvalidFieldsError(
+            f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(model_cls.model_fields)}"
+        )
+    # El id sale del nombre del documento y siempre se incluye; orden del modelo como clave canónica
+    wanted = set(requested) | {"id"}
+    return tuple(name for name in model_cls.model_fields if name in wanted)
+
+
+def projection(fields: Iterable[str], required: Iterable[str] = ()) -> List[str]:
+    """Campos a pedir a Firestore: los solicitados más los que necesita el filtro del servicio"""
+    paths = sorted((set(fields) | set(required)) - {"id"})
+    return paths or [DOCUMENT_ID_FIELD]
+
+
+@lru_cache(maxsize=256)
+def slim_model(model_cls: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Modelo de respuesta reducido a los campos pedidos (se reutiliza por combinación)"""
+    definitions = {
+        name: (model_cls.model_fields[name].annotation, model_cls.model_fields[name])
+        for name in fields
+    }
+    return create_model(f"{model_cls.__name__}Slim", **definitions)
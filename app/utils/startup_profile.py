@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# (módulo, nivel de anidamiento, tiempo propio en µs, tiempo acumulado en µs)
+ImportEntry = Tuple[str, int, int, int]
+
+
+def profile_imports(code: str) -> List[ImportEntry]:
+    """Ejecutar code en un intérprete nuevo con -X importtime y devolver los tiempos de cada import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "error al importar")
+
+    entries: List[ImportEntry] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Dos espacios por nivel de anidamiento después del separador
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), level, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def startup_report(module: str = "app.main", warmup: str = "warm_up", top: int = 15) -> Dict[str, object]:
+    """Desglose del arranque: import de la app por paquete y por módulo propio, y costo de la precarga
+
+    Los imports se resuelven en el orden en que terminan: lo que aparece en el nivel superior
+    después de la app es lo que importó la precarga.
+    """
+    entries = profile_imports(f"import {module}; {module}.{warmup}()")
+    app_index = next(index for index, entry in enumerate(entries) if entry[0] == module and entry[1] == 0)
+    app_entries = entries[:app_index + 1]
+
+    by_package: Dict[str, int] = {}
+    for name, _, self_us, _ in app_entries:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+
+    own_modules = sorted(
+        ((name, cumulative_us) for name, _, _, cumulative_us in app_entries
+         if name.split(".")[0] == module.split(".")[0] and name != module),
+        key=lambda item: item[1], reverse=True
+    )
+    warmup_modules = [(name, cumulative_us) for name, level, _, cumulative_us in entries[app_index + 1:] if level == 0]
+
+    return {
+        "import_ms": app_entries[-1][3] / 1000,
+        "modules": len(app_entries),
+        "packages": sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top],
+        "own_modules": own_modules[:top],
+        "warmup_ms": sum(cumulative_us for _, cumulative_us in warmup_modules) / 1000,
+        "warmup_modules": sorted(warmup_modules, key=lambda item: item[1], reverse=True)[:top]
+    }
+
+
+def print_startup_report(report: Dict[str, object]) -> None:
+    print(f"⏱️  Import de la app: {report['import_ms']:.0f} ms ({report['modules']} módulos)")
+    print("\n📦 Tiempo propio por paquete:")
+    for name, self_us in report["packages"]:
+        print(f"   {self_us / 1000:9.1f} ms  {name}")
+    print("\n🧩 Módulos de la app (acumulado, incluye lo que importan por primera vez):")
+    for name, cumulative_us in report["own_modules"]:
+        print(f"   {cumulative_us / 1000:9.1f} ms  {name}")
+    print(f"\n🔥 Precarga diferida (STARTUP_WARMUP): {report['warmup_ms']:.0f} ms")
+    for name, cumulative_us in report["warmup_modules"]:
+        print(f"   {cumulative_us / 1000:9.1f} ms  {name}")
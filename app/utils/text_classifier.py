@@ -0,0 +1,237 @@
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+# Versión de la lógica de clasificación: subirla al cambiar palabras clave, tags o la fórmula de confianza
+CLASSIFIER_VERSION = "1.0.0"
+
+# Palabras clave para clasificación (el orden define la prioridad en empates)
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "Factura": ["factura", "invoice", "bill", "recibo", "pago"],
+    "Contrato": ["contrato", "contract", "acuerdo", "convenio"],
+    "Identificación": ["dni", "pasaporte", "carnet", "identidad", "id"],
+    "Recibo": ["recibo", "comprobante", "voucher", "ticket"],
+    "Documento Legal": ["legal", "judicial", "notarial", "oficial"],
+    "Certificado": ["certificado", "certificate", "diploma", "título"],
+    "Reporte": ["reporte", "report", "informe", "estudio"],
+    "Manual": ["manual", "guía", "instrucciones", "tutorial"]
+}
+
+# Palabras clave usadas para calcular la confianza de cada categoría
+CONFIDENCE_KEYWORDS: Dict[str, List[str]] = {
+    "Factura": ["factura", "invoice", "bill", "recibo", "pago", "total", "subtotal"],
+    "Contrato": ["contrato", "contract", "acuerdo", "convenio", "partes", "cláusula"],
+    "Identificación": ["dni", "pasaporte", "carnet", "identidad", "nacionalidad"],
+    "Recibo": ["recibo", "comprobante", "voucher", "ticket", "pago", "fecha"],
+    "Documento Legal": ["legal", "judicial", "notarial", "oficial", "gobierno"],
+    "Certificado": ["certificado", "certificate", "diploma", "título", "acreditación"],
+    "Reporte": ["reporte", "report", "informe", "estudio", "análisis"],
+    "Manual": ["manual", "guía", "instrucciones", "tutorial", "procedimiento"]
+}
+
+# Tags comunes detectados en el texto
+COMMON_TAGS: Dict[str, List[str]] = {
+    "urgente": ["urgente", "inmediato", "asap"],
+    "importante": ["importante", "crítico", "prioritario"],
+    "confidencial": ["confidencial", "privado", "secreto"],
+    "borrador": ["borrador", "draft", "temporal"]
+}
+
+# Tags fijos por categoría
+CATEGORY_TAGS: Dict[str, List[str]] = {
+    "Factura": ["pago", "comercial", "servicio"],
+    "Contrato": ["legal", "acuerdo", "obligatorio"],
+    "Identificación": ["personal", "oficial", "identidad"],
+    "Recibo": ["comprobante", "pago", "transacción"]
+}
+
+MAX_TAGS = 10
+
+# Tamaño de los bloques en que se tokeniza el texto normalizado
+_TOKENIZE_CHUNK_BYTES = 64 * 1024
+
+
+def _keyword_terms() -> set:
+    """Todas las palabras clave de las tablas de clasificación, tags y confianza"""
+    terms = set()
+    for table in (CATEGORY_KEYWORDS, CONFIDENCE_KEYWORDS, COMMON_TAGS):
+        for words in table.values():
+            terms.update(words)
+    return terms
+
+
+def _is_word_char(char: str) -> bool:
+    return re.match(r"\w", char) is not None
+
+
+def _translate_table(extra_separators: str = "") -> bytes:
+    """Tabla de bytes que pasa ASCII a minúsculas y convierte los separadores ASCII en espacios"""
+    table = bytearray(range(256))
+    for byte in range(128):
+        char = chr(byte)
+        if not _is_word_char(char) or char in extra_separators:
+            table[byte] = 0x20
+        else:
+            table[byte] = ord(char.lower())
+    # Los bytes UTF-8 no ASCII se conservan: forman parte de la palabra
+    return bytes(table)
+
+
+def _unicode_separators() -> set:
+    """Puntuación no ASCII habitual en textos OCR (espacio duro, ¿¡, «», comillas, guiones, €)"""
+    codes = list(range(0x80, 0xC0)) + list(range(0x2000, 0x20D0))
+    return {chr(code).encode("utf-8") for code in codes if not _is_word_char(chr(code))}
+
+
+def _keyword_index(terms) -> Dict[bytes, str]:
+    """Mapear cada palabra clave (y sus variantes con mayúsculas no ASCII) a su forma canónica
+
+    Las mayúsculas ASCII se resuelven con la tabla de traducción; para "GUÍA" o "ANÁLISIS"
+    se registran también las variantes con la mayúscula acentuada en UTF-8.
+    """
+    index: Dict[bytes, str] = {}
+    for term in terms:
+        variants = [""]
+        for char in term:
+            options = [char]
+            upper = char.upper()
+            if not char.isascii() and len(upper) == 1 and upper.lower() == char:
+                options.append(upper)
+            variants = [prefix + option for prefix in variants for option in options]
+        for variant in variants:
+            index[variant.encode("utf-8")] = term
+    return index
+
+
+def _phrase_pattern(phrases) -> Optional["re.Pattern[bytes]"]:
+    """Expresión para las palabras clave de varias palabras, sobre el texto ya normalizado"""
+    if not phrases:
+        return None
+    alternatives = [
+        rb" +".join(re.escape(word.encode("utf-8")) for word in re.findall(r"\w+", phrase))
+        for phrase in phrases
+    ]
+    return re.compile(rb"(?<![^ ])(?:" + b"|".join(alternatives) + rb")(?![^ ])")
+
+
+def _invert(table: Dict[str, List[str]]) -> Dict[str, tuple]:
+    """Índice palabra clave -> claves de la tabla que la contienen, en el orden de la tabla"""
+    inverted: Dict[str, tuple] = {}
+    for key, words in table.items():
+        for word in words:
+            inverted[word] = inverted.get(word, ()) + (key,)
+    return inverted
+
+
+# Tablas compiladas una sola vez al importar el módulo
+_KEYWORD_TERMS = _keyword_terms()
+_PHRASE_TERMS = sorted(term for term in _KEYWORD_TERMS if not re.fullmatch(r"\w+", term))
+_PHRASE_PATTERN = _phrase_pattern(_PHRASE_TERMS)
+_PHRASE_INDEX = {
+    b" ".join(word.encode("utf-8") for word in re.findall(r"\w+", phrase)): phrase for phrase in _PHRASE_TERMS
+}
+_KEYWORD_INDEX = _keyword_index(term for term in _KEYWORD_TERMS if term not in _PHRASE_TERMS)
+_TEXT_TABLE = _translate_table()
+# En nombres de archivo los dígitos y "_" también separan ("factura_2024.pdf")
+_FILENAME_TABLE = _translate_table("0123456789_")
+_UNICODE_SEPARATORS = _unicode_separators()
+# Byte inicial UTF-8 de esos separadores: buscar un byte es mucho más barato que la expresión
+_SEPARATOR_LEADS = {
+    b"\xc2": re.compile(rb"\xc2[\x80-\xbf]"),
+    b"\xe2": re.compile(rb"\xe2[\x80-\x83][\x80-\xbf]"),
+}
+# Así classify_text solo recorre las palabras clave encontradas
+_KEYWORD_CATEGORIES = _invert(CATEGORY_KEYWORDS)
+_KEYWORD_TAGS = _invert(COMMON_TAGS)
+
+
+def _normalize(text: str, table: bytes) -> bytes:
+    """Texto UTF-8 en minúsculas ASCII con los separadores convertidos en espacios"""
+    data = text.encode("utf-8")
+    if not data.isascii():
+        for lead, pattern in _SEPARATOR_LEADS.items():
+            if lead in data:
+                for separator in set(pattern.findall(data)):
+                    if separator in _UNICODE_SEPARATORS:
+                        data = data.replace(separator, b" ")
+        # × y ÷ comparten el byte inicial con las vocales acentuadas: se buscan en el str
+        for separator in ("×", "÷"):
+            if separator in text:
+                data = data.replace(separator.encode("utf-8"), b" ")
+    return data.translate(table)
+
+
+def count_keywords(text: str, table: bytes = _TEXT_TABLE) -> Counter:
+    """Contar ocurrencias de cada palabra clave tokenizando el texto una sola vez"""
+    counts = Counter()
+    if not text:
+        return counts
+    data = _normalize(text, table)
+    index = _KEYWORD_INDEX
+    start = 0
+    while start < len(data):
+        # Bloques cortados en un espacio: la lista de tokens de cada bloque cabe en caché
+        end = data.find(b" ", start + _TOKENIZE_CHUNK_BYTES)
+        if end < 0:
+            end = len(data)
+        # split() y el filtro por diccionario corren en C; solo las coincidencias llegan al bucle
+        for token in filter(index.__contains__, data[start:end].split()):
+            counts[index[token]] += 1
+        start = end
+    if _PHRASE_PATTERN is not None:
+        for match in _PHRASE_PATTERN.findall(data):
+            counts[_PHRASE_INDEX[b" ".join(match.split())]] += 1
+    return counts
+
+
+def _fallback_category(filename: str) -> str:
+    """Clasificar por extensión cuando no hay palabras clave"""
+    if filename.endswith('.pdf'):
+        return "Documento PDF"
+    elif filename.endswith(('.jpg', '.jpeg', '.png')):
+        return "Imagen"
+    return "General"
+
+
+def classify_text(text: str, filename: str = "") -> Dict[str, Any]:
+    """Clasificar texto y generar tags y confianza a partir de una sola pasada"""
+    hits = count_keywords(text)
+    filename_hits = count_keywords(filename, _FILENAME_TABLE)
+
+    # Conteo de coincidencias por categoría (texto + nombre de archivo)
+    totals: Dict[str, int] = {}
+    for source in (hits, filename_hits):
+        for word, count in source.items():
+            for category in _KEYWORD_CATEGORIES.get(word, ()):
+                totals[category] = totals.get(category, 0) + count
+    category_hits = {category: totals[category] for category in CATEGORY_KEYWORDS if category in totals}
+
+    if category_hits:
+        # max() conserva el primer máximo, así los empates respetan el orden de la tabla
+        category = max(category_hits, key=category_hits.get)
+    else:
+        category = _fallback_category(filename)
+
+    # Tags
+    tags = [category.lower()]
+    found = {tag for word in hits for tag in _KEYWORD_TAGS.get(word, ())}
+    tags.extend(tag for tag in COMMON_TAGS if tag in found)
+    tags.extend(CATEGORY_TAGS.get(category, []))
+    tags = list(dict.fromkeys(tags))[:MAX_TAGS]
+
+    # Confianza
+    if not text or text.strip() == "":
+        confidence = 0.1
+    else:
+        keywords = CONFIDENCE_KEYWORDS.get(category, [])
+        matches = sum(1 for word in keywords if word in hits)
+        keyword_confidence = matches / len(keywords) if keywords else 0
+        length_confidence = min(len(text) / 1000, 1.0)
+        confidence = round((keyword_confidence * 0.7) + (length_confidence * 0.3), 2)
+
+    return {
+        "category": category,
+        "category_hits": category_hits,
+        "tags": tags,
+        "confidence": confidence
+    }
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los endpoints /api/v1 contra Firestore y Drive en memoria
+
+Mide p50/p95 de cada endpoint con 1k, 10k y 100k documentos por usuario y
+compara contra una línea base guardada; termina con código 1 si el p95 empeora.
+
+Uso:
+    python -m benchmarks.bench_endpoints --save-baseline benchmarks/baseline_endpoints.json
+    python -m benchmarks.bench_endpoints --baseline benchmarks/baseline_endpoints.json
+    python -m benchmarks.bench_endpoints --sizes 1000 --latency-ms 2
+    python -m benchmarks.bench_endpoints --only upload --storage local
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.testclient import TestClient
+
+from app.config.database import DatabaseConfig
+from app.config.settings import settings
+from app.main import app
+from app.services.drive_service import set_drive_service_factory
+from app.testing.memory_drive import InMemoryDriveService
+from app.testing.memory_firestore import InMemoryFirestore
+from app.utils.auth import verify_token
+
+USER_ID = "bench_user"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_ITERATIONS = {1_000: 30, 10_000: 10, 100_000: 3}
+CATEGORIES = ["Factura", "Contrato", "Identificación", "Recibo", "Certificado", "Reporte", "Manual", "General"]
+
+
+def seed(db: InMemoryFirestore, documents_count: int, seed_value: int = 1) -> None:
+    """Cargar un usuario con documentos, carpetas, notificaciones, logs de auditoría y credenciales de Drive"""
+    rng = random.Random(seed_value)
+    now = datetime.now()
+
+    db.load("users", {USER_ID: {
+        "email": "bench@keepi.app", "name": "Bench", "settings": {},
+        "created_at": now, "updated_at": now
+    }})
+    db.load("oauth_credentials", {USER_ID: {
+        "user_id": USER_ID, "access_token": "token", "refresh_token": "refresh",
+        "client_id": "client", "client_secret": "secret", "scopes": []
+    }})
+
+    documents = {}
+    for i in range(documents_count):
+        category = rng.choice(CATEGORIES)
+        created = now - timedelta(days=rng.randint(0, 900))
+        documents[f"doc{i:06d}"] = {
+            "user_id": USER_ID,
+            "name": f"{category.lower()}_{i}.pdf",
+            "category": category,
+            "description": f"Documento analizado automáticamente. Categoría sugerida: {category}",
+            "file_url": f"https://drive.google.com/file/d/drive{i}/view",
+            "file_name": f"{category.lower()}_{i}.pdf",
+            "file_size": rng.randint(10_000, 5_000_000),
+            "file_type": "application/pdf",
+            "expiry_date": (now + timedelta(days=rng.randint(-60, 720))).isoformat() if rng.random() < 0.3 else None,
+            "metadata": {"fechas_encontradas": ["12/05/2024"], "montos": ["S/. 150.00"]},
+            "tags": [category.lower(), "pago"],
+            "drive_file_id": f"drive{i}",
+            "is_archived": False,
+            "is_favorite": rng.random() < 0.05,
+            "created_at": created,
+            "updated_at": created
+        }
+    db.load("documents", documents)
+
+    notifications = {}
+    for i in range(max(documents_count // 10, 10)):
+        notifications[f"notif{i:06d}"] = {
+            "user_id": USER_ID, "title": "Documento por vencer", "message": f"El documento {i} vence pronto",
+            "type": "expiry", "read": rng.random() < 0.7, "created_at": now - timedelta(hours=i)
+        }
+    db.load("notifications", notifications)
+
+    # Carpetas: una por categoría y subcarpetas por año, con sus contadores de documentos
+    folders = {}
+    folder_counts = {}
+    for c, category in enumerate(CATEGORIES):
+        folders[f"folder{c:03d}"] = {
+            "user_id": USER_ID, "name": category, "category": category, "parent_folder_id": None,
+            "drive_folder_id": f"drivefolder{c}", "created_at": now, "updated_at": now
+        }
+        for year in range(2020, 2026):
+            folders[f"folder{c:03d}_{year}"] = {
+                "user_id": USER_ID, "name": str(year), "category": category, "parent_folder_id": f"folder{c:03d}",
+                "drive_folder_id": f"drivefolder{c}_{year}", "created_at": now, "updated_at": now
+            }
+            folder_counts[f"drivefolder{c}_{year}"] = documents_count // (len(CATEGORIES) * 6)
+    db.load("folders", folders)
+    db.load("folder_counters", {USER_ID: {"documents": folder_counts}})
+
+    audit_logs = {}
+    for i in range(documents_count):
+        audit_logs[f"audit{i:06d}"] = {
+            "user_id": USER_ID, "action_type": rng.choice(["document_upload", "document_update", "document_delete"]),
+            "resource_type": "document", "resource_id": f"doc{i:06d}", "description": f"Evento {i}",
+            "ip_address": "127.0.0.1", "user_agent": "bench", "metadata": None, "success": True,
+            "error_message": None, "created_at": now - timedelta(minutes=i)
+        }
+    db.load("audit_logs", audit_logs)
+
+    # Sellos de versión, como tras la primera escritura de cada colección (SERVER_TIMESTAMP es UTC)
+    stamped_at = datetime.now(timezone.utc)
+    db.load("collection_versions", {USER_ID: {
+        "documents": {"version": 1, "updated_at": stamped_at},
+        "notifications": {"version": 1, "updated_at": stamped_at},
+        "folders": {"version": 1, "updated_at": stamped_at}
+    }})
+
+
+def build_cases(db: InMemoryFirestore) -> List[Tuple[str, Callable[[TestClient, int], Any]]]:
+    """Endpoints a medir: (nombre, función que ejecuta una petición)"""
+    base = "/api/v1"
+
+    def delete_document(client: TestClient, i: int):
+        # Preparar un documento desechable sin contarlo en la medición
+        document_id = f"delete{i}"
+        db.load("documents", {document_id: {
+            "user_id": USER_ID, "name": "x", "category": "General",
+            "created_at": datetime.now(), "updated_at": datetime.now()
+        }})
+        return ("DELETE", f"{base}/documents/{document_id}", {})
+
+    def delete_notification(client: TestClient, i: int):
+        notification_id = f"delete{i}"
+        db.load("notifications", {notification_id: {
+            "user_id": USER_ID, "title": "x", "message": "x", "type": "info",
+            "read": False, "created_at": datetime.now()
+        }})
+        return ("DELETE", f"{base}/notifications/{notification_id}", {})
+
+    upload_body = b"FACTURA ELECTRONICA F001-2024 total S/. 150.00 vencimiento: 30/06/2025"
+    return [
+        ("GET /auth/verify", lambda c, i: ("GET", f"{base}/auth/verify", {})),
+        ("GET /auth/current-user", lambda c, i: ("GET", f"{base}/auth/current-user", {})),
+        ("GET /auth/google/status", lambda c, i: ("GET", f"{base}/auth/google/status", {})),
+        ("GET /users/profile", lambda c, i: ("GET", f"{base}/users/profile", {})),
+        ("PUT /users/profile", lambda c, i: ("PUT", f"{base}/users/profile", {"json": {"name": f"Bench {i}"}})),
+        ("PUT /users/settings", lambda c, i: ("PUT", f"{base}/users/settings", {"json": {"theme": "dark"}})),
+        ("GET /users/all", lambda c, i: ("GET", f"{base}/users/all", {})),
+        ("GET /users/{user_uid}", lambda c, i: ("GET", f"{base}/users/{USER_ID}", {})),
+        ("GET /documents/", lambda c, i: ("GET", f"{base}/documents/", {})),
+        ("GET /documents/?fields=", lambda c, i: ("GET", f"{base}/documents/",
+                                                 {"params": {"fields": "name,category,created_at,is_favorite"}})),
+        ("GET /documents/ (304)", lambda c, i: ("GET", f"{base}/documents/", {
+            "headers": {"If-None-Match": c.get(f"{base}/documents/").headers["etag"]}
+        })),
+        ("GET /documents/export", lambda c, i: ("GET", f"{base}/documents/export", {})),
+        ("GET /documents/export?format=csv", lambda c, i: ("GET", f"{base}/documents/export",
+                                                          {"params": {"format": "csv"}})),
+        ("GET /documents/{document_id}", lambda c, i: ("GET", f"{base}/documents/doc{i:06d}", {})),
+        ("POST /documents/", lambda c, i: ("POST", f"{base}/documents/",
+                                          {"json": {"name": f"nuevo {i}", "category": "General"}})),
+        ("PUT /documents/{document_id}", lambda c, i: ("PUT", f"{base}/documents/doc{i:06d}",
+                                                      {"json": {"is_favorite": True}})),
+        ("DELETE /documents/{document_id}", delete_document),
+        ("POST /documents/upload", lambda c, i: ("POST", f"{base}/documents/upload",
+                                                {"files": {"file": (f"factura_{i}.txt", upload_body, "text/plain")}})),
+        ("POST /documents/upload/batch", lambda c, i: ("POST", f"{base}/documents/upload/batch", {"files": [
+            ("files", (f"recibo_{i}_{n}.txt", upload_body, "text/plain")) for n in range(5)
+        ]})),
+        ("GET /documents/categories/list", lambda c, i: ("GET", f"{base}/documents/categories/list", {})),
+        ("GET /documents/expiring/list", lambda c, i: ("GET", f"{base}/documents/expiring/list", {})),
+        ("GET /documents/search/list", lambda c, i: ("GET", f"{base}/documents/search/list", {"params": {"q": "factura"}})),
+        ("GET /documents/drive/structure", lambda c, i: ("GET", f"{base}/documents/drive/structure", {})),
+        ("GET /notifications/", lambda c, i: ("GET", f"{base}/notifications/", {})),
+        ("GET /notifications/{notification_id}", lambda c, i: ("GET", f"{base}/notifications/notif{i % 10:06d}", {})),
+        ("POST /notifications/", lambda c, i: ("POST", f"{base}/notifications/",
+                                              {"json": {"title": "t", "message": "m"}})),
+        ("PUT /notifications/{notification_id}/read", lambda c, i: ("PUT", f"{base}/notifications/notif{i % 10:06d}/read", {})),
+        ("DELETE /notifications/{notification_id}", delete_notification),
+        ("GET /notifications/unread/count", lambda c, i: ("GET", f"{base}/notifications/unread/count", {})),
+        ("GET /folders/tree", lambda c, i: ("GET", f"{base}/folders/tree", {})),
+        ("GET /audit-logs/", lambda c, i: ("GET", f"{base}/audit-logs/?limit=100", {})),
+        ("GET /audit-logs/?action_type=", lambda c, i: ("GET", f"{base}/audit-logs/?action_type=document_delete&limit=100", {})),
+    ]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentil por el método del rango más cercano"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run(sizes: List[int], iterations: Optional[int], latency_ms: float,
+        only: Optional[str] = None, storage: str = "drive") -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Ejecutar el benchmark y devolver {tamaño: {endpoint: estadísticas en ms}}
+
+    Con storage="local" las subidas escriben en un directorio temporal: la ruta completa
+    (lectura, análisis, escritura del archivo y de Firestore) se mide sin Drive.
+    """
+    app.dependency_overrides[verify_token] = lambda: {
+        "uid": USER_ID, "email": "bench@keepi.app", "name": "Bench", "picture": ""
+    }
+    set_drive_service_factory(InMemoryDriveService)
+    InMemoryDriveService.latency_ms = latency_ms
+    previous_storage = (settings.storage_backend, settings.storage_local_dir)
+    storage_dir = tempfile.mkdtemp(prefix="keepi-bench-") if storage == "local" else None
+    if storage_dir:
+        settings.storage_backend, settings.storage_local_dir = "local", storage_dir
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    try:
+        for size in sizes:
+            db = InMemoryFirestore(latency_ms=latency_ms)
+            seed(db, size)
+            DatabaseConfig.set_firestore_client(db)
+            client = TestClient(app)
+            count = iterations or DEFAULT_ITERATIONS.get(size, 10)
+            results[str(size)] = {}
+
+            for name, build_request in build_cases(db):
+                if only and only not in name:
+                    continue
+                samples = []
+                for i in range(count):
+                    method, url, kwargs = build_request(client, i)
+                    started = time.perf_counter()
+                    response = client.request(method, url, **kwargs)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    if response.status_code >= 400:
+                        raise RuntimeError(f"{name} respondió {response.status_code}: {response.text[:200]}")
+                results[str(size)][name] = {
+                    "p50_ms": round(statistics.median(samples), 3),
+                    "p95_ms": round(percentile(samples, 95), 3),
+                    "mean_ms": round(statistics.fmean(samples), 3),
+                    "iterations": count
+                }
+                print(f"{size:>7} docs | {name:<45} p50 {results[str(size)][name]['p50_ms']:>9.2f} ms"
+                      f" | p95 {results[str(size)][name]['p95_ms']:>9.2f} ms")
+    finally:
+        DatabaseConfig.set_firestore_client(None)
+        set_drive_service_factory(None)
+        settings.storage_backend, settings.storage_local_dir = previous_storage
+        if storage_dir:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+        app.dependency_overrides.pop(verify_token, None)
+
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Listar las regresiones de p95 respecto a la línea base"""
+    regressions = []
+    for size, endpoints in results.items():
+        for name, stats in endpoints.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous:
+                continue
+            limit = previous["p95_ms"] * (1 + tolerance)
+            if stats["p95_ms"] > limit and stats["p95_ms"] - previous["p95_ms"] > min_delta_ms:
+                regressions.append(
+                    f"{size} docs | {name}: p95 {stats['p95_ms']:.2f} ms > {previous['p95_ms']:.2f} ms "
+                    f"(+{(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de endpoints de Keepi en memoria")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Documentos por usuario, separados por comas")
+    parser.add_argument("--iterations", type=int, default=None, help="Peticiones por endpoint")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia simulada por RPC")
+    parser.add_argument("--only", default=None, help="Medir solo endpoints cuyo nombre contenga este texto")
+    parser.add_argument("--storage", choices=["drive", "local"], default="drive",
+                        help="Almacenamiento de las subidas: Drive en memoria o directorio local temporal")
+    parser.add_argument("--baseline", default=None, help="JSON con la línea base para comparar")
+    parser.add_argument("--save-baseline", default=None, help="Guardar los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Empeoramiento de p95 permitido (0.20 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Diferencia mínima para considerar regresión")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run(sizes, args.iterations, args.latency_ms, args.only, args.storage)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\n❌ Regresiones de p95:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\n✅ Sin regresiones de p95")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de extracción de metadatos sobre una salida OCR de 100 KB
+Uso: python -m benchmarks.bench_metadata
+"""
+
+import random
+import re
+import time
+
+from app.utils.metadata_extractor import extract_metadata_fields
+
+TEXT_SIZE = 100 * 1024
+REPEAT = 10
+
+SAMPLE_LINES = [
+    "FACTURA ELECTRONICA F001-{n}",
+    "Empresa: Servicios Generales del Sur",
+    "Fecha de emision: {d}/{m}/2024",
+    "Vencimiento: {d}/{m}/2025",
+    "Numero: F{n}  RUC 20{n}{n}",
+    "Total S/. {n}.50   IGV $ {d}.18   {n} USD",
+    "Codigo de cliente {n}{n}  Pedido {n}",
+    "Cantidad unidad descripcion precio unitario importe",
+    "Lima Peru telefono {n}{d} correo cliente",
+]
+
+# Etiquetas en minúscula, mayúscula y capitalizadas: el filtro previo del patrón
+# fusionado no debe descartar ninguna (regresión: "id:" e "institución:")
+LABEL_CASES = [
+    "id: ABC12345",
+    "ID: ABC12345",
+    "Id: ABC12345",
+    "número: F0012024",
+    "código: AB-20240001",
+    "referencia: X123456",
+    "vencimiento: 15/03/2025",
+    "expira 01-12-2026",
+    "validez: 30/06/2025",
+    "vigencia: 31/12/2025",
+    "institución: Banco Central",
+    "empresa: Servicios Generales",
+    "compañía: Seguros Andinos",
+    "organización: Keepi",
+]
+
+
+def generate_ocr_text(size: int = TEXT_SIZE, seed: int = 7) -> str:
+    """Generar texto OCR con fechas, montos y números dispersos"""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(SAMPLE_LINES).format(
+            n=rng.randint(1000, 99999), d=rng.randint(1, 28), m=rng.randint(1, 12)
+        )
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def previous_extract(text: str) -> dict:
+    """Implementación anterior: un re.findall/re.search por patrón"""
+    metadata = {}
+    for key, patterns in (
+        ('fechas_encontradas', [r'\d{1,2}/\d{1,2}/\d{4}', r'\d{1,2}-\d{1,2}-\d{4}', r'\d{4}-\d{1,2}-\d{1,2}']),
+        ('montos', [r'S/\.\s*\d+[,.]?\d*', r'\$\s*\d+[,.]?\d*', r'\d+[,.]?\d*\s*USD']),
+        ('numeros_documento', [r'[A-Z]{1,3}-\d{4,}', r'[A-Z]{1,3}\d{4,}', r'\d{4,}']),
+    ):
+        found = []
+        for pattern in patterns:
+            found.extend(re.findall(pattern, text))
+        if found:
+            metadata[key] = list(set(found))
+    result = {"metadata": metadata}
+    for key, patterns in (
+        ("expiry_date", [r'venc[ei]miento[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
+                         r'expir[ae][:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
+                         r'validez[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
+                         r'vigencia[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{4})']),
+        ("document_number", [r'[Nn]úmero[:\s]*([A-Z]{1,3}[-]?\d{4,})',
+                             r'[Cc]ódigo[:\s]*([A-Z]{1,3}[-]?\d{4,})',
+                             r'[Rr]eferencia[:\s]*([A-Z]{1,3}[-]?\d{4,})',
+                             r'[Ii]D[:\s]*([A-Z]{1,3}[-]?\d{4,})']),
+        ("organization", [r'[Ee]mpresa[:\s]*([A-Z][a-z\s]+)',
+                          r'[Cc]ompañía[:\s]*([A-Z][a-z\s]+)',
+                          r'[Ii]nstitución[:\s]*([A-Z][a-z\s]+)',
+                          r'[Oo]rganización[:\s]*([A-Z][a-z\s]+)']),
+    ):
+        result[key] = None
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                result[key] = match.group(1)
+                break
+    return result
+
+
+def measure(func, *args) -> float:
+    """Mejor tiempo (segundos) de REPEAT ejecuciones"""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_labels() -> None:
+    """Los campos con etiqueta deben coincidir con la implementación anterior"""
+    for text in LABEL_CASES:
+        fused = extract_metadata_fields(text)
+        previous = previous_extract(text)
+        for key in ("expiry_date", "document_number", "organization"):
+            expected = previous[key].strip() if previous[key] else None
+            assert fused[key] == expected, f"{text!r}: {key} = {fused[key]!r}, se esperaba {expected!r}"
+
+
+def main():
+    check_labels()
+    text = generate_ocr_text()
+    fused = measure(extract_metadata_fields, text)
+    previous = measure(previous_extract, text)
+    fused_result = extract_metadata_fields(text)
+    previous_result = previous_extract(text)
+
+    print(f"Texto OCR: {len(text) / 1024:.0f} KB")
+    print(f"  fusionado: {fused * 1000:8.2f} ms "
+          f"({sum(len(v) for v in fused_result['metadata'].values())} valores)")
+    print(f"  anterior:  {previous * 1000:8.2f} ms "
+          f"({sum(len(v) for v in previous_result['metadata'].values())} valores)")
+    print(f"  aceleración: {previous / fused:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
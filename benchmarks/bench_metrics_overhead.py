@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark del costo de instrumentación: middleware de métricas y contadores de dependencias
+Uso: python -m benchmarks.bench_metrics_overhead
+"""
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from app.utils.metrics import MetricsMiddleware, record_operation
+
+REQUESTS = 5_000
+ROUNDS = 5
+OPERATIONS_PER_REQUEST = 10
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    """Aplicación mínima con una ruta parametrizada"""
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        for _ in range(OPERATIONS_PER_REQUEST):
+            record_operation("firestore_read")
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def call(app, path: str) -> None:
+    """Ejecutar una petición ASGI en memoria, sin red"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure(app) -> float:
+    """Tiempo medio por petición en microsegundos"""
+    started = time.perf_counter()
+    for i in range(REQUESTS):
+        await call(app, f"/items/{i}")
+    return (time.perf_counter() - started) / REQUESTS * 1e6
+
+
+async def main():
+    plain_app = build_app(instrumented=False)
+    instrumented_app = build_app(instrumented=True)
+    await measure(plain_app)
+    await measure(instrumented_app)
+
+    # Rondas alternadas; se conserva el mejor tiempo para reducir el ruido
+    plain = instrumented = float("inf")
+    for _ in range(ROUNDS):
+        plain = min(plain, await measure(plain_app))
+        instrumented = min(instrumented, await measure(instrumented_app))
+
+    print(f"Peticiones: {REQUESTS} x {ROUNDS} rondas "
+          f"({OPERATIONS_PER_REQUEST} operaciones registradas por petición)")
+    print(f"  sin middleware:  {plain:8.1f} µs/petición")
+    print(f"  con middleware:  {instrumented:8.1f} µs/petición")
+    print(f"  costo:           {instrumented - plain:8.1f} µs/petición "
+          f"({(instrumented - plain) / plain * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
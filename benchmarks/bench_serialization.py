@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización de listados: validación doble de pydantic frente a la ruta de confianza
+
+Compara, para varios tamaños de lista, el CPU por petición de:
+- legacy: DocumentResponse(**datos) + validación y serialización de response_model
+- trusted: trusted_model(DocumentResponse, datos) + TrustedJSONResponse (orjson)
+
+Uso: python -m benchmarks.bench_serialization
+"""
+
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+
+from app.models.document import DocumentResponse
+from app.utils.responses import TrustedJSONResponse, trusted_model
+
+SIZES = [100, 500, 2_000, 10_000]
+CATEGORIES = ["Factura", "Contrato", "Identificación", "Recibo", "Certificado", "Reporte"]
+
+
+def make_documents(count: int) -> List[Dict[str, Any]]:
+    """Documentos con la forma en que los devuelve Firestore"""
+    rng = random.Random(1)
+    now = datetime.now()
+    documents = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        documents.append({
+            "id": f"doc{i:06d}",
+            "user_id": "bench_user",
+            "name": f"{category.lower()}_{i}.pdf",
+            "category": category,
+            "description": f"Documento analizado automáticamente. Categoría sugerida: {category}",
+            "file_url": f"https://drive.google.com/file/d/drive{i}/view",
+            "file_name": f"{category.lower()}_{i}.pdf",
+            "file_size": rng.randint(10_000, 5_000_000),
+            "file_type": "application/pdf",
+            "expiry_date": now + timedelta(days=rng.randint(-60, 720)) if rng.random() < 0.3 else None,
+            "metadata": {"fechas_encontradas": ["12/05/2024"], "montos": ["S/. 150.00"]},
+            "tags": [category.lower(), "pago"],
+            "drive_file_id": f"drive{i}",
+            "drive_folder_id": "folder",
+            "is_archived": False,
+            "is_favorite": False,
+            "created_at": now - timedelta(days=i % 900),
+            "updated_at": now
+        })
+    return documents
+
+
+def build_app(documents: List[Dict[str, Any]]) -> FastAPI:
+    """Aplicación con ambas variantes del listado sobre los mismos datos"""
+    app = FastAPI()
+
+    @app.get("/legacy", response_model=List[DocumentResponse])
+    async def legacy():
+        return [DocumentResponse(**dict(doc)) for doc in documents]
+
+    @app.get("/trusted", response_model=List[DocumentResponse])
+    async def trusted():
+        return TrustedJSONResponse([trusted_model(DocumentResponse, doc) for doc in documents])
+
+    return app
+
+
+async def call(app, path: str) -> bytes:
+    """Ejecutar una petición ASGI en memoria y devolver el cuerpo"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure(app, path: str, iterations: int) -> float:
+    """CPU medio por petición en milisegundos"""
+    cpu_started = time.process_time()
+    for _ in range(iterations):
+        await call(app, path)
+    return (time.process_time() - cpu_started) / iterations * 1000
+
+
+async def main():
+    print(f"{'Documentos':>10} | {'legacy CPU':>11} | {'trusted CPU':>11} | {'mejora':>7} | {'bytes':>10}")
+    for size in SIZES:
+        app = build_app(make_documents(size))
+        legacy_body = await call(app, "/legacy")
+        trusted_body = await call(app, "/trusted")
+        assert json.loads(legacy_body) == json.loads(trusted_body), "Las respuestas difieren"
+
+        iterations = max(3, 20_000 // size)
+        # Intercalar rondas para repartir el ruido entre ambas variantes
+        legacy, trusted = [], []
+        for _ in range(3):
+            legacy.append(await measure(app, "/legacy", iterations))
+            trusted.append(await measure(app, "/trusted", iterations))
+        legacy_cpu = min(legacy)
+        trusted_cpu = min(trusted)
+        print(f"{size:>10} | {legacy_cpu:>8.2f} ms | {trusted_cpu:>8.2f} ms | "
+              f"{legacy_cpu / trusted_cpu:>6.1f}x | {len(trusted_body):>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
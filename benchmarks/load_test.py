@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga por escenarios contra app.main:app con Firestore y Drive en memoria
+
+Usuarios virtuales concurrentes eligen escenarios según una mezcla de tráfico
+(abrir la app, buscar, consultar notificaciones, subir documentos con OCR
+simulado) durante un tiempo fijo, con rampa de arranque. El informe JSON
+incluye throughput, p50/p95/p99 y tasa de errores por endpoint.
+
+Uso:
+    python -m benchmarks.load_test --users 50 --ramp 10 --duration 60
+    python -m benchmarks.load_test --mix app_open=50,poll_notifications=50 --output run.json
+    python -m benchmarks.load_test --latency-ms 5 --ocr-ms 800 --documents 5000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.config.database import DatabaseConfig
+from app.main import app
+from app.services.ai_analysis_service import DocumentAnalysisService
+from app.services.drive_service import set_drive_service_factory
+from app.testing.memory_drive import InMemoryDriveService
+from app.testing.memory_firestore import InMemoryFirestore
+from app.utils.auth import verify_token
+from app.utils.metrics import record_operation
+from benchmarks.bench_endpoints import USER_ID, percentile, seed
+
+BASE = "/api/v1"
+
+# Mezcla por defecto: peso relativo de cada escenario
+DEFAULT_MIX = {"app_open": 40, "search": 15, "poll_notifications": 35, "upload": 10}
+
+SEARCH_TERMS = ["factura", "contrato", "recibo", "dni", "certificado", "manual", "pago", "banco"]
+OCR_TEXT = "FACTURA ELECTRONICA F001-2024 RUC 20123456789 total S/. 150.00 vencimiento: 30/06/2025"
+# Cabecera PNG mínima: el OCR está simulado, solo importa el content type
+PNG_BODY = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+
+# Un paso es (nombre del endpoint, método, url, kwargs de httpx)
+Step = Tuple[str, str, str, Dict[str, Any]]
+
+
+def app_open(rng: random.Random, documents: int) -> List[Step]:
+    """Pantalla inicial: perfil, lista de documentos y contador de notificaciones"""
+    return [
+        ("GET /users/profile", "GET", f"{BASE}/users/profile", {}),
+        ("GET /documents/", "GET", f"{BASE}/documents/", {}),
+        ("GET /notifications/unread/count", "GET", f"{BASE}/notifications/unread/count", {}),
+        ("GET /documents/expiring/list", "GET", f"{BASE}/documents/expiring/list", {}),
+    ]
+
+
+def search(rng: random.Random, documents: int) -> List[Step]:
+    """Búsqueda seguida de abrir uno de los documentos"""
+    return [
+        ("GET /documents/search/list", "GET", f"{BASE}/documents/search/list",
+         {"params": {"q": rng.choice(SEARCH_TERMS)}}),
+        ("GET /documents/{document_id}", "GET", f"{BASE}/documents/doc{rng.randrange(max(documents, 1)):06d}", {}),
+    ]
+
+
+def poll_notifications(rng: random.Random, documents: int) -> List[Step]:
+    """Sondeo periódico de notificaciones"""
+    steps: List[Step] = [("GET /notifications/unread/count", "GET", f"{BASE}/notifications/unread/count", {})]
+    if rng.random() < 0.3:
+        steps.append(("GET /notifications/", "GET", f"{BASE}/notifications/", {}))
+    return steps
+
+
+def upload(rng: random.Random, documents: int) -> List[Step]:
+    """Subida de una imagen que pasa por OCR y Drive"""
+    name = f"factura_{rng.randrange(10**6)}.png"
+    return [
+        ("POST /documents/upload", "POST", f"{BASE}/documents/upload",
+         {"files": {"file": (name, PNG_BODY, "image/png")}}),
+    ]
+
+
+# Cada escenario recibe el generador del usuario y el número de documentos sembrados
+SCENARIOS: Dict[str, Callable[[random.Random, int], List[Step]]] = {
+    "app_open": app_open,
+    "search": search,
+    "poll_notifications": poll_notifications,
+    "upload": upload,
+}
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    """Interpretar una mezcla del tipo app_open=40,search=10"""
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Escenario desconocido: {name} (disponibles: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def stub_ocr(delay_ms: float) -> Callable[[DocumentAnalysisService, bytes], str]:
+    """OCR simulado: ocupa un hilo del pool durante delay_ms y devuelve texto fijo"""
+    def _ocr_image(self, content: bytes) -> str:
+        record_operation("ocr_job")
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return OCR_TEXT
+    return _ocr_image
+
+
+class LoadStats:
+    """Acumula latencias y errores por endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, elapsed_ms: float, status: str) -> None:
+        self.latencies[endpoint].append(elapsed_ms)
+        self.status_codes[endpoint][status] += 1
+        if not status.isdigit() or int(status) >= 400:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        """Resumen por endpoint y total"""
+        def describe(samples: List[float], errors: int) -> Dict[str, Any]:
+            return {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "throughput_rps": round(len(samples) / elapsed_s, 2) if elapsed_s else 0.0,
+                "p50_ms": round(percentile(samples, 50), 3) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 3) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 3) if samples else None,
+                "max_ms": round(max(samples), 3) if samples else None,
+            }
+
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            endpoints[endpoint] = describe(self.latencies[endpoint], self.errors[endpoint])
+            endpoints[endpoint]["status_codes"] = dict(self.status_codes[endpoint])
+        all_samples = [sample for samples in self.latencies.values() for sample in samples]
+        return {"total": describe(all_samples, sum(self.errors.values())), "endpoints": endpoints}
+
+
+async def virtual_user(client: httpx.AsyncClient, stats: LoadStats, mix: Dict[str, float],
+                       start_delay: float, deadline: float, think_ms: float, rng: random.Random,
+                       documents: int) -> None:
+    """Usuario virtual: ejecuta escenarios aleatorios hasta la hora límite"""
+    await asyncio.sleep(start_delay)
+    names, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+
+    while loop.time() < deadline:
+        scenario = SCENARIOS[rng.choices(names, weights)[0]]
+        for endpoint, method, url, kwargs in scenario(rng, documents):
+            if loop.time() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            stats.record(endpoint, (time.perf_counter() - started) * 1000, status)
+            if think_ms:
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+
+
+async def run_load(users: int, ramp_s: float, duration_s: float, mix: Dict[str, float],
+                   think_ms: float, seed_value: int, documents: int) -> Tuple[LoadStats, float]:
+    """Lanzar los usuarios virtuales con rampa lineal y esperar a que terminen"""
+    stats = LoadStats()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + ramp_s + duration_s
+        tasks = [
+            virtual_user(client, stats, mix, ramp_s * index / users, deadline, think_ms,
+                         random.Random(seed_value + index), documents)
+            for index in range(users)
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+    return stats, elapsed
+
+
+def git_revision() -> Optional[str]:
+    """Commit actual, para comparar ejecuciones entre versiones"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga por escenarios de Keepi en memoria")
+    parser.add_argument("--users", type=int, default=20, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Segundos hasta arrancar todos los usuarios")
+    parser.add_argument("--duration", type=float, default=30.0, help="Segundos de carga tras la rampa")
+    parser.add_argument("--mix", default=None,
+                        help="Pesos de escenarios, p. ej. app_open=40,search=15,poll_notifications=35,upload=10")
+    parser.add_argument("--think-ms", type=float, default=100.0, help="Pausa media entre peticiones de un usuario")
+    parser.add_argument("--documents", type=int, default=1_000, help="Documentos sembrados para el usuario")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia simulada por RPC de Firestore/Drive")
+    parser.add_argument("--ocr-ms", type=float, default=500.0, help="Duración simulada de cada OCR")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla para reproducir la ejecución")
+    parser.add_argument("--output", default=None, help="Guardar el informe JSON en este archivo")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+
+    db = InMemoryFirestore(latency_ms=args.latency_ms)
+    seed(db, args.documents, args.seed)
+    DatabaseConfig.set_firestore_client(db)
+    set_drive_service_factory(InMemoryDriveService)
+    InMemoryDriveService.latency_ms = args.latency_ms
+    app.dependency_overrides[verify_token] = lambda: {
+        "uid": USER_ID, "email": "bench@keepi.app", "name": "Bench", "picture": ""
+    }
+    original_ocr = DocumentAnalysisService._ocr_image
+    DocumentAnalysisService._ocr_image = stub_ocr(args.ocr_ms)
+
+    try:
+        stats, elapsed = asyncio.run(run_load(args.users, args.ramp, args.duration, mix,
+                                              args.think_ms, args.seed, args.documents))
+    finally:
+        DocumentAnalysisService._ocr_image = original_ocr
+        app.dependency_overrides.pop(verify_token, None)
+        set_drive_service_factory(None)
+        DatabaseConfig.set_firestore_client(None)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            "users": args.users, "ramp_s": args.ramp, "duration_s": args.duration, "mix": mix,
+            "think_ms": args.think_ms, "documents": args.documents, "latency_ms": args.latency_ms,
+            "ocr_ms": args.ocr_ms, "seed": args.seed
+        },
+        "elapsed_s": round(elapsed, 3),
+        **stats.summary(elapsed)
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+        total = report["total"]
+        print(f"{total['requests']} peticiones en {elapsed:.1f} s ({total['throughput_rps']} req/s), "
+              f"p95 {total['p95_ms']} ms, errores {total['error_rate']:.2%} → {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
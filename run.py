@@ -1,18 +1,35 @@
 #!/usr/bin/env python3
 """
 Archivo de entrada principal para la aplicación Keepi API refactorizada
+
+Uso:
+    python run.py                      # iniciar el servidor
+    python run.py --profile-startup    # desglose del tiempo de import del arranque en frío
 """
 
+import argparse
 import uvicorn
-from app.main import app
 from app.config.settings import settings
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keepi API")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Medir el import de la app en un proceso nuevo y mostrar el desglose, sin iniciar el servidor")
+    parser.add_argument("--top", type=int, default=15, help="Filas por sección del desglose")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        from app.utils.startup_profile import startup_report, print_startup_report
+
+        print_startup_report(startup_report(top=args.top))
+        raise SystemExit(0)
+
     print("🚀 Iniciando Keepi API...")
     print(f"📡 Servidor: {settings.host}:{settings.port}")
     print(f"🔧 Modo debug: {settings.debug}")
     print(f"📚 Documentación: http://{settings.host}:{settings.port}/docs")
     
+    # La app se importa una sola vez, en uvicorn
     uvicorn.run(
         "app.main:app",
         host=settings.host,
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de audit_logs: resume los días completos en audit_daily y borra
+los eventos más antiguos que AUDIT_RETENTION_DAYS, por fragmentos y con pausas.
+Pensado para ejecutarse una vez al día (cron o Cloud Scheduler).
+"""
+
+import argparse
+import asyncio
+
+from app.config.database import DatabaseConfig
+from app.services.audit_retention_service import AuditRetentionService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-days", type=int, default=None, help="Días a resumir como máximo en esta ejecución")
+    parser.add_argument("--max-deletes", type=int, default=None, help="Eventos a borrar como máximo en esta ejecución")
+    parser.add_argument("--rollup-only", action="store_true", help="Resumir sin borrar")
+    args = parser.parse_args()
+
+    DatabaseConfig.initialize_firebase()
+    service = AuditRetentionService()
+
+    print("🧹 Mantenimiento de audit_logs...")
+    if args.rollup_only:
+        result = asyncio.run(service.rollup(max_days=args.max_days))
+    else:
+        result = asyncio.run(service.run(max_days=args.max_days, max_deletes=args.max_deletes))
+    print(f"📊 Días resumidos: {result['days']} ({result['summaries']} resúmenes de usuario)")
+    if 'deleted' in result:
+        print(f"🗑️ Eventos borrados: {result['deleted']}")
+    print("✅ Mantenimiento completado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Sincronización incremental Drive → Keepi de los usuarios con drive_sync_enabled.
+Cada usuario continúa desde el token del feed de cambios guardado en su última ejecución.
+"""
+
+import argparse
+import asyncio
+
+from app.config.database import DatabaseConfig
+from app.services.drive_service import get_drive_service
+from app.services.drive_sync_service import DriveSyncService, SyncInProgressError
+
+
+async def sync_all(max_pages):
+    from app.services.oauth_service import GoogleOAuthService
+
+    db = DatabaseConfig.get_firestore_client()
+    oauth_service = GoogleOAuthService()
+    sync_service = DriveSyncService(db)
+
+    users = db.collection('users').where('settings.drive_sync_enabled', '==', True).select([]).stream()
+    for user in users:
+        credentials = await oauth_service.refresh_user_tokens(user.id)
+        if not credentials:
+            print(f"⚠️ {user.id}: sin autorización de Google Drive")
+            continue
+        try:
+            record = await sync_service.sync_user(user.id, get_drive_service(credentials), max_pages)
+        except SyncInProgressError:
+            print(f"⏭️ {user.id}: sincronización en curso")
+            continue
+        print(f"📊 {user.id}: {record.status} {record.stats or {}}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-pages", type=int, default=None, help="Páginas de cambios por usuario en esta ejecución")
+    args = parser.parse_args()
+
+    DatabaseConfig.initialize_firebase()
+    print("🔄 Sincronizando Google Drive...")
+    asyncio.run(sync_all(args.max_pages))
+    print("✅ Sincronización terminada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Reclasificación masiva: vuelve a analizar los documentos cuyo análisis guardado tiene
+una versión anterior de AI_MODEL_VERSION, reutilizando el texto extraído (sin OCR).
+Se puede interrumpir y volver a ejecutar: continúa desde el último punto de control.
+"""
+
+import argparse
+import asyncio
+
+from app.config.database import DatabaseConfig
+from app.services.ai_analysis_service import AI_MODEL_VERSION
+from app.services.reanalysis_service import ReanalysisService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-documents", type=int, default=None, help="Análisis a procesar como máximo en esta ejecución")
+    args = parser.parse_args()
+
+    DatabaseConfig.initialize_firebase()
+    service = ReanalysisService()
+
+    print(f"🔄 Reanálisis hacia la versión {AI_MODEL_VERSION}...")
+    result = asyncio.run(service.run(max_documents=args.max_documents))
+    print(f"📊 Procesados: {result['processed']} | Categoría cambiada: {result['changed']} | Aplazados: {result['deferred']}")
+    if result['finished']:
+        print("✅ Pasada completada")
+    else:
+        print("⏸️ Pasada incompleta: vuelva a ejecutar para continuar")
+
+
+if __name__ == "__main__":
+    main()